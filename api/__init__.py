@@ -10,6 +10,8 @@ logging.basicConfig(format='%(asctime)s %(module)s %(levelname)s: %(message)s',
 
 from web_framework_v2 import Framework, JwtSecurity, HttpStatus, HttpResponse, HttpRequest, KeyPair
 
+from database.user.password_hasher import PasswordHasherBusyError
+
 JwtSecurity.set_access_key(
     KeyPair(
         os.getenv("JWT_ACCESS_PUBLIC_KEY").replace("\\n", '\n'),
@@ -31,9 +33,12 @@ BUSINESS_OWNER_ID_AWS_FOLDER = "business_ids/"
 
 
 def error_handler(error: Exception, traceback: str, req: HttpRequest, res: HttpResponse, path_variables: dict):
+    res.content_type = "application/json"
+    if isinstance(error, PasswordHasherBusyError):
+        return json.dumps(server_busy(res, error.retry_after))
+
     logging.exception(error)
     res.status = HttpStatus.BAD_REQUEST
-    res.content_type = "application/json"
     return json.dumps({
         "error": str(error)
     })
@@ -49,7 +54,7 @@ app = Framework(
     error_handler=error_handler
 )
 
-from .api_utils import auth_fail
+from .api_utils import auth_fail, server_busy
 from . import user
 from . import business
 from . import auth_controller
@@ -1,21 +1,25 @@
-import base64
-
 from bson import ObjectId
 from web_framework_v2 import RequestBody, HttpResponse, HttpStatus, QueryParameter
 
 from api import auth_fail, app
-from database import User, Business, unapproved_businesses_collection, s3Bucket, businesses_collection
+from api.utils import ImageFormat, parse_image_format, format_image, resolve_images
+from database import User, Business, unapproved_businesses_collection, s3Bucket, businesses_collection, access_token_blacklist, \
+    refresh_token_blacklist
+from database.counter_aggregator import counter_aggregator
+from database.geo_cache import geo_cache
 from security import BlacklistJwtTokenAuth
+from security.token_cache import decoded_token_cache
 
 
 class AdminController:
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail, check_blacklist=True)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, check_blacklist=True, fields=())
     @app.get("/business/unapproved")
     def get_unapproved_businesses(
             user_raw: BlacklistJwtTokenAuth,
             res: HttpResponse,
-            get_images: QueryParameter("get_images", bool)
+            get_images: QueryParameter("get_images", bool),
+            image_format: QueryParameter("image_format", str),
     ):
         user: User = user_raw
         if not user.is_system_admin:
@@ -24,15 +28,17 @@ class AdminController:
                 "error": "Admin route"
             }
 
-        return AdminController.get_businesses_from_collection(user_raw, res, unapproved_businesses_collection, get_images)
+        return AdminController.get_businesses_from_collection(user_raw, res, unapproved_businesses_collection, get_images,
+                                                              parse_image_format(image_format))
 
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail, check_blacklist=True)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, check_blacklist=True, fields=())
     @app.get("/business/approved")
     def get_approved_businesses(
             user_raw: BlacklistJwtTokenAuth,
             res: HttpResponse,
-            get_images: QueryParameter("get_images", bool)
+            get_images: QueryParameter("get_images", bool),
+            image_format: QueryParameter("image_format", str),
     ):
         user: User = user_raw
         if not user.is_system_admin:
@@ -41,14 +47,15 @@ class AdminController:
                 "error": "Admin route"
             }
 
-        return AdminController.get_businesses_from_collection(user_raw, res, businesses_collection, get_images)
+        return AdminController.get_businesses_from_collection(user_raw, res, businesses_collection, get_images, parse_image_format(image_format))
 
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail, check_blacklist=True)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, check_blacklist=True, fields=())
     @app.post("/business/approve")
     def update_business_approval(
             user_raw: BlacklistJwtTokenAuth,
             body: RequestBody(),
+            image_format: QueryParameter("image_format", str),
             res: HttpResponse
     ):
         user: User = user_raw
@@ -79,27 +86,48 @@ class AdminController:
         else:
             business = Business.move_business_to_unapproved(business_id, note)
 
-        img_bytes = business.owner_id_card.get_image()
-        business.owner_id_card = base64.b64encode(img_bytes).decode('utf-8')
+        business.owner_id_card = format_image(business.owner_id_card, parse_image_format(image_format))
         return business
 
     @staticmethod
-    def get_businesses_from_collection(user: User, response: HttpResponse, collection, get_images: bool):
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, check_blacklist=True, fields=())
+    @app.get("/admin/metrics")
+    def get_metrics(
+            user_raw: BlacklistJwtTokenAuth,
+            res: HttpResponse
+    ):
+        user: User = user_raw
+        if not user.is_system_admin:
+            res.status = HttpStatus.UNAUTHORIZED
+            return {
+                "error": "Admin route"
+            }
+
+        return {
+            "s3": s3Bucket.metrics.snapshot(),
+            "access_token_blacklist": access_token_blacklist.metrics.snapshot(),
+            "refresh_token_blacklist": refresh_token_blacklist.metrics.snapshot(),
+            "jwt_cache": decoded_token_cache.snapshot(),
+            "geo_cache": geo_cache.snapshot(),
+            "counters": counter_aggregator.snapshot(),
+        }
+
+    @staticmethod
+    def get_businesses_from_collection(user: User, response: HttpResponse, collection, get_images: bool,
+                                       image_format: ImageFormat = ImageFormat.Base64):
         if not user.is_system_admin:
             response.status = HttpStatus.UNAUTHORIZED
             return
 
         get_images = get_images if get_images is not None and isinstance(get_images, bool) else False
         businesses = list(map(lambda x: Business.document_repr_to_object(x), collection.find()))
-        if get_images:
-            image_id_business_map = {}
-            image_keys = []
+        if get_images and image_format != ImageFormat.Base64:
             for business in businesses:
-                image_keys.append(business.owner_id_card.image_id)
-                image_id_business_map[business.owner_id_card.image_id] = business
-
-            for key, image in s3Bucket.fetch_all(*image_keys):
-                image_id_business_map[key].owner_id_card = base64.b64encode(image).decode('utf-8')
+                business.owner_id_card = format_image(business.owner_id_card, image_format)
+        elif get_images:
+            images = resolve_images(*map(lambda business: business.owner_id_card.image_id, businesses))
+            for business in businesses:
+                business.owner_id_card = images.get(business.owner_id_card.image_id)
         else:
             for business in businesses:
                 business.owner_id_card = None
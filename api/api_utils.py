@@ -1,8 +1,12 @@
+import hashlib
 import json
 import logging
+import threading
 
-from web_framework_v2 import HttpStatus, HttpRequest, HttpResponse
+from web_framework_v2 import HttpStatus, HttpRequest, HttpResponse, ContentType
 
+from database import s3Bucket
+from database.user.password_hasher import password_hasher
 from security import AuthenticationResult
 
 logger = logging.getLogger(__name__)
@@ -14,8 +18,11 @@ def auth_fail(req: HttpRequest, res: HttpResponse, data):
         f"Failed authentication for {json.loads(req.body).get('email', None) if type(req.body) is not bytes else None}: {data}\t\t-\tSetting status to {HttpStatus.UNAUTHORIZED}."
     )
 
-    res.status = HttpStatus.UNAUTHORIZED
     res.content_type = "application/json"
+    if data is AuthenticationResult.ServerBusy:
+        return json.dumps(server_busy(res, password_hasher.retry_after))
+
+    res.status = HttpStatus.UNAUTHORIZED
     j = {
         "error": "Unauthorized",
     }
@@ -25,3 +32,101 @@ def auth_fail(req: HttpRequest, res: HttpResponse, data):
             j['data'] = data.value
 
     return json.dumps(j)
+
+
+def server_busy(res: HttpResponse, retry_after: int) -> dict:
+    """
+    Sets a 503 response status. web_framework_v2 has no per response headers, so the Retry-After value is sent in the body.
+    """
+    res.status = HttpStatus.SERVICE_UNAVAILABLE
+    return {
+        "error": "Server busy",
+        "data": AuthenticationResult.ServerBusy.value,
+        "retry_after": retry_after,
+    }
+
+
+def upload_too_large(req: HttpRequest, res: HttpResponse, size: int = None) -> bool:
+    """
+    Checks an upload against S3_MAX_UPLOAD_BYTES using the declared Content-Length, and the actual size when given,
+    setting the response status to 413 when it is exceeded.
+    """
+    try:
+        declared_size = int(req.headers.get("content-length", 0))
+    except ValueError:
+        declared_size = 0
+
+    if max(declared_size, size if size is not None else 0) <= s3Bucket.max_upload_bytes:
+        return False
+
+    res.status = HttpStatus.REQUEST_ENTITY_TOO_LARGE
+    return True
+
+
+def content_etag(data: bytes) -> str:
+    """
+    :return: a strong ETag of the content's hash
+    """
+    return f'"{hashlib.sha256(data).hexdigest()}"'
+
+
+def not_modified(req: HttpRequest, res: HttpResponse, etag: str) -> bool:
+    """
+    Checks If-None-Match against the ETag of the response, setting the response status to 304 when the client's copy is current.
+    """
+    if_none_match = req.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" not in tags and etag not in tags:
+        return False
+
+    res.status = HttpStatus.NOT_MODIFIED
+    return True
+
+
+class ResponseHeaders:
+    """
+    Route content type that carries extra headers.
+    web_framework_v2 1.2 has no per response headers: a response is written with the content type of its route, which is
+    written verbatim as a header line, and its body is built whole before it is sent, so responses cannot be streamed either.
+    Headers are appended here instead. The route's headers are the defaults, a handler replaces them for its own response with
+    for_response.
+    """
+
+    def __init__(self, content_type: ContentType | str, **headers: str):
+        self.content_type = content_type
+        self.headers = ResponseHeaders._header_names(headers)
+        self._response = threading.local()
+
+    def for_response(self, content_type: ContentType | str, **headers: str):
+        """
+        Replaces the route's headers for the response of the current request only.
+        The framework builds and writes a response on the thread that ran its handler, the headers are consumed when written.
+        """
+        self._response.headers = (content_type, ResponseHeaders._header_names(headers))
+
+    def reset(self):
+        """
+        Restores the route's headers for the response of the current request, for a handler that failed after for_response.
+        """
+        self._response.headers = None
+
+    def __str__(self):
+        content_type, headers = getattr(self._response, "headers", None) or (self.content_type, self.headers)
+        self._response.headers = None
+
+        content_type = str(content_type) if isinstance(content_type, ContentType) else f"content-type: {content_type}"
+        lines = [content_type] + [f"{name}: {value}" for name, value in headers.items()]
+        return "\r\n".join(lines)
+
+    @staticmethod
+    def _header_names(headers: dict) -> dict:
+        return {name.replace("_", "-"): value for name, value in headers.items()}
+
+
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# errors and failed authentication keep these, only successfully sent images are marked as immutable
+IMAGE_HEADERS = ResponseHeaders(ContentType.json, Cache_Control="no-store")
@@ -1,11 +1,13 @@
-import base64
+import json
 import logging
 import os
 
-from web_framework_v2 import QueryParameter, RequestBody, HttpResponse, HttpStatus
+from web_framework_v2 import QueryParameter, RequestBody, HttpRequest, HttpResponse, HttpStatus
 
 from api import app, auth_fail, ITEM_IMAGE_AWS_FOLDER, REVIEW_IMAGE_AWS_FOLDER, PROFILE_PICTURE_AWS_FOLDER
-from database import Image, s3Bucket, User
+from api.api_utils import IMAGE_HEADERS, IMMUTABLE_CACHE_CONTROL, content_etag, not_modified
+from api.utils import resolve_images
+from database import Image, ImageVariant, User
 from security import BlacklistJwtTokenAuth
 
 
@@ -13,6 +15,16 @@ def image_error_handler(err, traceback, req, res, path_vars) -> object:
     return {"error": "Image not found", 'error_type': str(type(err))} if "Unable to access bucket" in str(err) else None
 
 
+def raw_image_error_handler(err, traceback, req, res, path_vars) -> bytes:
+    """
+    Error handler of routes sending raw bytes, the framework only encodes results of JSON routes so the error is encoded here.
+    """
+    IMAGE_HEADERS.reset()
+    error = image_error_handler(err, traceback, req, res, path_vars)
+    res.status = HttpStatus.NOT_FOUND if error is not None else HttpStatus.INTERNAL_SERVER_ERROR
+    return json.dumps(error if error is not None else {"error": "Internal server error"}).encode()
+
+
 aws_access_key = os.getenv("AWS_ACCESS_KEY")
 aws_secret_key = os.getenv("AWS_SECRET_KEY")
 bucket_name = os.getenv("AWS_BUCKET_NAME")
@@ -20,19 +32,55 @@ bucket_name = os.getenv("AWS_BUCKET_NAME")
 
 class AssetsController:
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
-    @app.get("/image", error_handler=image_error_handler)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
+    @app.get("/image", error_handler=raw_image_error_handler, content_type=IMAGE_HEADERS)
     def get_image(
             user: BlacklistJwtTokenAuth,
             image_id: QueryParameter("image_id"),
-            folder_name: QueryParameter("folder_name")
+            folder_name: QueryParameter("folder_name"),
+            variant: QueryParameter("variant", str),
+            request: HttpRequest,
+            response: HttpResponse,
     ):
+        """
+        Sends the raw image bytes. Image keys are never rewritten so a found image is marked as immutable,
+        which lets clients use keys returned with image_format=key as cache keys. Errors are JSON and not cacheable.
+        """
+        if image_id is None:
+            response.status = HttpStatus.BAD_REQUEST
+            return json.dumps({"error": "Must provide an 'image_id' query parameter"}).encode()
+
+        key = (folder_name if folder_name is not None else "") + image_id
+
         try:
-            return Image(folder_name + image_id).get_image()
+            data = AssetsController.load_image(key, Image.parse_variant(variant))
         except:
-            return {
-                "error": "Image not found."
-            }
+            response.status = HttpStatus.NOT_FOUND
+            return json.dumps({"error": "Image not found"}).encode()
+
+        return AssetsController.image_response(data, request, response)
+
+    @staticmethod
+    def image_response(data: bytes, request: HttpRequest, response: HttpResponse) -> bytes:
+        """
+        :return: the image, or an empty 304 response when the client's copy has the image's ETag
+        """
+        etag = content_etag(data)
+        IMAGE_HEADERS.for_response(Image.detect_content_type(data), Cache_Control=IMMUTABLE_CACHE_CONTROL, ETag=etag)
+        return b"" if not_modified(request, response, etag) else data
+
+    @staticmethod
+    def load_image(key: str, variant: ImageVariant = None) -> bytes:
+        if variant is not None:
+            return Image(Image.original_id(key)).get_image(variant)
+
+        try:
+            return Image(key).get_image()
+        except Exception:
+            # variant keys of images uploaded before variants existed resolve to the original
+            if Image.original_id(key) == key:
+                raise
+            return Image(Image.original_id(key)).get_image()
 
     @staticmethod
     @BlacklistJwtTokenAuth(on_fail=auth_fail)
@@ -40,6 +88,7 @@ class AssetsController:
     def get_image(
             raw_user: BlacklistJwtTokenAuth,
             images: RequestBody(),
+            variant: QueryParameter("variant", str),
             response: HttpResponse,
     ):
         user: User = raw_user
@@ -55,7 +104,7 @@ class AssetsController:
             response.status = HttpStatus.BAD_REQUEST
             return {}
 
-        unique_image_list = list(set(images))
+        unique_image_list = list(dict.fromkeys(images))
         images = []
         for image in unique_image_list:
             split = image.split("/")
@@ -68,13 +117,8 @@ class AssetsController:
             if contains or user.is_system_admin:
                 images.append(image)
 
-        result = {}
-
         try:
-            for key, data in s3Bucket.fetch_all(*images):
-                result[key] = base64.b64encode(data).decode('utf-8')
-
-            return result
+            return resolve_images(*images, variant=Image.parse_variant(variant))
         except Exception as e:
             logging.exception(e)
             return {
@@ -4,12 +4,17 @@ from bson import ObjectId
 from web_framework_v2 import HttpRequest, JwtSecurity, QueryParameter, HttpResponse, HttpStatus, RequestBody
 
 from api import auth_fail
+from api.api_utils import server_busy
+from database.user.password_hasher import password_hasher
 from database import User, refresh_token_blacklist, access_token_blacklist
 from security import RegistrationTokenFactory, LoginTokenFactory, AuthenticationResult, BlacklistJwtTokenAuth
 from . import app
 
 
 def register_fail(req: HttpRequest, res: HttpResponse, data: AuthenticationResult):
+    if data is AuthenticationResult.ServerBusy:
+        return json.dumps(server_busy(res, password_hasher.retry_after))
+
     res.status = HttpStatus.UNAUTHORIZED
     return json.dumps({
         "token": None,
@@ -24,7 +24,7 @@ def get_category_data(
     return business.get_category_by_name(category, include_items)
 
 
-@BusinessJwtTokenAuth()
+@BusinessJwtTokenAuth(fields=())
 @app.post("/business/category/{category}")
 def create_category(
         token_data: BusinessJwtTokenAuth,
@@ -40,13 +40,13 @@ def create_category(
         name=category,
         items_ids=list(map(lambda item_id: ObjectId(item_id), body.get("item_ids", [])))
     )
-    business.add_category(cat)
+    business.add_category(cat, return_result=False)
 
     res.status = HttpStatus.CREATED
     return cat
 
 
-@BusinessJwtTokenAuth()
+@BusinessJwtTokenAuth(fields=())
 @app.patch("/business/category/{category}")
 def update_category(
         token_data: BusinessJwtTokenAuth,
@@ -68,7 +68,7 @@ def update_category(
     return cat
 
 
-@BusinessJwtTokenAuth()
+@BusinessJwtTokenAuth(fields=())
 @app.delete("/business/category/{category}")
 def delete_category(
         token_data: BusinessJwtTokenAuth,
@@ -78,5 +78,5 @@ def delete_category(
     user: BusinessUser = token_data
     business = Business.get_business_by_id(user.business_id)
 
-    business.remove_category(category)
+    business.remove_category(category, return_result=False)
     response.status = HttpStatus.NO_CONTENT
@@ -1,23 +1,34 @@
 import base64
+import datetime
+import json
+import logging
 
 from bson import ObjectId
 from pymongo import ReturnDocument
-from web_framework_v2 import RequestBody, PathVariable, QueryParameter, HttpResponse, HttpStatus
+from web_framework_v2 import RequestBody, PathVariable, QueryParameter, HttpRequest, HttpResponse, HttpStatus
 
 import database as database
 from body import ItemCreation, ItemUpdate
 from body import Review
-from database import Item, ItemStoreFormat, Business, BusinessUser, User, items_collection, ModificationButton, Image, s3Bucket
+from database import Item, ItemStoreFormat, Business, BusinessUser, User, items_collection, ModificationButton, Image, s3Bucket, S3UploadError, \
+    InvalidImageError
 from database.business.item.item_metrics import ItemMetrics
+from database.pending_upload import pending_uploads
 from security.token_security import BusinessJwtTokenAuth, BlacklistJwtTokenAuth
 from .. import app, auth_fail, REVIEW_IMAGE_AWS_FOLDER, ITEM_IMAGE_AWS_FOLDER
-from ..utils import applyImagesToItems
+from ..api_utils import upload_too_large
+from ..utils import applyImagesToItems, parse_image_format
+
+REVIEWS_DEFAULT_PAGE_SIZE = 20
+REVIEWS_MAX_PAGE_SIZE = 100
 
 
 @app.post("/business/items")
 def get_items(
         item_ids: RequestBody(),
-        include_images: QueryParameter('include_images', bool)
+        include_images: QueryParameter('include_images', bool),
+        image_format: QueryParameter("image_format", str),
+        variant: QueryParameter("variant", str),
 ):
     if not isinstance(item_ids, list):
         item_ids = [item_ids]
@@ -25,7 +36,7 @@ def get_items(
     items = Item.get_items(*list(map(lambda item_id: ObjectId(item_id), item_ids)))
     include_images = include_images if include_images is not None and isinstance(include_images, bool) else False
     if include_images is not None and include_images:
-        items = applyImagesToItems(*items)
+        items = applyImagesToItems(*items, image_format=parse_image_format(image_format), variant=Image.parse_variant(variant))
     else:
         for item in items:
             item.images = []
@@ -33,7 +44,7 @@ def get_items(
     return items
 
 
-@BusinessJwtTokenAuth(on_fail=auth_fail)
+@BusinessJwtTokenAuth(on_fail=auth_fail, fields=())
 @app.post("/business/item")
 def create_item(
         token_data: BusinessJwtTokenAuth,
@@ -50,7 +61,6 @@ def create_item(
         price=item_creation_data.price,
         images=[],
         preview_image=-1,
-        reviews=[],
         item_store_format=ItemStoreFormat(
             item_id=None,
             title=item_creation_data.title.strip(),
@@ -71,7 +81,7 @@ def create_item(
         location=business.location
     )
 
-    business.add_item(result.id)
+    business.add_item(result.id, return_result=False)
     res.status = HttpStatus.CREATED
     return result
 
@@ -79,7 +89,7 @@ def create_item(
 """ SPECIFIC ITEM """
 
 
-@BusinessJwtTokenAuth(on_fail=auth_fail)
+@BusinessJwtTokenAuth(on_fail=auth_fail, fields=())
 @app.post("/business/item/{item_id}/stock")
 def update_item_stock(
         raw_user: BusinessJwtTokenAuth,
@@ -119,23 +129,30 @@ def update_item_stock(
     return Item.document_repr_to_object(item_doc)
 
 
-@BusinessJwtTokenAuth(on_fail=auth_fail)
+@BusinessJwtTokenAuth(on_fail=auth_fail, fields=())
 @app.post("/business/item/{item_id}/image")
 def swap_image_of_item(
         token_data: BusinessJwtTokenAuth,
         item_id: PathVariable("item_id"),
         index: QueryParameter("index", int),
         image: RequestBody(raw_format=True),
+        image_format: QueryParameter("image_format", str),
+        req: HttpRequest,
         res: HttpResponse
 ):
     user: BusinessUser = token_data
 
+    if upload_too_large(req, res, len(image) if image is not None else None):
+        return {
+            "error": f"Image must be at most {s3Bucket.max_upload_bytes} bytes"
+        }
+
     if index is not None and not isinstance(index, int):
         return {
             "error": "must supply query parameter 'index' as an integer"
         }
 
-    if len(image) < 100:
+    if image is None or len(image) < 100:
         res.status = HttpStatus.BAD_REQUEST
         return {
             "error": "Image must be at least 100 bytes"
@@ -155,22 +172,30 @@ def swap_image_of_item(
             f"Can set images in index range of 0-{len(item.images)}"
         }
 
-    result = Image.upload(image, folder_name="items/")
+    try:
+        result = Image.upload(image, folder_name=ITEM_IMAGE_AWS_FOLDER)
+    except InvalidImageError as e:
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            "error": str(e)
+        }
+
     if result.image_id is None:
         res.status = HttpStatus.INTERNAL_SERVER_ERROR
         return {
             "error": "failed"
         }
 
-    return applyImagesToItems(item.add_image(result, index))[0]
+    return applyImagesToItems(item.add_image(result, index), image_format=parse_image_format(image_format))[0]
 
 
-@BusinessJwtTokenAuth(on_fail=auth_fail)
+@BusinessJwtTokenAuth(on_fail=auth_fail, fields=())
 @app.delete("/business/item/{item_id}/image")
 def remove_image_from_item(
         token_data: BusinessJwtTokenAuth,
         item_id: PathVariable("item_id"),
         index: QueryParameter("index", int),
+        image_format: QueryParameter("image_format", str),
         res: HttpResponse,
 ):
     user: BusinessUser = token_data
@@ -196,10 +221,10 @@ def remove_image_from_item(
     image = item.images[index]
     item = item.remove_image(index)
     image.delete_image()
-    return applyImagesToItems(item)[0]
+    return applyImagesToItems(item, image_format=parse_image_format(image_format))[0]
 
 
-@BusinessJwtTokenAuth(on_fail=auth_fail)
+@BusinessJwtTokenAuth(on_fail=auth_fail, fields=())
 @app.patch("/business/item/{item_id}")
 def update_item(
         token_data: BusinessJwtTokenAuth,
@@ -234,7 +259,7 @@ def update_item(
     return item
 
 
-@BusinessJwtTokenAuth(on_fail=auth_fail)
+@BusinessJwtTokenAuth(on_fail=auth_fail, fields=())
 @app.delete("/business/item/{item_id}")
 def delete_item(
         token_data: BusinessJwtTokenAuth,
@@ -244,7 +269,7 @@ def delete_item(
     user: BusinessUser = token_data
 
     Item.delete_item(item_id)
-    Business.get_business_by_id(user.business_id).remove_item(item_id)
+    Business.get_business_by_id(user.business_id).remove_item(item_id, return_result=False)
     res.status = HttpStatus.NO_CONTENT
     return {
         "success": True
@@ -257,7 +282,7 @@ def delete_item(
 # TODO: Remove business sensitive data for normal users
 
 
-@BlacklistJwtTokenAuth(on_fail=auth_fail)
+@BlacklistJwtTokenAuth(on_fail=auth_fail, fields=())
 @app.post("/business/{business_id}/item/{item_id}/review")
 def add_item_review(
         token_data: BlacklistJwtTokenAuth,
@@ -269,26 +294,193 @@ def add_item_review(
     review: Review = review_data
     user: User = token_data
 
-    imgs = []
+    if not isinstance(review.rating, (int, float)) or not 1 <= review.rating <= 5:
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            "error": "Review rating must be a number between 1 and 5"
+        }
+
+    item = Item.get_item(ObjectId(item_id))
+    if item is None:
+        res.status = HttpStatus.NOT_FOUND
+        return {
+            "error": f"Item with id {item_id} does not exist"
+        }
+
+    if database.Review.exists(item.id, user.id):
+        res.status = HttpStatus.CONFLICT
+        return {
+            "error": "You already reviewed this item"
+        }
+
+    # images uploaded beforehand through the raw review image endpoint, only the uploader can attach them
+    folder = review_image_folder(user.id)
+    image_ids = getattr(review, "image_ids", None) or []
+    if not all(isinstance(image_id, str) and image_id.startswith(folder) for image_id in image_ids):
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            "error": "Review image ids must be images you uploaded for a review"
+        }
+
+    image_data = []
     for image in review.images if review.images is not None else []:
+        if len(image) * 3 // 4 > s3Bucket.max_upload_bytes:
+            res.status = HttpStatus.REQUEST_ENTITY_TOO_LARGE
+            return {
+                "error": f"Images must be at most {s3Bucket.max_upload_bytes} bytes"
+            }
+
         data = base64.b64decode(image)
         if len(data) < 100:
             continue
 
-        img = Image.upload(data, REVIEW_IMAGE_AWS_FOLDER)
-        imgs.append(img)
+        image_data.append(data)
+
+    if not pending_uploads.claim(user.id, image_ids):
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            "error": "Review image ids must be images you uploaded for a review and did not use in another review"
+        }
+
+    try:
+        uploaded = Image.upload_many(*image_data, folder_name=folder)
+    except InvalidImageError as e:
+        pending_uploads.release(user.id, image_ids)
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            "error": str(e)
+        }
+    except S3UploadError as e:
+        logging.exception(e)
+        pending_uploads.release(user.id, image_ids)
+        res.status = HttpStatus.INTERNAL_SERVER_ERROR
+        return {
+            "error": f"Failed uploading {len(e.failed_keys)} review images"
+        }
 
-    item = Item.get_item(item_id).add_review(database.Review(
+    imgs = list(map(Image, image_ids)) + uploaded
+
+    saved_review = item.add_review(database.Review(
         poster_id=user.id,
         pfp_image=user.profile_picture,
         poster_name="" if anonymous else user.name,
         rating=review.rating,
         text_content=review.text_content,
-        images=list(map(lambda x: x.image_id, imgs))
+        images=imgs
     ))
+    if saved_review is None:
+        # a concurrent submission saved its review first
+        pending_uploads.release(user.id, image_ids)
+        for image in uploaded:
+            try:
+                image.delete_image()
+            except Exception as e:
+                logging.warning(f"Failed rolling back upload of {image.image_id}: {e}")
+
+        res.status = HttpStatus.CONFLICT
+        return {
+            "error": "You already reviewed this item"
+        }
 
     res.status = HttpStatus.CREATED
-    return item
+    return saved_review
+
+
+@BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
+@app.get("/business/{business_id}/item/{item_id}/reviews")
+def get_item_reviews(
+        token_data: BlacklistJwtTokenAuth,
+        item_id: PathVariable("item_id"),
+        limit: QueryParameter("limit", int),
+        cursor: QueryParameter("cursor", str),
+        res: HttpResponse
+):
+    """
+    One page of the item's reviews, newest first. The returned cursor is passed to get the next page, it is null on the last page.
+    """
+    limit = min(max(limit, 1), REVIEWS_MAX_PAGE_SIZE) if isinstance(limit, int) else REVIEWS_DEFAULT_PAGE_SIZE
+    try:
+        reviews, next_cursor = database.Review.get_item_reviews(ObjectId(item_id), limit, decode_review_cursor(cursor))
+    except ValueError:
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            'error': "Invalid 'cursor' query parameter"
+        }
+
+    return {
+        "reviews": reviews,
+        "cursor": encode_review_cursor(*next_cursor) if next_cursor is not None else None
+    }
+
+
+def review_image_folder(user_id) -> str:
+    return f"{REVIEW_IMAGE_AWS_FOLDER}{user_id}/"
+
+
+def encode_review_cursor(date: datetime.datetime, last_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"dt": int(date.timestamp() * 1000), "id": str(last_id)}).encode()).decode()
+
+
+def decode_review_cursor(cursor: str):
+    """
+    :raises ValueError: if the cursor is malformed
+    """
+    if cursor is None:
+        return None
+
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        date = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(milliseconds=int(data["dt"]))
+        return date, ObjectId(data["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
+
+
+@BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
+@app.post("/business/{business_id}/item/{item_id}/review/image")
+def upload_review_image(
+        token_data: BlacklistJwtTokenAuth,
+        business_id: PathVariable("business_id"),
+        item_id: PathVariable("item_id"),
+        image: RequestBody(raw_format=True),
+        req: HttpRequest,
+        res: HttpResponse
+):
+    """
+    Uploads a single raw review image, the returned id is then passed in the review's image_ids.
+    Images that no review uses within PENDING_UPLOAD_TTL_SECONDS are deleted.
+    """
+    if not ObjectId.is_valid(business_id) or not ObjectId.is_valid(item_id) \
+            or not Item.exists_by_id(ObjectId(item_id), ObjectId(business_id)):
+        res.status = HttpStatus.NOT_FOUND
+        return {
+            "error": f"Item with id {item_id} does not exist"
+        }
+
+    if upload_too_large(req, res, len(image) if image is not None else None):
+        return {
+            "error": f"Image must be at most {s3Bucket.max_upload_bytes} bytes"
+        }
+
+    if image is None or len(image) < 100:
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            "error": "Image must be at least 100 bytes"
+        }
+
+    try:
+        img = Image.upload(image, folder_name=review_image_folder(token_data.user_id))
+    except InvalidImageError as e:
+        res.status = HttpStatus.BAD_REQUEST
+        return {
+            "error": str(e)
+        }
+
+    pending_uploads.add(img, token_data.user_id)
+    res.status = HttpStatus.CREATED
+    return {
+        "image_id": img.image_id
+    }
 
 
 @BlacklistJwtTokenAuth()
@@ -299,6 +491,23 @@ def delete_item_review(
         res: HttpResponse
 ):
     user: User = token_data
-    item = Item.get_item(item_id).remove_review(user.id)
+    item = Item.get_item(ObjectId(item_id))
+    review = item.remove_review(user.id) if item is not None else None
+    if review is None:
+        res.status = HttpStatus.NOT_FOUND
+        return {
+            "error": "No review of this item to delete"
+        }
+
+    # images outside the poster's folder were uploaded before review images were scoped, their uploader is unknown
+    for image in review.images:
+        if image.image_id is not None and image.image_id.startswith(review_image_folder(user.id)):
+            try:
+                image.delete_image()
+            except Exception as e:
+                logging.warning(f"Failed deleting review image {image.image_id}: {e}")
+
     res.status = HttpStatus.NO_CONTENT
-    return item
+    return {
+        "success": True
+    }
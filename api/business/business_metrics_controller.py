@@ -1,30 +1,115 @@
+import datetime
+from typing import Iterable
+
 from bson import ObjectId
-from web_framework_v2 import PathVariable
+from web_framework_v2 import PathVariable, HttpResponse, HttpStatus, QueryParameter
 
 from api import auth_fail, app
-from database import User, Business, Item
+from body import BusinessUserTokenData
+from database import MetricsBucket
+from database.business.business_metrics import BusinessMetrics
+from database.business.item.item_metrics import ItemMetrics
+from database.business.metrics_bucket import MetricsEntityType, MetricsGranularity
 from security import BlacklistJwtTokenAuth
+from security.token_security import BusinessJwtTokenAuth
+
+DASHBOARD_DEFAULT_DAYS = 7
+DASHBOARD_MAX_BUCKETS = 24 * 31
+
+
+def dashboard_series(buckets: Iterable[MetricsBucket]) -> tuple[list, dict]:
+    """
+    Splits time ordered buckets into the business's views and each item's views, orders and likes.
+    :return: the business's points and the points of each item by item id
+    """
+    business_series = []
+    item_series = {}
+    for bucket in buckets:
+        point = {"time": bucket.time.isoformat(), "views": bucket.views}
+        if bucket.entity_type == MetricsEntityType.Business:
+            business_series.append(point)
+        else:
+            point.update({"orders": bucket.orders, "likes": bucket.likes})
+            item_series.setdefault(str(bucket.entity_id), []).append(point)
+
+    return business_series, item_series
 
 
 class BusinessMetricsController:
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
     @app.post("/business/{business_id}/view")
     def add_business_view(
-            userUncast: BlacklistJwtTokenAuth,
+            token_data: BlacklistJwtTokenAuth,
             business_id: PathVariable("business_id"),
+            res: HttpResponse,
     ):
-        user: User = userUncast
-        _id = ObjectId(business_id)
-        return Business.get_business_by_id(_id).metrics.add_view().metrics.views
+        """
+        Counts the view in the next counter flush and answers 202 without waiting for the count.
+        """
+        if not BusinessMetrics.record_view(ObjectId(business_id)):
+            res.status = HttpStatus.NOT_FOUND
+            return f"Business with id {business_id} does not exist."
+
+        res.status = HttpStatus.ACCEPTED
 
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
     @app.post("/business/item/{item_id}/view")
     def add_item_view(
-            userUncast: BlacklistJwtTokenAuth,
+            token_data: BlacklistJwtTokenAuth,
             item_id: PathVariable("item_id"),
+            res: HttpResponse,
+    ):
+        """
+        Counts the view in the next counter flush and answers 202 without waiting for the count.
+        """
+        if not ItemMetrics.record(ObjectId(item_id), "views"):
+            res.status = HttpStatus.NOT_FOUND
+            return f"Item with id {item_id} does not exist."
+
+        res.status = HttpStatus.ACCEPTED
+
+    @staticmethod
+    @BusinessJwtTokenAuth(on_fail=auth_fail, token_only=True)
+    @app.get("/business/metrics")
+    def get_business_metrics(
+            token_data: BusinessJwtTokenAuth,
+            start: QueryParameter("start", int),
+            end: QueryParameter("end", int),
+            granularity: QueryParameter("granularity", str),
+            res: HttpResponse,
     ):
-        user: User = userUncast
-        _id = ObjectId(item_id)
-        return Item.get_item(_id).metrics.add_view().metrics.views
+        """
+        Views, orders and likes of the business and each of its items per hour or day between start and end (epoch seconds),
+        the last week by default.
+        """
+        token: BusinessUserTokenData = token_data
+        try:
+            granularity = MetricsGranularity(granularity.lower()) if granularity is not None else MetricsGranularity.Day
+        except ValueError:
+            res.status = HttpStatus.BAD_REQUEST
+            return {
+                "error": "Query parameter granularity must be 'hour' or 'day'"
+            }
+
+        end = datetime.datetime.fromtimestamp(end, datetime.timezone.utc) if end is not None else datetime.datetime.now(datetime.timezone.utc)
+        start = datetime.datetime.fromtimestamp(start, datetime.timezone.utc) if start is not None \
+            else end - datetime.timedelta(days=DASHBOARD_DEFAULT_DAYS)
+
+        bucket_size = datetime.timedelta(hours=1) if granularity == MetricsGranularity.Hour else datetime.timedelta(days=1)
+        if start >= end or (end - start) / bucket_size > DASHBOARD_MAX_BUCKETS:
+            res.status = HttpStatus.BAD_REQUEST
+            return {
+                "error": f"Range must be positive and span at most {DASHBOARD_MAX_BUCKETS} {granularity.value}s"
+            }
+
+        business_series, item_series = dashboard_series(MetricsBucket.get_business_series(token.business_id, start, end, granularity))
+
+        return {
+            "granularity": granularity.value,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "business": business_series,
+            "items": item_series,
+        }
@@ -1,24 +1,36 @@
+import base64
+import bisect
+import json
 from typing import List
 
+from bson import ObjectId
 from web_framework_v2 import QueryParameter, HttpResponse, HttpStatus
 
 from api.api_utils import auth_fail
-from database import Item, items_collection, businesses_collection, Business, User
+from database import ItemSummary, items_collection, businesses_collection, Business, Image
+from database.geo_cache import DISTANCE_ERROR_MARGIN, geo_cache, spherical_distance
+from database.spatial_index import spatial_indexes
 from security import BlacklistJwtTokenAuth
 from . import app
-from .utils import applyImagesToItems
+from .utils import applyImagesToItems, parse_image_format
 
+EXPLORE_DEFAULT_PAGE_SIZE = 50
+EXPLORE_MAX_PAGE_SIZE = 100
 
-@BlacklistJwtTokenAuth(on_fail=auth_fail)
+
+@BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
 @app.get("/explore/item")
 def user_explore(
         token_data: BlacklistJwtTokenAuth,
         radius: QueryParameter("radius", int),
         lat: QueryParameter("lat", float),
         lng: QueryParameter("lng", float),
+        image_format: QueryParameter("image_format", str),
+        variant: QueryParameter("variant", str),
+        limit: QueryParameter("limit", int),
+        cursor: QueryParameter("cursor", str),
         response: HttpResponse
 ):
-    user: User = token_data
     loc = parse_and_validate_query_location([lat, lng])
     if loc is None:
         response.status = HttpStatus.BAD_REQUEST
@@ -26,22 +38,38 @@ def user_explore(
             'error': "Must provide a valid 'radius_center' query parameter (type list)"
         }
 
-    vicinity_items = search_radius_collection(loc, radius, items_collection)
-    items = list(map(lambda doc: Item.document_repr_to_object(doc), vicinity_items))
-    items = applyImagesToItems(*items)
-    return items
+    try:
+        vicinity_items, next_cursor = search_radius_collection(
+            loc, radius, items_collection, limit, decode_cursor(cursor), projection=ItemSummary.PROJECTION
+        )
+    except ValueError:
+        response.status = HttpStatus.BAD_REQUEST
+        return {
+            'error': "Invalid 'cursor' query parameter"
+        }
+
+    items = list(map(lambda doc: ItemSummary.document_repr_to_object(doc), vicinity_items))
+    items = applyImagesToItems(*items, image_format=parse_image_format(image_format), variant=Image.parse_variant(variant))
+    if limit is None and cursor is None:
+        return items
 
+    return {
+        "results": items,
+        "cursor": next_cursor
+    }
 
-@BlacklistJwtTokenAuth(on_fail=auth_fail)
+
+@BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
 @app.get("/explore/business")
 def user_explore(
         token_data: BlacklistJwtTokenAuth,
         radius: QueryParameter("radius", int),
         lat: QueryParameter("lat", float),
         lng: QueryParameter("lng", float),
+        limit: QueryParameter("limit", int),
+        cursor: QueryParameter("cursor", str),
         response: HttpResponse
 ):
-    user: User = token_data
     loc = parse_and_validate_query_location([lat, lng])
     if loc is None:
         response.status = HttpStatus.BAD_REQUEST
@@ -49,15 +77,31 @@ def user_explore(
             'error': "Must provide a valid 'radius_center' query parameter (type list)"
         }
 
-    vicinity_businesses = search_radius_collection(loc, radius, businesses_collection)
-    return list(map(lambda doc: Business.document_repr_to_object(doc), vicinity_businesses))
+    try:
+        vicinity_businesses, next_cursor = search_radius_collection(loc, radius, businesses_collection, limit, decode_cursor(cursor))
+    except ValueError:
+        response.status = HttpStatus.BAD_REQUEST
+        return {
+            'error': "Invalid 'cursor' query parameter"
+        }
+
+    businesses = list(map(lambda doc: Business.document_repr_to_object(doc), vicinity_businesses))
+    if limit is None and cursor is None:
+        return businesses
 
+    return {
+        "results": businesses,
+        "cursor": next_cursor
+    }
 
-@BlacklistJwtTokenAuth(on_fail=auth_fail)
+
+@BlacklistJwtTokenAuth(on_fail=auth_fail, token_only=True)
 @app.get("/search")
 def user_feed(
         token_data: BlacklistJwtTokenAuth,
         query: QueryParameter("query", str),
+        image_format: QueryParameter("image_format", str),
+        variant: QueryParameter("variant", str),
         response: HttpResponse
 ):
     # TODO: Partial text search
@@ -67,34 +111,147 @@ def user_feed(
             'error': "Must provide a valid 'query' query parameter (type list)"
         }
 
-    search_result = items_collection.find({
-        "$text": {
-            "$search": query
-        }
-    }, {"score": {"$meta": "textScore"}})
-
-    search_result = search_result.sort([("score", {"$meta": "textScore"})])
-    items = list(map(lambda doc: Item.document_repr_to_object(doc), search_result))
-    return applyImagesToItems(*items)
+    items = ItemSummary.get_summaries(
+        {"$match": {"$text": {"$search": query}}},
+        {"$sort": {"score": {"$meta": "textScore"}}},
+    )
+    return applyImagesToItems(*items, image_format=parse_image_format(image_format), variant=Image.parse_variant(variant))
 
 
 def search_radius_collection(
         location: List[float],
         radius: float,
-        collection
+        collection,
+        limit: int = None,
+        cursor: tuple = None,
+        projection: dict = None
 ):
-    # location = [location[0], location[1]]
-    return collection.find({
-        "loc": {
-            "$nearSphere": {
-                "$geometry": {
-                    "type": "Point",
-                    "coordinates": location
-                },
-                "$maxDistance": (radius if radius is not None else 1000) + 1000  # add to radius to account for inaccuracies
-            }
-        }
-    })
+    """
+    Finds the documents in the radius ordered by distance, ties broken by _id. Every path ranks with spherical_distance so
+    a cursor compares exactly against the distances of whichever path serves the next page.
+    :param limit: page size, every document in the radius when neither limit nor cursor is given
+    :param cursor: (distance, _id) of the last document of the previous page
+    :param projection: $project stage applied to the page, must keep the dst field
+    :return: the page's documents and the cursor of the next page, None on the last page
+    """
+    if isinstance(limit, int):
+        limit = min(max(limit, 1), EXPLORE_MAX_PAGE_SIZE)
+    elif cursor is not None:
+        limit = EXPLORE_DEFAULT_PAGE_SIZE
+    max_distance = (radius if radius is not None else 1000) + 1000  # add to radius to account for inaccuracies
+    # one more than the page tells whether another page follows
+    ranked_limit = limit + 1 if limit is not None else None
+
+    spatial_index = spatial_indexes.get(collection)
+    ranked = spatial_index.query(location, max_distance, cursor, ranked_limit) if spatial_index is not None else None
+    if ranked is not None:
+        return page_from_ranked(ranked, collection, limit, projection)
+
+    candidates = geo_cache.candidates(
+        collection, location, max_distance,
+        lambda center, reach, candidate_limit: find_in_radius(center, reach, collection, candidate_limit)
+    )
+    if candidates is not None:
+        return page_from_candidates(location, max_distance, candidates, collection, limit, cursor, projection)
+
+    geo_near = {
+        "near": {
+            "type": "Point",
+            "coordinates": location
+        },
+        "distanceField": "dst",
+        "maxDistance": max_distance + DISTANCE_ERROR_MARGIN,
+        "spherical": True
+    }
+    if cursor is not None:
+        geo_near["minDistance"] = max(cursor[0] - DISTANCE_ERROR_MARGIN, 0)
+
+    ranked = []
+    with collection.aggregate([{"$geoNear": geo_near}, {"$project": {"loc": 1, "dst": 1}}]) as docs:
+        for doc in docs:
+            # documents arrive closest first by Mongo's distance, once it is past the last ranked one no later document ranks
+            if ranked_limit is not None and len(ranked) == ranked_limit and doc["dst"] - DISTANCE_ERROR_MARGIN > ranked[-1][0]:
+                break
+
+            distance = spherical_distance(location, doc["loc"]["coordinates"])
+            if distance <= max_distance and (cursor is None or (distance, doc["_id"]) > cursor):
+                bisect.insort(ranked, (distance, doc["_id"]))
+                if ranked_limit is not None:
+                    del ranked[ranked_limit:]
+
+    return page_from_ranked(ranked, collection, limit, projection)
+
+
+def find_in_radius(location: List[float], radius: float, collection, limit: int) -> List[dict]:
+    """
+    :return: the _id and loc of up to limit documents in the radius, closest first
+    """
+    return list(collection.aggregate([
+        {"$geoNear": {"near": {"type": "Point", "coordinates": location}, "distanceField": "dst", "maxDistance": radius, "spherical": True}},
+        {"$limit": limit},
+        {"$project": {"loc": 1}},
+    ]))
+
+
+def page_from_candidates(
+        location: List[float],
+        max_distance: float,
+        candidates: List[tuple],
+        collection,
+        limit: int = None,
+        cursor: tuple = None,
+        projection: dict = None
+):
+    """
+    Same as search_radius_collection, ranking cached candidates in process and reading only the page's documents from Mongo.
+    """
+    ranked = sorted(
+        (distance, _id) for distance, _id in ((spherical_distance(location, coordinates), _id) for _id, coordinates in candidates)
+        if distance <= max_distance and (cursor is None or (distance, _id) > cursor)
+    )
+
+    return page_from_ranked(ranked, collection, limit, projection)
+
+
+def page_from_ranked(ranked: List[tuple], collection, limit: int = None, projection: dict = None):
+    """
+    Reads the documents of one page from ranked (distance, _id) pairs following the cursor, closest first.
+    :param limit: page size, every ranked document when None
+    """
+    page = ranked[:limit] if limit is not None else ranked
+    pipeline = [{"$match": {"_id": {"$in": [_id for _, _id in page]}}}]
+    if projection is not None:
+        pipeline.append({"$project": projection})
+
+    docs = {doc["_id"]: doc for doc in collection.aggregate(pipeline)}
+    results = []
+    for distance, _id in page:
+        if _id in docs:
+            docs[_id]["dst"] = distance
+            results.append(docs[_id])
+
+    if limit is None or len(ranked) <= limit:
+        return results, None
+
+    return results, encode_cursor(*page[-1])
+
+
+def encode_cursor(distance: float, last_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"d": distance, "id": str(last_id)}).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    :raises ValueError: if the cursor is malformed
+    """
+    if cursor is None:
+        return None
+
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(data["d"]), ObjectId(data["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
 
 
 def parse_and_validate_query_location(location: List[str]):
@@ -7,7 +7,7 @@ from security import BlacklistJwtTokenAuth
 
 class AddressController:
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, fields=("shipping_addresses",))
     @app.get("/user/address")
     def get_addresses(
             jwt_res: BlacklistJwtTokenAuth,
@@ -16,7 +16,7 @@ class AddressController:
         return user.shipping_addresses
 
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, fields=("shipping_addresses",))
     @app.post("/user/address")
     def add_address(
             jwt_res: BlacklistJwtTokenAuth,
@@ -24,12 +24,12 @@ class AddressController:
             res: HttpResponse,
     ):
         user: User = jwt_res
-        result = user.add_address(address)
+        result = user.add_address(address, fields=("shipping_addresses",))
         res.status = HttpStatus.CREATED
         return result.shipping_addresses
 
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, fields=("shipping_addresses",))
     @app.delete("/user/address")
     def delete_address(
             jwt_res: BlacklistJwtTokenAuth,
@@ -53,4 +53,4 @@ class AddressController:
                 'error': f'Must be an index between 0 and {len(user.shipping_addresses) - 1}'
             }
 
-        return user.remove_address(index).shipping_addresses
+        return user.remove_address(index, fields=("shipping_addresses",)).shipping_addresses
@@ -8,7 +8,7 @@ from security import BlacklistJwtTokenAuth
 
 class CartController:
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, fields=("cart",))
     @app.get("/user/cart")
     def get_cart_items_detailed(
             jwt_res: BlacklistJwtTokenAuth,
@@ -17,7 +17,7 @@ class CartController:
         return user.cart
 
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, fields=("cart",))
     @app.delete("/user/cart")
     def delete_items(
             jwt_res: BlacklistJwtTokenAuth,
@@ -26,11 +26,11 @@ class CartController:
     ):
         user: User = jwt_res
 
-        user.cart.mass_remove(body)
+        user.cart.mass_remove(body, return_result=False)
         res.status = HttpStatus.NO_CONTENT
 
     @staticmethod
-    @BlacklistJwtTokenAuth(on_fail=auth_fail)
+    @BlacklistJwtTokenAuth(on_fail=auth_fail, fields=("cart",))
     @app.post("/user/cart")
     def replace_cart_items(
             jwt_res: BlacklistJwtTokenAuth,
@@ -52,6 +52,6 @@ class CartController:
             ),
         ), body))
 
-        result = user.cart.replace_items(cart_items).cart
+        result = user.cart.replace_items(cart_items, fields=("cart",)).cart
         res.status = HttpStatus.CREATED
         return result
@@ -132,10 +132,10 @@ class OrderController:
 
         order = Order.save(order)
         for business_id in business_ids:
-            Business.add_order_by_id(ObjectId(business_id), order.id)
+            Business.add_order_by_id(ObjectId(business_id), order.id, return_result=False)
 
-        user.order_history.add_order(order.id)
-        user.cart.replace_items([])
+        user.order_history.add_order(order.id, return_result=False)
+        user.cart.replace_items([], return_result=False)
 
         res.status = HttpStatus.CREATED
         return order
@@ -96,7 +96,7 @@ class UserAuthController:
             response.status = HttpStatus.UNAUTHORIZED
             return f"No user found with email {parsed_token['email']}"
 
-        user = user.update_password(new_password)
+        user = user.update_password(new_password, fields=())
         access_token_blacklist.add_to_blacklist(temporary_auth_token)
 
         return {
@@ -138,7 +138,7 @@ class UserAuthController:
                 "error": "New password must be different"
             }
 
-        user = user.update_password(new_password)
+        user = user.update_password(new_password, fields=())
         return {
             "access_token": user.build_access_token(sign=True)
         }
@@ -2,14 +2,16 @@ import base64
 from typing import Union
 
 from bson import ObjectId
-from web_framework_v2 import RequestBody, QueryParameter, ContentType, HttpResponse, HttpStatus
+from web_framework_v2 import RequestBody, QueryParameter, ContentType, HttpRequest, HttpResponse, HttpStatus
 
-from api import auth_fail
+from api import auth_fail, PROFILE_PICTURE_AWS_FOLDER
+from api.api_utils import upload_too_large
 from body import UserSettings
-from database import User, BusinessUser, Image, items_collection, Unit, Item, Order
+from database import User, BusinessUser, Image, Unit, Item, Order, s3Bucket, InvalidImageError
+from database.business.item.item_metrics import ItemMetrics
 from security import BlacklistJwtTokenAuth
 from .. import app
-from ..utils import applyImagesToItems
+from ..utils import applyImagesToItems, parse_image_format, format_image
 
 
 class UserData:
@@ -22,17 +24,18 @@ class UserData:
     @app.get("/user")
     def get_user_data(
             user: BlacklistJwtTokenAuth,
+            image_format: QueryParameter("image_format", str),
     ):
         user: Union[User, BusinessUser] = user
+        image_format = parse_image_format(image_format)
         result = user.__getstate__()
 
         if user.is_system_admin:
             result["is_system_admin"] = True
 
-        result["liked_items"] = applyImagesToItems(*Item.get_items(*user.liked_items._liked_items))
+        result["liked_items"] = applyImagesToItems(*Item.get_items(*user.liked_items._liked_items), image_format=image_format)
 
-        result['profile_picture'] = base64.b64encode(user.profile_picture.get_image()).decode(
-            'utf-8') if user.profile_picture is not None and user.profile_picture.image_id is not None else None
+        result['profile_picture'] = format_image(user.profile_picture, image_format)
 
         result['order_history'] = list(map(lambda order: order.__getstate__(), user.order_history.get_orders()))
 
@@ -44,10 +47,12 @@ class UserData:
     def update_user_data(
             user: BlacklistJwtTokenAuth,
             user_settings: RequestBody(UserSettings),
+            image_format: QueryParameter("image_format", str),
             response: HttpResponse,
     ):
         user: Union[User, BusinessUser] = user
         user_settings: UserSettings = user_settings
+        image_format = parse_image_format(image_format)
 
         if user_settings.currency_type is None and user_settings.unit is None and user_settings.email is None and user_settings.phone is None:
             response.status = HttpStatus.BAD_REQUEST
@@ -65,9 +70,8 @@ class UserData:
         user_res = user.update_fields(user_settings.email, user_settings.phone, unit, user_settings.currency_type)
         result = user_res.__getstate__()
 
-        result["liked_items"] = applyImagesToItems(*Item.get_items(*user.liked_items._liked_items))
-        pfp = user.profile_picture.get_image()
-        result['profile_picture'] = base64.b64encode(pfp).decode('utf-8') if pfp is not None else None
+        result["liked_items"] = applyImagesToItems(*Item.get_items(*user.liked_items._liked_items), image_format=image_format)
+        result['profile_picture'] = format_image(user.profile_picture, image_format)
         result['order_history'] = list(map(lambda order: order.__getstate__(), user.order_history.get_orders()))
 
         return result
@@ -77,20 +81,35 @@ class UserData:
     @app.post("/user/profile_picture")
     def update_profile_picture(
             user: BlacklistJwtTokenAuth,
-            pfp_data: RequestBody(raw_format=True)
+            pfp_data: RequestBody(raw_format=True),
+            req: HttpRequest,
+            res: HttpResponse
     ):
         user: User = user
+        if upload_too_large(req, res, len(pfp_data) if pfp_data is not None else None):
+            return {
+                "error": f"Image must be at most {s3Bucket.max_upload_bytes} bytes"
+            }
+
         pfp = None if pfp_data is None or len(pfp_data) == 0 else pfp_data
+        try:
+            # uploaded before the old picture is deleted, so an undecodable image keeps it
+            image = Image.upload(pfp, folder_name=PROFILE_PICTURE_AWS_FOLDER) if pfp is not None else None
+        except InvalidImageError as e:
+            res.status = HttpStatus.BAD_REQUEST
+            return {
+                "error": str(e)
+            }
+
         if user.profile_picture is not None and user.profile_picture.image_id is not None:
             user.profile_picture.delete_image()
-            user.update_profile_picture(None)
+            user.update_profile_picture(None, return_result=False)
             if pfp is None:
                 return {
                     "image": None
                 }
 
-        image = Image.upload(pfp, folder_name="profiles/") if pfp is not None else None
-        user.update_profile_picture(image)
+        user.update_profile_picture(image, return_result=False)
 
         return {
             "image": base64.b64encode(pfp_data).decode('utf-8')
@@ -128,8 +147,13 @@ class UserData:
                 item.images = []
             return items
 
-        user.liked_items.add_liked_items(item_id)
-        items_collection.update_one({"_id": item_id}, {"$inc": {"mtc.lks": 1}})
+        if not ItemMetrics.record(item_id, "likes"):
+            res.status = HttpStatus.NOT_FOUND
+            return {
+                "error": f"Item with id {item_id} does not exist"
+            }
+
+        user.liked_items.add_liked_items(item_id, return_result=False)
         get_item_models = get_item_models if get_item_models is not None and isinstance(get_item_models,
                                                                                         bool) else False
 
@@ -161,8 +185,8 @@ class UserData:
                 item.images = []
             return items
 
-        user = user.liked_items.remove_liked_item(item_id)
-        items_collection.update_one({"_id": item_id}, {"$inc": {"mtc.lks": -1}})
+        user = user.liked_items.remove_liked_item(item_id, fields=("liked_items",))
+        ItemMetrics.record(item_id, "likes", -1)
         get_item_models = get_item_models if get_item_models is not None and isinstance(get_item_models,
                                                                                         bool) else False
 
@@ -1,23 +1,119 @@
 import base64
+import os
+from enum import Enum
 
-from database import Item, s3Bucket
+from database import Item, Image, ImageVariant, s3Bucket
 
+IMAGE_RESPONSE_BYTE_BUDGET = int(os.getenv("IMAGE_RESPONSE_BYTE_BUDGET", 32 * 1024 * 1024))
+IMAGE_FETCH_BATCH_SIZE = int(os.getenv("IMAGE_FETCH_BATCH_SIZE", 32))
+
+
+class ImageFormat(Enum):
+    """
+    How images are embedded in a response. Base64 inlines the image bytes, Key returns the S3 key to be fetched via /image
+    and Url returns a pre-signed S3 url.
+    """
+    Base64 = "base64"
+    Key = "key"
+    Url = "url"
+
+
+def parse_image_format(image_format) -> ImageFormat:
+    if image_format is None:
+        return ImageFormat.Base64
+
+    try:
+        return ImageFormat(str(image_format).lower())
+    except ValueError:
+        return ImageFormat.Base64
+
+
+def format_image(image: Image, image_format: ImageFormat, data: bytes = None, variant: ImageVariant = None):
+    """
+    Formats a single image for a response.
+    :param data: image bytes, fetched from S3 when not passed and image_format is Base64
+    :param variant: sized variant to reference, the original image when None
+    """
+    if image is None or image.image_id is None:
+        return None
+
+    if image_format == ImageFormat.Key:
+        return image.variant_id(variant)
+    elif image_format == ImageFormat.Url:
+        return s3Bucket.get_url(image.variant_id(variant))
+
+    data = data if data is not None else image.get_image(variant)
+    return base64.b64encode(data).decode('utf-8') if data is not None else None
+
+
+def fetch_images(*keys: str, variant: ImageVariant = None) -> dict:
+    """
+    Fetches images concurrently on the shared S3 executor, falling back to the original for images uploaded before variants existed.
+    :return: map of key to image bytes, None for images that could not be fetched
+    """
+    variant_keys = [Image.build_variant_id(key, variant) for key in keys]
+    images = dict.fromkeys(keys)
+
+    missing_variants = []
+    variant_to_key = dict(zip(variant_keys, keys))
+    for variant_key, data in s3Bucket.fetch_all(*variant_to_key):
+        key = variant_to_key[variant_key]
+        if not isinstance(data, Exception):
+            images[key] = data
+        elif key != variant_key:
+            missing_variants.append(key)
+
+    for key, data in s3Bucket.fetch_all(*missing_variants):
+        images[key] = data if not isinstance(data, Exception) else None
+
+    return images
+
+
+def resolve_images(*keys: str, variant: ImageVariant = None, byte_budget: int = None) -> dict:
+    """
+    Fetches each distinct image once, in the order given and in batches of IMAGE_FETCH_BATCH_SIZE.
+    Once byte_budget bytes were resolved the remaining images are not fetched.
+    :param byte_budget: defaults to IMAGE_RESPONSE_BYTE_BUDGET
+    :return: map of key to base64 image, None for images that failed or did not fit the budget
+    """
+    byte_budget = byte_budget if byte_budget is not None else IMAGE_RESPONSE_BYTE_BUDGET
+    unique_keys = list(dict.fromkeys(key for key in keys if key is not None))
+
+    result = {}
+    used_bytes = 0
+    for start in range(0, len(unique_keys), IMAGE_FETCH_BATCH_SIZE):
+        batch = unique_keys[start:start + IMAGE_FETCH_BATCH_SIZE]
+        if used_bytes >= byte_budget:
+            result.update(dict.fromkeys(batch))
+            continue
+
+        images = fetch_images(*batch, variant=variant)
+        for key in batch:
+            data = images[key]
+            if data is None or used_bytes + len(data) > byte_budget:
+                result[key] = None
+                continue
+
+            used_bytes += len(data)
+            result[key] = base64.b64encode(data).decode('utf-8')
+
+    return result
+
+
+def applyImagesToItems(*items: Item, image_format: ImageFormat = ImageFormat.Base64, variant: ImageVariant = None):
+    if image_format != ImageFormat.Base64:
+        for item in items:
+            item.images = list(map(lambda image: format_image(image, image_format, variant=variant), item.images))
+
+        return items
 
-def applyImagesToItems(*items: Item):
     image_ids = []
     for item in items:
         for image in item.images:
             image_ids.append(image.image_id)
 
-    images = {}
-    for key, image in s3Bucket.fetch_all(*image_ids):
-        images[key] = image
-
+    images = resolve_images(*image_ids, variant=variant)
     for item in items:
-        sorted_images = []
-        for image_key in item.images:
-            res = images.get(str(image_key))
-            sorted_images.append(base64.b64encode(res).decode('utf-8'))
-        item.images = sorted_images
+        item.images = list(map(lambda image: images.get(image.image_id), item.images))
 
     return items
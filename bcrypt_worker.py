@@ -0,0 +1,13 @@
+"""
+Functions run by the password hasher's worker processes. Workers import this module by name, so it must only import bcrypt:
+anything heavier, like the database package, would be imported again in every worker.
+"""
+import bcrypt
+
+
+def hash_password(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def check_password(password: bytes, hashed_password: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed_password)
@@ -45,7 +45,8 @@ class ItemUpdate:
 
 
 class Review:
-    def __init__(self, rating: float, text_content: str, images: List[str]):
+    def __init__(self, rating: float, text_content: str, images: List[str], image_ids: List[str] = None):
         self.rating = rating
         self.text_content = text_content
         self.images = images
+        self.image_ids = image_ids
@@ -1,13 +1,313 @@
+import hashlib
+import io
+import logging
 import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from concurrent import futures
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from boto3_type_annotations.s3 import Client
+from botocore.config import Config
 from botocore.response import StreamingBody
 
 from singleton import Singleton
 
+logger = logging.getLogger(__name__)
+
+
+class S3Cache:
+    """
+    Two tiered cache for S3 objects. Keys are uuid4 based and never rewritten so entries are only removed on eviction or deletion.
+    The memory tier is an LRU bounded by total bytes, the disk tier is optional and bounded by total directory size.
+    """
+
+    def __init__(self, memory_max_bytes: int, disk_directory: str = None, disk_max_bytes: int = 0):
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_max_object_bytes = memory_max_bytes // 8
+        self.disk_directory = disk_directory
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+
+        if self.disk_enabled:
+            os.makedirs(self.disk_directory, exist_ok=True)
+            self._load_disk_index()
+
+    @property
+    def disk_enabled(self) -> bool:
+        return self.disk_directory is not None and self.disk_max_bytes > 0
+
+    def get(self, key: str):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock:
+                self._put_memory(key, data)
+
+        return data
+
+    def put(self, key: str, data: bytes):
+        if key is None or data is None:
+            return
+
+        with self._lock:
+            self._put_memory(key, data)
+
+        self._write_disk(key, data)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            data = self._memory.pop(key, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+
+            file_name = self._file_name(key)
+            size = self._disk.pop(file_name, None)
+            if size is not None:
+                self._disk_bytes -= size
+
+        if size is not None:
+            self._remove_file(file_name)
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_max_object_bytes:
+            return
+
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read_disk(self, key: str):
+        if not self.disk_enabled:
+            return None
+
+        file_name = self._file_name(key)
+        with self._lock:
+            if file_name not in self._disk:
+                return None
+            self._disk.move_to_end(file_name)
+
+        try:
+            with open(os.path.join(self.disk_directory, file_name), "rb") as file:
+                return file.read()
+        except OSError:
+            with self._lock:
+                size = self._disk.pop(file_name, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+
+    def _write_disk(self, key: str, data: bytes):
+        if not self.disk_enabled or len(data) > self.disk_max_bytes:
+            return
+
+        file_name = self._file_name(key)
+        path = os.path.join(self.disk_directory, file_name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed writing {key} to disk cache: {e}")
+            self._remove_file(os.path.basename(temp_path))
+            return
+
+        evicted = []
+        with self._lock:
+            previous = self._disk.pop(file_name, None)
+            if previous is not None:
+                self._disk_bytes -= previous
+
+            self._disk[file_name] = len(data)
+            self._disk_bytes += len(data)
+
+            while self._disk_bytes > self.disk_max_bytes:
+                evicted_name, evicted_size = self._disk.popitem(last=False)
+                self._disk_bytes -= evicted_size
+                evicted.append(evicted_name)
+
+        for evicted_name in evicted:
+            self._remove_file(evicted_name)
+
+    def _load_disk_index(self):
+        entries = []
+        for entry in os.scandir(self.disk_directory):
+            if not entry.is_file():
+                continue
+
+            if entry.name.endswith(".tmp"):
+                self._remove_file(entry.name)
+                continue
+
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_bytes += size
+
+        while self._disk_bytes > self.disk_max_bytes:
+            evicted_name, evicted_size = self._disk.popitem(last=False)
+            self._disk_bytes -= evicted_size
+            self._remove_file(evicted_name)
+
+    def _remove_file(self, file_name: str):
+        try:
+            os.remove(os.path.join(self.disk_directory, file_name))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _file_name(key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()
+
+
+class S3Metrics:
+    """
+    Counters for the shared S3 executor and for fetches that went to S3.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.max_queued = 0
+        self.active = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.fetch_seconds_total = 0.0
+        self.fetch_seconds_max = 0.0
+
+    def task_queued(self):
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def task_started(self):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+
+    def task_finished(self):
+        with self._lock:
+            self.active -= 1
+
+    def task_rejected(self):
+        with self._lock:
+            self.queued -= 1
+            self.rejected += 1
+
+    def cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def fetch_finished(self, seconds: float, failed: bool = False):
+        with self._lock:
+            self.fetches += 1
+            self.fetch_errors += 1 if failed else 0
+            self.fetch_seconds_total += seconds
+            self.fetch_seconds_max = max(self.fetch_seconds_max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self.queued,
+                "max_queue_depth": self.max_queued,
+                "active": self.active,
+                "rejected": self.rejected,
+                "cache_hits": self.cache_hits,
+                "fetches": self.fetches,
+                "fetch_errors": self.fetch_errors,
+                "fetch_latency_avg_ms": (self.fetch_seconds_total / self.fetches) * 1000 if self.fetches > 0 else 0,
+                "fetch_latency_max_ms": self.fetch_seconds_max * 1000,
+            }
+
+
+class UploadTooLargeError(ValueError):
+    def __init__(self, max_size: int):
+        super().__init__(f"Upload exceeds the maximum size of {max_size} bytes")
+        self.max_size = max_size
+
+
+class S3UploadError(RuntimeError):
+    def __init__(self, failed: dict):
+        super().__init__(f"Failed to upload {len(failed)} objects: " + ", ".join(f"{key}: {e}" for key, e in failed.items()))
+        self.failed = failed
+
+    @property
+    def failed_keys(self):
+        return list(self.failed.keys())
+
+
+class LimitedReader(io.RawIOBase):
+    """
+    File-like view over a file object or an iterable of byte chunks which raises UploadTooLargeError
+    as soon as more than max_size bytes were read, so oversized bodies are rejected before being fully consumed.
+    """
+
+    def __init__(self, body, max_size: int):
+        self.max_size = max_size
+        self.read_bytes = 0
+        self._file = body if hasattr(body, "read") else None
+        self._chunks = iter(body) if self._file is None else None
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if self._file is not None:
+            data = self._file.read(size)
+        else:
+            data = self._read_chunks(size)
+
+        self.read_bytes += len(data)
+        if self.read_bytes > self.max_size:
+            raise UploadTooLargeError(self.max_size)
+
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _read_chunks(self, size: int) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        if size < 0:
+            size = len(self._buffer)
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
 
 class S3Bucket(metaclass=Singleton):
     def __init__(self):
@@ -15,55 +315,236 @@ class S3Bucket(metaclass=Singleton):
         aws_secret_key = os.getenv("AWS_SECRET_KEY")
         self.bucket_name = os.getenv("AWS_BUCKET_NAME")
 
+        self.pool_size = int(os.getenv("S3_POOL_SIZE", 16))
+        self.pool_queue_size = int(os.getenv("S3_POOL_QUEUE_SIZE", self.pool_size * 16))
+
         self.client: Client = boto3.client(
             's3',
             region_name="eu-central-1",
             aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key
+            aws_secret_access_key=aws_secret_key,
+            endpoint_url=os.getenv("AWS_S3_ENDPOINT_URL"),  # S3 compatible stand-in such as moto server or MinIO
+            config=Config(max_pool_connections=self.pool_size)
+        )
+
+        self.cache = S3Cache(
+            memory_max_bytes=int(os.getenv("S3_CACHE_MEMORY_MAX_BYTES", 64 * 1024 * 1024)),
+            disk_directory=os.getenv("S3_CACHE_DIR"),
+            disk_max_bytes=int(os.getenv("S3_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)),
+        )
+        self.signed_url_expiration = int(os.getenv("S3_SIGNED_URL_EXPIRATION", 60 * 60))
+        self.max_upload_bytes = int(os.getenv("S3_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+
+        # shared by every request, the semaphore bounds the executor's otherwise unbounded work queue.
+        # submitting blocks while pool_size tasks run and pool_queue_size more are waiting.
+        self.executor = futures.ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="s3")
+        self._executor_slots = threading.BoundedSemaphore(self.pool_size + self.pool_queue_size)
+        self.metrics = S3Metrics()
+
+        multipart_chunk_size = int(os.getenv("S3_MULTIPART_CHUNK_BYTES", 8 * 1024 * 1024))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_chunk_size,
+            multipart_chunksize=multipart_chunk_size,
+            use_threads=False,
         )
 
     def get(self, key: str):
         return self.fetch(key)
 
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+    def submit(self, fn, *args) -> futures.Future:
+        """
+        Runs fn on the shared executor, blocking while its queue is full.
+        """
+        self._executor_slots.acquire()
+        self.metrics.task_queued()
+
+        def run():
+            self.metrics.task_started()
+            try:
+                return fn(*args)
+            finally:
+                self.metrics.task_finished()
+
+        try:
+            future = self.executor.submit(run)
+        except Exception:
+            self.metrics.task_rejected()
+            self._executor_slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._executor_slots.release())
+        return future
+
+    def get_url(self, key: str, expiration: int = None):
+        """
+        Builds a pre-signed GET url so clients can download an object directly from S3.
+        :param key: object key
+        :param expiration: url lifetime in seconds, defaults to S3_SIGNED_URL_EXPIRATION
+        """
+        if key is None:
+            return None
+
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket_name, "Key": key},
+            ExpiresIn=expiration if expiration is not None else self.signed_url_expiration
+        )
+
     def upload(self, data: bytes, key: str = None, content_type: str = "image/png"):
         if key is None:
             key = str(uuid.uuid4())
 
+        self.check_upload_size(len(data))
+
         try:
-            self.client.put_object(Key=key, Bucket=self.bucket_name, Body=data, ContentType=content_type)
+            if len(data) > self.transfer_config.multipart_threshold:
+                self.upload_stream(io.BytesIO(data), key, content_type)
+            else:
+                self.client.put_object(Key=key, Bucket=self.bucket_name, Body=data, ContentType=content_type)
         except Exception as e:
             raise e
 
+        self.cache.put(key, data)
+
+    def upload_all(self, *uploads: tuple) -> list:
+        """
+        Uploads objects concurrently. When any upload fails the objects that were uploaded are deleted again.
+        :param uploads: (data, key, content_type) tuples, content_type is optional
+        :return: the uploaded keys in order
+        :raises S3UploadError: with the keys that failed to upload
+        """
+        uploads = [(data, key if key is not None else str(uuid.uuid4()), *rest) for data, key, *rest in uploads]
+        for data, *_ in uploads:
+            self.check_upload_size(len(data))
+
+        future_to_key = {}
+        try:
+            for upload in uploads:
+                future_to_key[self.submit(self.upload, *upload)] = upload[1]
+        except Exception:
+            # the uploads submitted before the failure still run, they are awaited and deleted again
+            self._roll_back(S3Bucket._await_uploads(future_to_key)[0])
+            raise
+
+        uploaded, failed = S3Bucket._await_uploads(future_to_key)
+        if len(failed) > 0:
+            self._roll_back(uploaded)
+            raise S3UploadError(failed)
+
+        return [key for _, key, *_ in uploads]
+
+    @staticmethod
+    def _await_uploads(future_to_key: dict) -> tuple:
+        """
+        :return: the uploaded keys and a map of the keys that failed to their exception
+        """
+        uploaded = []
+        failed = {}
+        for future in futures.as_completed(future_to_key):
+            key = future_to_key[future]
+            exception = future.exception()
+
+            if not exception:
+                uploaded.append(key)
+            else:
+                failed[key] = exception
+
+        return uploaded, failed
+
+    def _roll_back(self, keys: list):
+        for key in keys:
+            try:
+                self.delete(key)
+            except Exception as e:
+                logger.warning(f"Failed rolling back upload of {key}: {e}")
+
+    def upload_stream(self, body, key: str = None, content_type: str = "image/png", max_size: int = None) -> str:
+        """
+        Uploads a file-like object or an iterable of byte chunks without buffering it whole.
+        Bodies larger than S3_MULTIPART_CHUNK_BYTES are sent as a multipart upload, which is aborted if the body exceeds max_size.
+        :param max_size: maximum body size in bytes, defaults to S3_MAX_UPLOAD_BYTES
+        :return: the uploaded key
+        """
+        if key is None:
+            key = str(uuid.uuid4())
+
+        reader = LimitedReader(body, max_size if max_size is not None else self.max_upload_bytes)
+        self.client.upload_fileobj(
+            reader,
+            self.bucket_name,
+            key,
+            ExtraArgs={"ContentType": content_type},
+            Config=self.transfer_config
+        )
+
+        return key
+
+    def check_upload_size(self, size: int, max_size: int = None):
+        max_size = max_size if max_size is not None else self.max_upload_bytes
+        if size is not None and size > max_size:
+            raise UploadTooLargeError(max_size)
+
     def delete(self, key: str, folder_prefix: str = ""):
         try:
             self.client.delete_object(Bucket=self.bucket_name, Key=folder_prefix + key)
         except Exception as e:
             raise e
+        finally:
+            self.cache.invalidate(folder_prefix + key)
 
     def fetch(self, key):
         if key is None:
             return
 
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.metrics.cache_hit()
+            return cached
+
+        start = time.perf_counter()
         try:
             res: StreamingBody = self.client.get_object(Bucket=self.bucket_name, Key=key)["Body"]
-            return res.read()
+            data = res.read()
         except Exception as e:
+            self.metrics.fetch_finished(time.perf_counter() - start, failed=True)
             print(f"error accessing {key}")
             raise e
 
+        self.metrics.fetch_finished(time.perf_counter() - start)
+        self.cache.put(key, data)
+        return data
+
     def fetch_all(self, *keys):
-        with futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_key = {executor.submit(self.fetch, key): key for key in keys}
+        """
+        Fetches keys concurrently on the shared executor, cached keys are yielded first.
+        :return: generator of (key, data) tuples in completion order, data is the raised exception when a fetch failed
+        """
+        missing_keys = []
+        for key in keys:
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                self.metrics.cache_hit()
+                yield key, cached
+            else:
+                missing_keys.append(key)
+
+        if len(missing_keys) == 0:
+            return
+
+        future_to_key = {self.submit(self.fetch, key): key for key in missing_keys}
 
-            for future in futures.as_completed(future_to_key):
+        for future in futures.as_completed(future_to_key):
 
-                key = future_to_key[future]
-                exception = future.exception()
+            key = future_to_key[future]
+            exception = future.exception()
 
-                if not exception:
-                    yield key, future.result()
-                else:
-                    yield key, exception
+            if not exception:
+                yield key, future.result()
+            else:
+                yield key, exception
 
 
 s3Bucket = S3Bucket()
@@ -2,14 +2,18 @@ __all__ = ["DocumentObject", "users_collection", "businesses_collection", "order
            "ShippingAddress", "Order", "OrderItem", "OrderHistory", "ModificationButtonDataType", "SelectedModificationButton", "Image",
            "Color", "ModificationButton", "ModificationButtonSide", "Review", "Item", "ItemStoreFormat", "Location", "Category", "Contact",
            "BusinessUser", "access_token_blacklist_collection", "access_token_blacklist", "Business", "s3Bucket", "Cart", "CartItem",
-           "refresh_token_blacklist", "refresh_token_blacklist_collection", "TokenBlacklist", "items_collection", "unapproved_businesses_collection", "ShippingMethod"]
+           "refresh_token_blacklist", "refresh_token_blacklist_collection", "TokenBlacklist", "items_collection", "unapproved_businesses_collection", "ShippingMethod",
+           "ImageVariant", "InvalidImageError", "UploadTooLargeError", "S3UploadError", "ItemSummary", "ensure_indexes", "MetricsBucket",
+           "reviews_collection", "pending_uploads_collection"]
+
+import os
 
 from pymongo import MongoClient, collection, database, TEXT, GEOSPHERE
 
-from .S3Bucket import s3Bucket
+from .S3Bucket import s3Bucket, UploadTooLargeError, S3UploadError
 from .color import Color
 from .doc_object import DocumentObject
-from .image import Image
+from .image import Image, ImageVariant, InvalidImageError
 from .location import Location
 
 client: database.Database = MongoClient("localhost", 27017)["vivity"]
@@ -23,22 +27,9 @@ access_token_blacklist_collection: collection.Collection = client.access_blackli
 refresh_token_blacklist_collection: collection.Collection = client.refresh_blacklist
 user_auth_collection: collection.Collection = client.user_auth
 cupon_collection: collection.Collection = client.cupon
-
-users_collection.create_index([("ml", 1)], name="email", unique=True)
-items_collection.create_index([("loc", GEOSPHERE)], name="item_location_index", unique=False)
-items_collection.create_index([
-    ("tg", TEXT),
-    ('bnm', TEXT),
-    ("isf.ttl", TEXT),
-    ("isf.stl", TEXT),
-    ("isf.dsc", TEXT),
-    ("cat", TEXT),
-    ("br", TEXT),
-],
-    name="item_text_index",
-    unique=False,
-)
-businesses_collection.create_index([("loc", GEOSPHERE)], name="business_location_index", unique=False)
+metrics_collection: collection.Collection = client.metrics
+reviews_collection: collection.Collection = client.reviews
+pending_uploads_collection: collection.Collection = client.pending_uploads
 
 from .blacklist import TokenBlacklist
 
@@ -55,5 +46,51 @@ refresh_token_blacklist = TokenBlacklist(
 )
 
 
+def ensure_indexes():
+    """
+    Creates the indexes the application relies on, called once on startup so importing the package does not wait on Mongo.
+    """
+    users_collection.create_index([("ml", 1)], name="email", unique=True)
+    items_collection.create_index([("loc", GEOSPHERE)], name="item_location_index", unique=False)
+    items_collection.create_index([
+        ("tg", TEXT),
+        ('bnm', TEXT),
+        ("isf.ttl", TEXT),
+        ("isf.stl", TEXT),
+        ("isf.dsc", TEXT),
+        ("cat", TEXT),
+        ("br", TEXT),
+    ],
+        name="item_text_index",
+        unique=False,
+    )
+    businesses_collection.create_index([("loc", GEOSPHERE)], name="business_location_index", unique=False)
+    metrics_collection.create_index([("bid", 1), ("h", 1)], name="business_hour")
+    metrics_collection.create_index(
+        [("h", 1)], name="retention", expireAfterSeconds=int(os.getenv("METRICS_RETENTION_DAYS", 400)) * 24 * 60 * 60
+    )
+    reviews_collection.create_index([("iid", 1), ("dt", -1), ("_id", -1)], name="item_date")
+    reviews_collection.create_index([("iid", 1), ("pid", 1)], name="item_poster", unique=True)
+    pending_uploads_collection.create_index([("exp", 1)], name="expiration")
+    access_token_blacklist.ensure_indexes()
+    refresh_token_blacklist.ensure_indexes()
+
+
+def schedule_maintenance():
+    """
+    Registers the periodic flushes, evictions and cleanups with the scheduler, called once on startup so importing the
+    package does not start the scheduler's threads.
+    """
+    from .counter_aggregator import counter_aggregator
+    from .geo_cache import geo_cache
+    from .pending_upload import pending_uploads
+    from .user.user_cache import user_cache
+
+    counter_aggregator.schedule()
+    geo_cache.schedule()
+    user_cache.schedule()
+    pending_uploads.schedule()
+
+
 from .user import *
 from database.business import *
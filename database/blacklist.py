@@ -1,98 +1,275 @@
 from __future__ import annotations
 
+import datetime
+import hashlib
 import logging
+import os
 import threading
 import time
-from abc import ABC
 
-from pymongo import ReturnDocument
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
 
-from singleton import Singleton
+from database.bloom_filter import BloomFilter
+from scheduler import scheduler
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+class BlacklistMetrics:
+    """
+    How long revocations made by other processes took to reach this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.mode = None
+        self.propagated = 0
+        self.lag_seconds_total = 0.0
+        self.lag_seconds_max = 0.0
+        self.lag_seconds_last = 0.0
+
+    def propagation_finished(self, lag_seconds: float):
+        lag_seconds = max(0.0, lag_seconds)
+        with self._lock:
+            self.propagated += 1
+            self.lag_seconds_total += lag_seconds
+            self.lag_seconds_max = max(self.lag_seconds_max, lag_seconds)
+            self.lag_seconds_last = lag_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "sync_mode": self.mode,
+                "propagated": self.propagated,
+                "propagation_lag_avg_ms": (self.lag_seconds_total / self.propagated) * 1000 if self.propagated > 0 else 0,
+                "propagation_lag_max_ms": self.lag_seconds_max * 1000,
+                "propagation_lag_last_ms": self.lag_seconds_last * 1000,
+            }
+
+
 class TokenBlacklist():
+    """
+    Revoked tokens, stored as one document per sha256 digest of the token which Mongo deletes once the token expired.
+    Lookups are answered from memory, a bloom filter rejects most tokens before the digest set is consulted.
+    Other processes' revocations are picked up from a change stream, or on a standalone Mongo without change streams by
+    periodically syncing documents added since the last sync.
+    Stored tokens are loaded on first use, the change stream is drained and the set purged by the shared scheduler.
+    """
+    SYNC_INTERVAL = float(os.getenv("BLACKLIST_SYNC_SECONDS", 5))
+    WATCH_INTERVAL = float(os.getenv("BLACKLIST_WATCH_SECONDS", 0.5))
+    BLOOM_CAPACITY = int(os.getenv("BLACKLIST_BLOOM_CAPACITY", 100000))
+    BLOOM_ERROR_RATE = float(os.getenv("BLACKLIST_BLOOM_ERROR_RATE", 0.001))
+
     def __init__(self, collection, expiration_time: int, name: str):
         self.collection = collection
         self.expiration_time = expiration_time
-        self.expiration_time_ns = expiration_time * (10 ** 9)
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._expirations: dict[bytes, float] = {}
+        self._bloom = BloomFilter(self.BLOOM_CAPACITY, self.BLOOM_ERROR_RATE)
+        self._last_sync: datetime.datetime | None = None
+        self._last_purge = time.monotonic()
+        self.metrics = BlacklistMetrics()
+
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._stream = None
+        self._resume_token = None
+        self._task = None
+        self._listeners = []
+
+    def ensure_indexes(self):
+        self.collection.create_index([("exp", ASCENDING)], name="expiration", expireAfterSeconds=0)
+        self.collection.create_index([("added", ASCENDING)], name="added")
 
-        initial_document = self.get_blacklist_document()
-        self._last_purge = initial_document["last_purge"]
-        self._blacklist = set(initial_document["blacklist"].values())
+    def load(self):
+        """
+        Loads the stored tokens and schedules syncing, called on first use.
+        """
+        if self._loaded:
+            return
 
-        self._purge_thread = threading.Thread(name=name, target=lambda: self._purge_handler())
+        with self._load_lock:
+            if self._loaded:
+                return
 
-        self._purge_thread.start()
-        logger.info(f"Initiated blacklist {name} class and started blacklist purge thread.")
-        logger.info(f"Blacklist data: {self._blacklist}")
+            self._migrate_legacy_document()
+            self.sync()
+            self._task = scheduler.every(self.WATCH_INTERVAL, self._drain_change_stream, name=self.name)
+            scheduler.on_shutdown(self._close_change_stream)
+
+            self._loaded = True
+            logger.info(f"Loaded blacklist {self.name} with {len(self._expirations)} tokens.")
+
+    def add_listener(self, listener):
+        """
+        :param listener: called with the digest of every token newly added to this process' blacklist
+        """
+        self._listeners.append(listener)
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
 
     def add_to_blacklist(self, token: str):
-        add_time = int(time.time_ns())
+        self.load()
+        digest = TokenBlacklist.digest(token)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        expiration = now + datetime.timedelta(seconds=self.expiration_time)
 
         self.collection.update_one(
-            {"_id": 1},
-            {"$set": {f"blacklist.{add_time}": token}},
+            {"_id": digest},
+            {"$set": {"exp": expiration, "added": now}},
             upsert=True
         )
 
-        self._blacklist.add(token)
-
-    def remove_before_time(self, epoch_ms_time: int):
-        doc = self.collection.find_one_and_update(
-            {"_id": 1},
-            [{
-                "$replaceWith": {
-                    "last_purge": time.time_ns(),
-                    "blacklist": {
-                        "$arrayToObject": {
-                            "$filter": {
-                                "input": {"$objectToArray": "$$ROOT.blacklist"},
-                                "cond": {
-                                    "$gt": [
-                                        {"$toLong": "$$this.k"},
-                                        epoch_ms_time
-                                    ]
-                                }
-                            }
-                        }
-                    }
-                }
-            }],
-            return_document=ReturnDocument.AFTER
-        )
+        self._add_local(digest, expiration.timestamp())
 
-        self._last_purge = doc["last_purge"]
-        self._blacklist = set(doc["blacklist"].values())
+    def in_blacklist(self, token: str):
+        self.load()
+        digest = TokenBlacklist.digest(token)
+        if digest not in self._bloom:
+            return False
 
-    def _purge_handler(self):
-        while True:
-            wait_time = max(0, int(self.expiration_time - (time.time_ns() - self._last_purge) / (10 ** 9)))
-            logger.debug(f"Time till next purge: {round(wait_time / 60.0, 3)}")
-            time.sleep(wait_time)
-            self.remove_before_time(self.get_time_expiration_time_ago())
-            logger.debug("Purging blacklist!")
+        expiration = self._expirations.get(digest)
+        return expiration is not None and expiration > time.time()
 
-    def get_time_expiration_time_ago(self):
-        curr = time.time_ns()
-        return curr - self.expiration_time_ns
+    def sync(self):
+        """
+        Loads documents added since the previous sync and drops expired tokens from memory.
+        Documents are re-read with an overlap of one sync interval so writes from processes with a slightly behind clock are not missed.
+        """
+        started = datetime.datetime.now(datetime.timezone.utc)
+        query = {"exp": {"$gt": started}}
+        if self._last_sync is not None:
+            query["added"] = {"$gte": self._last_sync - datetime.timedelta(seconds=self.SYNC_INTERVAL)}
 
-    def in_blacklist(self, token: str):
-        return token in self._blacklist
+        for doc in self.collection.find(query, {"exp": 1, "added": 1}):
+            self._add_document(doc)
 
-    def get_blacklist_document(self):
-        blacklist_doc = self.collection.find_one({"_id": 1})
+        self._last_sync = started
+        self._purge_local()
 
-        if blacklist_doc is not None and "blacklist" in blacklist_doc:
-            return blacklist_doc
+    def _add_document(self, doc: dict):
+        expiration = TokenBlacklist._as_utc(doc["exp"])
+        if self._add_local(doc["_id"], expiration.timestamp()) and self._last_sync is not None and doc.get("added") is not None:
+            self.metrics.propagation_finished(time.time() - TokenBlacklist._as_utc(doc["added"]).timestamp())
 
-        return self.collection.find_one_and_update(
-            {"_id": 1},
-            {"$set": {"blacklist": dict(), "last_purge": time.time_ns()}},
-            upsert=True,
-            return_document=ReturnDocument.AFTER
-        )
+    def _add_local(self, digest: bytes, expiration: float) -> bool:
+        """
+        :return: whether the digest was not known to this process before
+        """
+        with self._lock:
+            added = digest not in self._expirations
+            if added:
+                self._bloom.add(digest)
+
+            self._expirations[digest] = expiration
+
+        if added:
+            for listener in self._listeners:
+                listener(digest)
+
+        return added
+
+    @staticmethod
+    def _as_utc(date: datetime.datetime) -> datetime.datetime:
+        return date.replace(tzinfo=datetime.timezone.utc) if date.tzinfo is None else date
+
+    def _purge_local(self):
+        """
+        Drops expired digests, bloom filters can't remove keys so the filter is rebuilt once it holds more expired keys than live
+        ones or grew past its capacity.
+        """
+        now = time.time()
+        self._last_purge = time.monotonic()
+        with self._lock:
+            self._expirations = {digest: expiration for digest, expiration in self._expirations.items() if expiration > now}
+            if self._bloom.count <= max(2 * len(self._expirations), 1) and self._bloom.count <= self._bloom.capacity:
+                return
+
+            bloom = BloomFilter(max(self.BLOOM_CAPACITY, 2 * len(self._expirations)), self.BLOOM_ERROR_RATE)
+            for digest in self._expirations:
+                bloom.add(digest)
+
+            self._bloom = bloom
+
+    def _drain_change_stream(self):
+        """
+        Applies blacklist documents inserted or updated since the previous run. Falls back to polling when the server does not
+        support change streams, a stream that can't be resumed is reopened after a full resync.
+        """
+        try:
+            if self._stream is None:
+                self._open_change_stream()
+
+            change = self._stream.try_next()
+            while change is not None:
+                self._resume_token = self._stream.resume_token
+                if change.get("fullDocument") is not None:
+                    self._add_document(change["fullDocument"])
+
+                change = self._stream.try_next()
+        except OperationFailure as e:
+            self._close_change_stream()
+            if self.metrics.mode is None:
+                logger.info(f"Change streams are unavailable for {self.name}, falling back to polling every {self.SYNC_INTERVAL}s: {e}")
+                self._poll_instead()
+                return
+
+            logger.warning(f"Change stream of {self.name} failed, resyncing: {e}")
+            self._resume_token = None
+        except PyMongoError as e:
+            logger.warning(f"Change stream of {self.name} was interrupted, reopening: {e}")
+            self._close_change_stream()
+
+        if time.monotonic() - self._last_purge >= self.SYNC_INTERVAL:
+            self._purge_local()
+
+    def _open_change_stream(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        self._stream = self.collection.watch(pipeline, full_document="updateLookup", resume_after=self._resume_token, max_await_time_ms=100)
+        if self._resume_token is None:
+            # catches documents added between the previous sync and the stream being opened
+            self.sync()
+
+        self.metrics.mode = "change_stream"
+
+    def _close_change_stream(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.close()
+
+    def _poll_instead(self):
+        self._task.cancel()
+        self.metrics.mode = "polling"
+        self._task = scheduler.every(self.SYNC_INTERVAL, self.sync, name=self.name)
+
+    def _migrate_legacy_document(self):
+        """
+        Moves tokens out of the single {_id: 1} document the blacklist was previously stored in.
+        """
+        legacy_doc = self.collection.find_one({"_id": 1})
+        if legacy_doc is None:
+            return
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        updates = []
+        for add_time, token in legacy_doc.get("blacklist", {}).items():
+            added = datetime.datetime.fromtimestamp(int(add_time) / (10 ** 9), datetime.timezone.utc)
+            expiration = added + datetime.timedelta(seconds=self.expiration_time)
+            if expiration > now:
+                updates.append(UpdateOne(
+                    {"_id": TokenBlacklist.digest(token)},
+                    {"$set": {"exp": expiration, "added": added}},
+                    upsert=True
+                ))
 
+        if len(updates) > 0:
+            self.collection.bulk_write(updates, ordered=False)
 
+        self.collection.delete_one({"_id": 1})
+        logger.info(f"Migrated {len(updates)} tokens of {self.name} out of the legacy blacklist document.")
@@ -1,7 +1,8 @@
 __all__ = ["Business", "SelectedModificationButton", "Item", "ItemStoreFormat", 'Review', "ModificationButtonDataType", "ModificationButton",
-           "ModificationButtonSide", "Category", "Contact"]
+           "ModificationButtonSide", "Category", "Contact", "ItemSummary", "MetricsBucket"]
 
 from .business import Business
 from .category import Category
 from .contact import Contact
+from .metrics_bucket import MetricsBucket
 from .item import *
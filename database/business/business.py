@@ -11,7 +11,10 @@ import database.business.business_metrics as metrics_mod
 import database.business.category as category_module
 import database.business.contact as contact_module
 import database.business.item.item as item_module
+import database.business.owner_cache as owner_module
 from database import DocumentObject, businesses_collection, Location, Image, unapproved_businesses_collection
+from database.geo_cache import geo_cache
+from database.spatial_index import spatial_indexes
 
 
 # TODO: Add option to switch location of business- should switch all items as well.
@@ -71,44 +74,67 @@ class Business(DocumentObject):
             setattr(self, method_name, lambda value: self.update_field(self.shorten_field_name(field_name), value))
 
     def update_field(self, field_name, value) -> Business:
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$set": {field_name: value}},
-                return_document=ReturnDocument.AFTER
-            )
+        doc = businesses_collection.find_one_and_update(
+            {"_id": self._id},
+            {"$set": {field_name: value}},
+            return_document=ReturnDocument.AFTER
         )
 
+        if field_name == Business.LONG_TO_SHORT["location"]:
+            Business.location_changed(doc)
+
+        return Business.document_repr_to_object(doc)
+
     def update_fields(self, **kwargs) -> Business:
         filtered_kwargs = filter(lambda item: item[0] in self.updatable_fields, kwargs.items())
         update_dict = {
             self.shorten_field_name(key): value for key, value in filtered_kwargs
         }
+        doc = businesses_collection.find_one_and_update({"_id": self._id}, {"$set": update_dict}, return_document=ReturnDocument.AFTER)
 
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id}, {"$set": update_dict}, return_document=ReturnDocument.AFTER
-            )
-        )
+        if Business.LONG_TO_SHORT["location"] in update_dict:
+            Business.location_changed(doc)
 
-    def add_category(self, category: category_module.Category) -> Business:
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$addToSet": {"cat": category_module.Category.get_db_repr(category)}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+        return Business.document_repr_to_object(doc)
 
-    def remove_category(self, name: str) -> Business:
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$pull": {"cat": {"$elemMatch": {"name": name}}}},
-                return_document=ReturnDocument.AFTER
-            )
+    @staticmethod
+    def update_by_id(_id: ObjectId, update: dict, return_result: bool = True, projection: dict = None) -> Business | dict | None:
+        """
+        Applies an update to a business document.
+        :param return_result: False applies the update with update_one and returns None
+        :param projection: fields of the updated document to return, the raw projected document is returned instead of a Business
+        """
+        if not return_result:
+            businesses_collection.update_one({"_id": _id}, update)
+            return None
+
+        doc = businesses_collection.find_one_and_update({"_id": _id}, update, projection=projection, return_document=ReturnDocument.AFTER)
+        if doc is None or projection is not None:
+            return doc
+
+        return Business.document_repr_to_object(doc)
+
+    @staticmethod
+    def location_changed(doc: dict | None):
+        """
+        Refreshes the geo caches after an approved business was moved.
+        """
+        # the previous location isn't known here, the business may leave any cached area
+        geo_cache.clear(businesses_collection)
+        if doc is not None and doc.get("loc") is not None:
+            spatial_indexes.update(businesses_collection, doc["_id"], doc["loc"]["coordinates"])
+
+    def add_category(self, category: category_module.Category, return_result: bool = True, projection: dict = None) -> Business | dict | None:
+        return Business.update_by_id(
+            self._id,
+            {"$addToSet": {"cat": category_module.Category.get_db_repr(category)}},
+            return_result,
+            projection
         )
 
+    def remove_category(self, name: str, return_result: bool = True, projection: dict = None) -> Business | dict | None:
+        return Business.update_by_id(self._id, {"$pull": {"cat": {"$elemMatch": {"name": name}}}}, return_result, projection)
+
     def get_categories(self) -> List[category_module.Category]:
         return list(
             map(
@@ -139,59 +165,29 @@ class Business(DocumentObject):
 
         return category
 
-    def add_item(self, item_id: ObjectId) -> Business:
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$addToSet": {f"it": item_id}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+    def add_item(self, item_id: ObjectId, return_result: bool = True, projection: dict = None) -> Business | dict | None:
+        return Business.update_by_id(self._id, {"$addToSet": {f"it": item_id}}, return_result, projection)
 
-    def remove_item(self, item_id: ObjectId) -> Business:
+    def remove_item(self, item_id: ObjectId, return_result: bool = True, projection: dict = None) -> Business | dict | None:
         """
         Removes item from business items NOT from items collection.
         :param item_id: item object id
         """
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$pull": {f"it": item_id}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+        return Business.update_by_id(self._id, {"$pull": {f"it": item_id}}, return_result, projection)
 
-    def add_order(self, order_id: ObjectId) -> Business:
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$addToSet": {f"ord": order_id}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+    def add_order(self, order_id: ObjectId, return_result: bool = True, projection: dict = None) -> Business | dict | None:
+        return Business.update_by_id(self._id, {"$addToSet": {f"ord": order_id}}, return_result, projection)
 
     @staticmethod
-    def add_order_by_id(business_id: ObjectId, order_id: ObjectId) -> Business:
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": business_id},
-                {"$addToSet": {f"ord": order_id}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+    def add_order_by_id(business_id: ObjectId, order_id: ObjectId, return_result: bool = True, projection: dict = None) -> Business | dict | None:
+        return Business.update_by_id(business_id, {"$addToSet": {f"ord": order_id}}, return_result, projection)
 
-    def remove_order(self, order_id: ObjectId) -> Business:
+    def remove_order(self, order_id: ObjectId, return_result: bool = True, projection: dict = None) -> Business | dict | None:
         """
         Removes order from business orders NOT from orders collection.
         :param order_id: item object id
         """
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$pull": {f"ord": order_id}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+        return Business.update_by_id(self._id, {"$pull": {f"ord": order_id}}, return_result, projection)
 
     @staticmethod
     def update_business(
@@ -220,14 +216,17 @@ class Business(DocumentObject):
         if len(setUpdate) > 0:
             update["$set"] = setUpdate
 
-        return Business.document_repr_to_object(
-            businesses_collection.find_one_and_update(
-                {"_id": _id},
-                update,
-                return_document=ReturnDocument.AFTER,
-            )
+        doc = businesses_collection.find_one_and_update(
+            {"_id": _id},
+            update,
+            return_document=ReturnDocument.AFTER,
         )
 
+        if location is not None:
+            Business.location_changed(doc)
+
+        return Business.document_repr_to_object(doc)
+
     def get_items(self) -> List[item_module.Item]:
         return item_module.Item.get_items(*self.items)
 
@@ -250,6 +249,9 @@ class Business(DocumentObject):
         doc["app"] = True
         businesses_collection.insert_one(doc)
         unapproved_businesses_collection.delete_one({"_id": business_id})
+        if doc.get("loc") is not None:
+            geo_cache.invalidate(businesses_collection, doc["loc"]["coordinates"])
+            spatial_indexes.update(businesses_collection, business_id, doc["loc"]["coordinates"])
         return Business.document_repr_to_object(doc)
 
     @staticmethod
@@ -278,6 +280,10 @@ class Business(DocumentObject):
         doc['app'] = False
         unapproved_businesses_collection.insert_one(doc)
         businesses_collection.delete_one({"_id": business_id})
+        owner_module.business_owners.invalidate(business_id)
+        if doc.get("loc") is not None:
+            geo_cache.invalidate(businesses_collection, doc["loc"]["coordinates"])
+            spatial_indexes.update(businesses_collection, business_id, None)
         return Business.document_repr_to_object(doc)
 
     @staticmethod
@@ -290,7 +296,7 @@ class Business(DocumentObject):
             national_id_business_id: str,
     ) -> Business:
         _id = ObjectId()
-        image_id: Image = Image.upload(image_id_card, folder_name="business_ids/")
+        image_id: Image = Image.upload(image_id_card, folder_name="business_ids/", generate_variants=False)
 
         return Business.document_repr_to_object(unapproved_businesses_collection.find_one_and_replace(
             {"_id": _id},
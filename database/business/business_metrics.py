@@ -1,8 +1,11 @@
+from __future__ import annotations
+
 from bson import ObjectId
-from pymongo import ReturnDocument
 
-import database.business.business as business_module
+import database.business.metrics_bucket as bucket_module
+import database.business.owner_cache as owner_module
 from database import DocumentObject, businesses_collection
+from database.counter_aggregator import counter_aggregator
 
 
 class BusinessMetrics(DocumentObject):
@@ -20,10 +23,25 @@ class BusinessMetrics(DocumentObject):
         self.business_id = business_id
         self.views = views
 
-    def add_view(self):
-        return business_module.Business.document_repr_to_object(
-            businesses_collection.find_one_and_update({"_id": self.business_id}, {"$inc": {"mtc.vws": 1}}, return_document=ReturnDocument.AFTER)
-        )
+    def add_view(self) -> int:
+        """
+        Counts a view, written to the business and its hourly metrics bucket in the next counter flush.
+        :return: approximate view count including views not flushed yet
+        """
+        bucket_module.MetricsBucket.record(bucket_module.MetricsEntityType.Business, self.business_id, self.business_id, "views")
+        return self.views + counter_aggregator.increment(businesses_collection, self.business_id, "mtc.vws")
+
+    @staticmethod
+    def record_view(business_id: ObjectId) -> bool:
+        """
+        Counts a view of a business without reading the business, its existence is checked through business_owners.
+        :return: False if the business doesn't exist
+        """
+        if owner_module.business_owners.get(business_id) is None:
+            return False
+
+        BusinessMetrics(business_id, 0).add_view()
+        return True
 
     @staticmethod
     def get_db_repr(item_metrics, get_long_names: bool = False):
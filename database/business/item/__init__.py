@@ -1,8 +1,9 @@
 __all__ = ["ModificationButtonDataType", "SelectedModificationButton", "Review", "ModificationButton", "ItemStoreFormat", "Item",
-           "ModificationButtonSide"]
+           "ModificationButtonSide", "ItemSummary"]
 
 from .item import Item
 from .item_store_format import ItemStoreFormat
+from .item_summary import ItemSummary
 from .modification_button import ModificationButtonDataType, ModificationButton, ModificationButtonSide
 from .review import Review
 from .selected_modification_button import SelectedModificationButton
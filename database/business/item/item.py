@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import logging
 from typing import List
 
 import jsonpickle
@@ -7,10 +8,16 @@ from bson import ObjectId
 from pymongo import ReturnDocument
 
 import database.business.item.item_metrics as metrics_mod
+import database.business.item.item_rating as rating_module
 import database.business.item.item_store_format as isf_module
 import database.business.item.modification_button as mod_module
 import database.business.item.review as review_module
-from database import Image, DocumentObject, items_collection, Location
+import database.business.owner_cache as owner_module
+from database import Image, DocumentObject, items_collection, Location, reviews_collection
+from database.geo_cache import geo_cache
+from database.spatial_index import spatial_indexes
+
+logger = logging.getLogger(__name__)
 
 
 class Item(DocumentObject):
@@ -21,7 +28,6 @@ class Item(DocumentObject):
         "price": "p",
         "images": "im",
         "preview_image_index": "pi",
-        "reviews": "rs",
         "item_store_format": "isf",
         "brand": "br",
         "category": "cat",
@@ -29,6 +35,7 @@ class Item(DocumentObject):
         "stock": "stk",
         "location": "loc",
         "metrics": "mtc",
+        "rating": "rtg",
     }
 
     SHORT_TO_LONG = {value: key for key, value in LONG_TO_SHORT.items()}
@@ -40,7 +47,6 @@ class Item(DocumentObject):
             price: float,
             images: List[Image],
             preview_image_index: int,
-            reviews: List[review_module.Review],
             item_store_format: isf_module.ItemStoreFormat,
             brand: str,
             category: str,
@@ -49,6 +55,7 @@ class Item(DocumentObject):
             location: Location,
             metrics: metrics_mod.ItemMetrics,
             _id: ObjectId = ObjectId(),
+            rating: rating_module.ItemRating = None,
     ):
         self.business_id = business_id
         self.business_name = business_name
@@ -56,7 +63,6 @@ class Item(DocumentObject):
         self.price = price
         self.images = images
         self.preview_image_index = preview_image_index
-        self.reviews = reviews
         self.item_store_format = item_store_format
         self.brand = brand
         self.category = category
@@ -64,7 +70,7 @@ class Item(DocumentObject):
         self.stock = stock
         self.location = location
         self.metrics = metrics
-        self.should_recalculate_rating = True
+        self.rating = rating if rating is not None else rating_module.ItemRating.empty()
 
         self.updatable_fields = {
             "price", "preview_image", "brand", "category", "stock"
@@ -75,94 +81,102 @@ class Item(DocumentObject):
             method_name = "update_" + field_name
             setattr(self, method_name, lambda value: self.update_field(self.shorten_field_name(field_name), value))
 
-    def update_field(self, field_name, value) -> Item:
-        return Item.document_repr_to_object(
-            items_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$set": {field_name: value}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+    @staticmethod
+    def update_by_id(_id: ObjectId, update: dict, return_result: bool = True, projection: dict = None) -> Item | dict | None:
+        """
+        Applies an update to an item document.
+        :param return_result: False applies the update with update_one and returns None
+        :param projection: fields of the updated document to return, the raw projected document is returned instead of an Item
+        """
+        if not return_result:
+            items_collection.update_one({"_id": _id}, update)
+            return None
+
+        doc = items_collection.find_one_and_update({"_id": _id}, update, projection=projection, return_document=ReturnDocument.AFTER)
+        if doc is None or projection is not None:
+            return doc
 
-    def add_tags(self, *tags: str) -> Item:
-        lowered_tags = list(map(lambda tag: tag.lower(), tags))
+        return Item.document_repr_to_object(doc)
 
-        return Item.document_repr_to_object(items_collection.find_one_and_update(
-            {"_id": self._id},
-            {"$addToSet": {"tg": {"$each": lowered_tags}}},
-            return_document=ReturnDocument.AFTER
-        ))
+    def update_field(self, field_name, value, return_result: bool = True, projection: dict = None) -> Item | dict | None:
+        return Item.update_by_id(self._id, {"$set": {field_name: value}}, return_result, projection)
 
-    def remove_tags(self, *tags: str) -> Item:
+    def add_tags(self, *tags: str, return_result: bool = True, projection: dict = None) -> Item | dict | None:
         lowered_tags = list(map(lambda tag: tag.lower(), tags))
 
-        return Item.document_repr_to_object(items_collection.find_one_and_update(
-            {"_id": self._id},
-            {"$pullAll": {"tg": lowered_tags}},
-            return_document=ReturnDocument.AFTER
-        ))
+        return Item.update_by_id(self._id, {"$addToSet": {"tg": {"$each": lowered_tags}}}, return_result, projection)
+
+    def remove_tags(self, *tags: str, return_result: bool = True, projection: dict = None) -> Item | dict | None:
+        lowered_tags = list(map(lambda tag: tag.lower(), tags))
 
-    def add_image(self, image: Image, index: int) -> Item:
-        doc: dict
+        return Item.update_by_id(self._id, {"$pullAll": {"tg": lowered_tags}}, return_result, projection)
 
+    def add_image(self, image: Image, index: int, return_result: bool = True, projection: dict = None) -> Item | dict | None:
         if index < len(self.images):
             query = {"$set": {f"im.{index}": image.image_id}}
             if len(self.images) == 0:
                 query["$set"]['pi'] = 0
-            doc = items_collection.find_one_and_update(
-                {"_id": self._id},
-                query,
-                return_document=ReturnDocument.AFTER
-            )
         else:
             query = {"$addToSet": {"im": image.image_id}}
             if len(self.images) == 0:
                 query["$set"] = {"pi": 0}
 
-            doc = items_collection.find_one_and_update(
-                {"_id": self._id},
-                query,
-                return_document=ReturnDocument.AFTER
-            )
-
-        return Item.document_repr_to_object(doc)
-
-    def remove_image(self, index: int) -> Item:
-        items_collection.update_one({"_id": self._id}, {"$unset": {f"im.{index}": 1}})
-
-        return Item.document_repr_to_object(
-            items_collection.find_one_and_update({"_id": self._id}, {"$pull": {"im": None}}, return_document=ReturnDocument.AFTER)
-        )
-
-    def add_review(self, review: review_module.Review) -> Item:
-        self.should_recalculate_rating = True
-        return Item.document_repr_to_object(
-            items_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$addToSet": {f"rs": review_module.Review.get_db_repr(review)}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
-
-    def remove_review(self, poster_id: ObjectId) -> Item:
-        self.should_recalculate_rating = True
-        return Item.document_repr_to_object(
-            items_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$pull": {f"rs.$.pid": poster_id}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
-
-    def update_tags(self, added: List[str], removed: List[str]):
+        return Item.update_by_id(self._id, query, return_result, projection)
+
+    def remove_image(self, index: int, return_result: bool = True, projection: dict = None) -> Item | dict | None:
+        Item.update_by_id(self._id, {"$unset": {f"im.{index}": 1}}, return_result=False)
+
+        return Item.update_by_id(self._id, {"$pull": {"im": None}}, return_result, projection)
+
+    def add_review(self, review: review_module.Review) -> review_module.Review | None:
+        """
+        Saves the review in the reviews collection and adds its rating to the item's rating.
+        :return: the saved review, None if the poster already reviewed the item
+        """
+        review = review_module.Review.save_review(self._id, review)
+        if review is not None:
+            self._update_rating(rating_module.ItemRating.inc_update(review.rating))
+
+        return review
+
+    def remove_review(self, poster_id: ObjectId) -> review_module.Review | None:
+        """
+        Deletes the poster's review from the reviews collection and removes its rating from the item's rating.
+        :return: the deleted review, None if the poster has no review of the item
+        """
+        review = review_module.Review.delete_review(self._id, poster_id)
+        if review is not None:
+            self._update_rating(rating_module.ItemRating.inc_update(review.rating, -1))
+
+        return review
+
+    def _update_rating(self, increments: dict):
+        """
+        Applies a review's increments to the rating, recomputing it from the reviews if the $inc fails after the review was
+        written.
+        """
+        try:
+            items_collection.update_one({"_id": self._id}, {"$inc": increments})
+        except Exception as e:
+            logger.warning(f"Failed updating the rating of item {self._id}, recomputing it from its reviews: {e}")
+            rating_module.ItemRating.reconcile(self._id)
+
+    def get_reviews(self, limit: int, cursor: tuple = None):
+        """
+        :return: one page of the item's reviews, newest first, and the cursor of the next page
+        """
+        return review_module.Review.get_item_reviews(self._id, limit, cursor)
+
+    def update_tags(self, added: List[str], removed: List[str], return_result: bool = True, projection: dict = None):
         lowered_added_tags = list(map(lambda tag: tag.lower(), added))
         lowered_removed_tags = list(map(lambda tag: tag.lower(), removed))
 
-        return Item.document_repr_to_object(items_collection.find_one_and_update(
-            {"_id": self._id},
+        return Item.update_by_id(
+            self._id,
             {"$pullAll": {"tg": lowered_removed_tags}, "$addToSet": {"tg": {"$each": lowered_added_tags}}},
-            return_document=ReturnDocument.AFTER
-        ))
+            return_result,
+            projection
+        )
 
     def add_view(self):
         return Item.document_repr_to_object(items_collection.find_one_and_update(
@@ -182,7 +196,8 @@ class Item(DocumentObject):
             stock: int,
             tags: List[str],
             modification_buttons: List[mod_module.ModificationButton],
-
+            return_result: bool = True,
+            projection: dict = None,
     ):
         lowered_tags = list(map(lambda x: x.lower(), tags))
         set_update = {
@@ -204,18 +219,18 @@ class Item(DocumentObject):
         if len(lowered_tags) > 0:
             set_update["tg"] = lowered_tags
 
-        return Item.document_repr_to_object(items_collection.find_one_and_update(
-            {"_id": self._id},
-            {
-                "$set": set_update,
-            },
-            upsert=False,
-            return_document=ReturnDocument.AFTER
-        ))
+        return Item.update_by_id(self._id, {"$set": set_update}, return_result, projection)
 
     @staticmethod
     def delete_item(item_id: ObjectId):
-        items_collection.delete_one({"_id": item_id})
+        doc = items_collection.find_one_and_delete({"_id": item_id}, projection={"loc": 1})
+        if doc is not None:
+            reviews_collection.delete_many({"iid": item_id})
+            owner_module.item_owners.invalidate(item_id)
+
+        if doc is not None and doc.get("loc") is not None:
+            geo_cache.invalidate(items_collection, doc["loc"]["coordinates"])
+            spatial_indexes.update(items_collection, item_id, None)
 
     def __repr__(self):
         return jsonpickle.encode(Item.get_db_repr(self, True), unpicklable=False)
@@ -227,9 +242,9 @@ class Item(DocumentObject):
         res["isf"] = isf_module.ItemStoreFormat.get_db_repr(res["isf"], get_long_names)
 
         res["im"] = list(map(lambda image: image.image_id if image is Image else image, item.images))
-        res["rs"] = list(map(lambda review: review_module.Review.get_db_repr(review, get_long_names), res.get("rs", [])))
         res['loc'] = Location.get_db_repr(res['loc'], get_long_names)
         res["mtc"] = metrics_mod.ItemMetrics.get_db_repr(res['mtc'], get_long_names)
+        res["rtg"] = rating_module.ItemRating.get_db_repr(res["rtg"], get_long_names)
 
         if get_long_names:
             res["bid"] = str(res["bid"])
@@ -240,19 +255,20 @@ class Item(DocumentObject):
 
     @staticmethod
     def document_repr_to_object(doc, **kwargs):
-        args = {key: doc[value] for key, value in Item.LONG_TO_SHORT.items()}
+        args = {key: doc.get(value, None) for key, value in Item.LONG_TO_SHORT.items()}
 
         args["item_store_format"] = \
             isf_module.ItemStoreFormat.document_repr_to_object(args["item_store_format"], business_id=args["business_id"], item_id=args["_id"])
 
         args["images"] = list(map(lambda image_id: Image(image_id), args["images"]))
-        args["reviews"] = list(map(lambda review_doc: review_module.Review.document_repr_to_object(review_doc), args["reviews"]))
         args["business_id"] = args["business_id"]
         args['location'] = Location.document_repr_to_object(args['location'])
         args['metrics'] \
-            = metrics_mod.ItemMetrics.document_repr_to_object(args['metrics'], _id=doc["_id"]) if args.get("metrics", None) is not None \
-            else metrics_mod.ItemMetrics(doc["_id"], 0, 0, 0)
+            = metrics_mod.ItemMetrics.document_repr_to_object(args['metrics'], _id=doc["_id"], business_id=doc["bid"]) \
+            if args.get("metrics", None) is not None else metrics_mod.ItemMetrics(doc["_id"], 0, 0, 0, business_id=doc["bid"])
+        args["rating"] = rating_module.ItemRating.document_repr_to_object(args["rating"])
 
+        owner_module.item_owners.put(doc["_id"], doc["bid"])
         return Item(**args)
 
     @staticmethod
@@ -265,10 +281,14 @@ class Item(DocumentObject):
         ))
 
     @staticmethod
-    def get_item(item_id: ObjectId) -> Item:
-        return Item.document_repr_to_object(
-            items_collection.find_one({"_id": item_id})
-        )
+    def exists_by_id(item_id: ObjectId, business_id: ObjectId = None) -> bool:
+        query = {"_id": item_id} if business_id is None else {"_id": item_id, "bid": business_id}
+        return items_collection.count_documents(query, limit=1) == 1
+
+    @staticmethod
+    def get_item(item_id: ObjectId) -> Item | None:
+        doc = items_collection.find_one({"_id": item_id})
+        return Item.document_repr_to_object(doc) if doc is not None else None
 
     @staticmethod
     def save_item(
@@ -277,7 +297,6 @@ class Item(DocumentObject):
             price: float,
             images: List[Image],
             preview_image: int,
-            reviews: List[review_module.Review],
             item_store_format: isf_module.ItemStoreFormat,
             brand: str,
             category: str,
@@ -288,7 +307,7 @@ class Item(DocumentObject):
     ) -> Item:
         _id = ObjectId()
 
-        return Item.document_repr_to_object(items_collection.find_one_and_replace(
+        doc = items_collection.find_one_and_replace(
             {"_id": _id},
             Item.get_db_repr(Item(
                 business_id=business_id,
@@ -296,7 +315,6 @@ class Item(DocumentObject):
                 price=price,
                 images=images,
                 preview_image_index=preview_image,
-                reviews=reviews,
                 item_store_format=isf_module.ItemStoreFormat(
                     item_id=_id,
                     title=item_store_format.title,
@@ -310,16 +328,20 @@ class Item(DocumentObject):
                 stock=stock,
                 location=location,
                 _id=_id,
-                metrics=metrics
+                metrics=metrics,
+                rating=rating_module.ItemRating.empty(),
             )),
             upsert=True,
             return_document=ReturnDocument.AFTER
-        ))
+        )
+
+        coordinates = Location.get_db_repr(location)["coordinates"]
+        geo_cache.invalidate(items_collection, coordinates)
+        spatial_indexes.update(items_collection, _id, coordinates)
+        return Item.document_repr_to_object(doc)
 
     def calculate_rating(self) -> float:
-        if self.should_recalculate_rating:
-            self.should_recalculate_rating = sum(map(lambda review: review.should_recalculate_rating, self.reviews)) / float(len(self.reviews))
-        return self.should_recalculate_rating
+        return self.rating.average
 
     def shorten_field_name(self, field_name):
         return Item.LONG_TO_SHORT.get(field_name, None)
@@ -1,8 +1,11 @@
+from __future__ import annotations
+
 from bson import ObjectId
-from pymongo import ReturnDocument
 
-import database.business.item.item as item_module
+import database.business.metrics_bucket as bucket_module
+import database.business.owner_cache as owner_module
 from database import DocumentObject, items_collection
+from database.counter_aggregator import counter_aggregator
 
 
 class ItemMetrics(DocumentObject):
@@ -20,31 +23,51 @@ class ItemMetrics(DocumentObject):
             views: int,
             orders: int,
             likes: int,
+            business_id: ObjectId = None,
     ):
         self.item_id = item_id
+        self.business_id = business_id
         self.views = views
         self.orders = orders
         self.likes = likes
 
-    def add_view(self):
-        return item_module.Item.document_repr_to_object(
-            items_collection.find_one_and_update({"_id": self.item_id}, {"$inc": {"mtc.vws": 1}}, return_document=ReturnDocument.AFTER)
-        )
+    def add_view(self) -> int:
+        """
+        Counts a view, written to the item and its hourly metrics bucket in the next counter flush.
+        :return: approximate view count including views not flushed yet
+        """
+        return self.views + self.increment("views")
+
+    def add_order(self) -> int:
+        return self.orders + self.increment("orders")
+
+    def add_like(self) -> int:
+        return self.likes + self.increment("likes")
 
-    def add_order(self):
-        return item_module.Item.document_repr_to_object(
-            items_collection.find_one_and_update({"_id": self.item_id}, {"$inc": {"mtc.ods": 1}}, return_document=ReturnDocument.AFTER)
-        )
+    def remove_like(self) -> int:
+        return self.likes + self.increment("likes", -1)
 
-    def add_like(self):
-        return item_module.Item.document_repr_to_object(
-            items_collection.find_one_and_update({"_id": self.item_id}, {"$inc": {"mtc.lks": 1}}, return_document=ReturnDocument.AFTER)
-        )
+    def increment(self, field_name: str, amount: int = 1) -> int:
+        """
+        :return: the item's increments of the field that were not flushed yet
+        """
+        if self.business_id is not None:
+            bucket_module.MetricsBucket.record(bucket_module.MetricsEntityType.Item, self.item_id, self.business_id, field_name, amount)
 
-    def remove_like(self):
-        return item_module.Item.document_repr_to_object(
-            items_collection.find_one_and_update({"_id": self.item_id}, {"$inc": {"mtc.lks": -1}}, return_document=ReturnDocument.AFTER)
-        )
+        return counter_aggregator.increment(items_collection, self.item_id, f"mtc.{ItemMetrics.LONG_TO_SHORT[field_name]}", amount)
+
+    @staticmethod
+    def record(item_id: ObjectId, field_name: str, amount: int = 1) -> bool:
+        """
+        Counts an event of an item without reading the item, its business is taken from item_owners.
+        :return: False if the item doesn't exist
+        """
+        business_id = owner_module.item_owners.get(item_id)
+        if business_id is None:
+            return False
+
+        ItemMetrics(item_id, 0, 0, 0, business_id=business_id).increment(field_name, amount)
+        return True
 
     @staticmethod
     def get_db_repr(item_metrics, get_long_names: bool = False):
@@ -59,6 +82,7 @@ class ItemMetrics(DocumentObject):
     def document_repr_to_object(doc, **kwargs):
         args = {key: doc[value] for key, value in ItemMetrics.LONG_TO_SHORT.items()}
         args["item_id"] = kwargs["_id"]
+        args["business_id"] = kwargs.get("business_id", None)
 
         return ItemMetrics(**args)
 
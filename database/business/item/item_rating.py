@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Dict
+
+import jsonpickle
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database import DocumentObject, items_collection, reviews_collection
+
+STARS = ("1", "2", "3", "4", "5")
+
+
+class ItemRating(DocumentObject):
+    """
+    Running totals of an item's review ratings, maintained with $inc whenever a review is added or removed so the rating
+    is known without reading the reviews. The review write and the $inc are separate writes, totals that missed an $inc are
+    recomputed from the reviews with reconcile, which is idempotent.
+    """
+    LONG_TO_SHORT = {
+        "count": "c",
+        "total": "s",
+        "histogram": "hst",
+    }
+
+    SHORT_TO_LONG = {value: key for key, value in LONG_TO_SHORT.items()}
+
+    def __init__(
+            self,
+            count: int,
+            total: float,
+            histogram: Dict[str, int],
+    ):
+        self.count = count
+        self.total = total
+        self.histogram = histogram
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count > 0 else 0
+
+    @staticmethod
+    def empty() -> ItemRating:
+        return ItemRating(0, 0, dict.fromkeys(STARS, 0))
+
+    @staticmethod
+    def star(rating: float) -> str:
+        """
+        :return: the histogram bucket of a rating, rounded half to even like Mongo's $round
+        """
+        return str(min(5, max(1, round(rating))))
+
+    @staticmethod
+    def inc_update(rating: float, direction: int = 1) -> dict:
+        """
+        :return: $inc fields adding (direction 1) or removing (direction -1) a review's rating from an item's "rtg"
+        """
+        return {
+            "rtg.c": direction,
+            "rtg.s": direction * rating,
+            f"rtg.hst.{ItemRating.star(rating)}": direction,
+        }
+
+    @staticmethod
+    def from_reviews(*item_ids: ObjectId) -> Dict[ObjectId, ItemRating]:
+        """
+        Recomputes ratings from the reviews collection with one aggregate.
+        :return: the rating of each item, empty for items without reviews
+        """
+        ratings = {item_id: ItemRating.empty() for item_id in item_ids}
+        docs = reviews_collection.aggregate([
+            {"$match": {"iid": {"$in": list(item_ids)}}},
+            {"$group": {"_id": {"iid": "$iid", "rtn": "$rtn"}, "c": {"$sum": 1}}},
+        ])
+
+        for doc in docs:
+            rating, value, count = ratings[doc["_id"]["iid"]], doc["_id"]["rtn"], doc["c"]
+            rating.count += count
+            rating.total += value * count
+            rating.histogram[ItemRating.star(value)] += count
+
+        return ratings
+
+    @staticmethod
+    def reconcile(*item_ids: ObjectId):
+        """
+        Replaces the items' rating totals with the ones recomputed from their reviews.
+        """
+        if len(item_ids) == 0:
+            return
+
+        items_collection.bulk_write([
+            UpdateOne({"_id": item_id}, {"$set": {"rtg": ItemRating.get_db_repr(rating)}})
+            for item_id, rating in ItemRating.from_reviews(*item_ids).items()
+        ], ordered=False)
+
+    def __repr__(self):
+        return jsonpickle.encode(ItemRating.get_db_repr(self, True), unpicklable=False)
+
+    @staticmethod
+    def get_db_repr(item_rating: ItemRating, get_long_names: bool = False):
+        item_rating = item_rating if item_rating is not None else ItemRating.empty()
+        res = {value: getattr(item_rating, key) for key, value in ItemRating.LONG_TO_SHORT.items()}
+
+        if get_long_names:
+            res = {item_rating.lengthen_field_name(key): value for key, value in res.items()}
+            res["average"] = item_rating.average
+
+        return res
+
+    @staticmethod
+    def document_repr_to_object(doc, **kwargs):
+        if doc is None:
+            return ItemRating.empty()
+
+        histogram = dict.fromkeys(STARS, 0)
+        histogram.update(doc.get("hst") or {})
+
+        return ItemRating(doc.get("c", 0), doc.get("s", 0), histogram)
+
+    def shorten_field_name(self, field_name):
+        return ItemRating.LONG_TO_SHORT.get(field_name, None)
+
+    def lengthen_field_name(self, field_name):
+        return ItemRating.SHORT_TO_LONG.get(field_name, None)
+
+    def __getstate__(self):
+        return ItemRating.get_db_repr(self, True)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import List
+
+import jsonpickle
+from bson import ObjectId
+
+import database.business.item.item_rating as rating_module
+import database.business.owner_cache as owner_module
+from database import Image, DocumentObject, items_collection, Location
+
+
+class ItemSummary(DocumentObject):
+    """
+    The fields of an item shown on feed cards. Images only holds the item's preview image.
+    """
+    LONG_TO_SHORT = {
+        "_id": "_id",
+        "business_id": "bid",
+        "business_name": "bnm",
+        "title": "ttl",
+        "price": "p",
+        "images": "im",
+        "location": "loc",
+        "rating": "rtg",
+    }
+
+    SHORT_TO_LONG = {value: key for key, value in LONG_TO_SHORT.items()}
+
+    # $project stage building summary documents from item documents, keeps the $geoNear distance used for pagination
+    PROJECTION = {
+        "bid": 1,
+        "bnm": 1,
+        "ttl": "$isf.ttl",
+        "p": 1,
+        "im": {"$slice": [{"$ifNull": ["$im", []]}, {"$max": [{"$ifNull": ["$pi", 0]}, 0]}, 1]},
+        "loc": 1,
+        "rtg": 1,
+        "dst": 1,
+    }
+
+    def __init__(
+            self,
+            business_id: ObjectId,
+            business_name: str,
+            title: str,
+            price: float,
+            images: List[Image],
+            location: Location,
+            _id: ObjectId = None,
+            rating: rating_module.ItemRating = None,
+    ):
+        self._id = _id
+        self.business_id = business_id
+        self.business_name = business_name
+        self.title = title
+        self.price = price
+        self.images = images
+        self.location = location
+        self.rating = rating if rating is not None else rating_module.ItemRating.empty()
+
+    def __repr__(self):
+        return jsonpickle.encode(ItemSummary.get_db_repr(self, True), unpicklable=False)
+
+    @staticmethod
+    def get_db_repr(item_summary: ItemSummary, get_long_names: bool = False):
+        res = {value: getattr(item_summary, key) for key, value in ItemSummary.LONG_TO_SHORT.items()}
+
+        res["im"] = list(map(lambda image: image.image_id if isinstance(image, Image) else image, item_summary.images))
+        res["loc"] = Location.get_db_repr(res["loc"], get_long_names)
+        res["rtg"] = rating_module.ItemRating.get_db_repr(res["rtg"], get_long_names)
+
+        if get_long_names:
+            res["bid"] = str(res["bid"])
+            res["_id"] = str(res["_id"])
+            res = {item_summary.lengthen_field_name(key): value for key, value in res.items()}
+
+        return res
+
+    @staticmethod
+    def document_repr_to_object(doc, **kwargs):
+        args = {key: doc.get(value, None) for key, value in ItemSummary.LONG_TO_SHORT.items()}
+
+        args["images"] = list(map(lambda image_id: Image(image_id), args["images"] or []))
+        args["location"] = Location.document_repr_to_object(args["location"])
+        args["rating"] = rating_module.ItemRating.document_repr_to_object(args["rating"])
+
+        owner_module.item_owners.put(args["_id"], args["business_id"])
+        return ItemSummary(**args)
+
+    @staticmethod
+    def get_summaries(*pipeline: dict) -> List[ItemSummary]:
+        """
+        Runs an aggregation over the items collection and projects its results to summaries.
+        """
+        return list(map(
+            lambda doc: ItemSummary.document_repr_to_object(doc),
+            items_collection.aggregate([*pipeline, {"$project": ItemSummary.PROJECTION}])
+        ))
+
+    def shorten_field_name(self, field_name):
+        return ItemSummary.LONG_TO_SHORT.get(field_name, None)
+
+    def lengthen_field_name(self, field_name):
+        return ItemSummary.SHORT_TO_LONG.get(field_name, None)
+
+    @property
+    def id(self):
+        return self._id
+
+    def __getstate__(self):
+        return ItemSummary.get_db_repr(self, True)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
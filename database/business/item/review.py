@@ -1,21 +1,29 @@
 from __future__ import annotations
 
-from typing import List
+import datetime
+from typing import List, Tuple
 
 import jsonpickle
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
-from database import DocumentObject, Image
+from database import DocumentObject, Image, reviews_collection
 
 
 class Review(DocumentObject):
+    """
+    A user's review of an item, stored in the reviews collection with at most one review per poster and item.
+    """
     LONG_TO_SHORT = {
+        "_id": "_id",
+        "item_id": "iid",
         "poster_id": "pid",
         "pfp_image": "pfp",
         "poster_name": "nme",
         "rating": "rtn",
         "text_content": "txt",
-        "images": "imgs"
+        "images": "imgs",
+        "date": "dt",
     }
 
     SHORT_TO_LONG = {value: key for key, value in LONG_TO_SHORT.items()}
@@ -27,14 +35,77 @@ class Review(DocumentObject):
             poster_name: str,
             rating: float,
             text_content: str,
-            images: List[Image]
+            images: List[Image],
+            item_id: ObjectId = None,
+            date: datetime.datetime = None,
+            _id: ObjectId = None,
     ):
+        self._id = _id
+        self.item_id = item_id
         self.poster_id = poster_id
         self.pfp_image = pfp_image
         self.poster_name = poster_name
         self.rating = rating
         self.text_content = text_content
         self.images = images
+        self.date = date
+
+    @staticmethod
+    def save_review(item_id: ObjectId, review: Review) -> Review | None:
+        """
+        :return: the saved review, None if the poster already reviewed the item
+        """
+        review.item_id = item_id
+        review._id = ObjectId()
+        # Mongo keeps milliseconds, truncated here so the returned date matches the stored one
+        now = datetime.datetime.now(datetime.timezone.utc)
+        review.date = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+        try:
+            reviews_collection.insert_one(Review.get_db_repr(review))
+        except DuplicateKeyError:
+            return None
+
+        return review
+
+    @staticmethod
+    def exists(item_id: ObjectId, poster_id: ObjectId) -> bool:
+        return reviews_collection.count_documents({"iid": item_id, "pid": poster_id}, limit=1) == 1
+
+    @staticmethod
+    def delete_review(item_id: ObjectId, poster_id: ObjectId) -> Review | None:
+        """
+        :return: the deleted review, None if the poster has no review of the item
+        """
+        doc = reviews_collection.find_one_and_delete({"iid": item_id, "pid": poster_id})
+
+        return Review.document_repr_to_object(doc) if doc is not None else None
+
+    @staticmethod
+    def get_item_reviews(
+            item_id: ObjectId,
+            limit: int,
+            cursor: Tuple[datetime.datetime, ObjectId] = None
+    ) -> Tuple[List[Review], Tuple[datetime.datetime, ObjectId] | None]:
+        """
+        :param cursor: (date, _id) of the last review of the previous page
+        :return: up to limit reviews of the item, newest first, and the cursor of the next page, None on the last page
+        """
+        query = {"iid": item_id}
+        if cursor is not None:
+            date, last_id = cursor
+            query["$or"] = [{"dt": {"$lt": date}}, {"dt": date, "_id": {"$lt": last_id}}]
+
+        reviews = list(map(
+            lambda doc: Review.document_repr_to_object(doc),
+            reviews_collection.find(query).sort([("dt", -1), ("_id", -1)]).limit(limit + 1)
+        ))
+
+        if len(reviews) <= limit:
+            return reviews, None
+
+        reviews = reviews[:limit]
+        return reviews, (reviews[-1].date, reviews[-1]._id)
 
     def __repr__(self):
         return jsonpickle.encode(Review.get_db_repr(self, True), unpicklable=False)
@@ -42,21 +113,26 @@ class Review(DocumentObject):
     @staticmethod
     def get_db_repr(review: Review, get_long_names: bool = False):
         res = {value: getattr(review, key) for key, value in Review.LONG_TO_SHORT.items()}
-        res["pfp"] = res["pfp"].image_id
-        res["imgs"] = list(map(lambda img: img.image_id, res.get("imgs", [])))
+        res["pfp"] = res["pfp"].image_id if res["pfp"] is not None else None
+        res["imgs"] = list(map(lambda img: img.image_id, res.get("imgs", None) or []))
 
         if get_long_names:
+            res["_id"] = str(res["_id"])
+            res["iid"] = str(res["iid"])
             res["pid"] = str(res["pid"])
+            res["dt"] = res["dt"].isoformat() if res["dt"] is not None else None
             res = {review.lengthen_field_name(key): value for key, value in res.items()}
 
         return res
 
     @staticmethod
     def document_repr_to_object(doc, **kwargs):
-        args = {key: doc[value] for key, value in Review.LONG_TO_SHORT.items()}
+        args = {key: doc.get(value, None) for key, value in Review.LONG_TO_SHORT.items()}
 
-        args["pfp_image"] = Image(args.get("pfp_image", None))
-        args["images"] = list(map(lambda image_id: Image(image_id), args.get("images", [])))
+        args["pfp_image"] = Image(args["pfp_image"]) if args["pfp_image"] is not None else None
+        args["images"] = list(map(lambda image_id: Image(image_id), args["images"] or []))
+        if args["date"] is not None and args["date"].tzinfo is None:
+            args["date"] = args["date"].replace(tzinfo=datetime.timezone.utc)
 
         return Review(**args)
 
@@ -65,3 +141,9 @@ class Review(DocumentObject):
 
     def lengthen_field_name(self, field_name):
         return Review.SHORT_TO_LONG.get(field_name, None)
+
+    def __getstate__(self):
+        return Review.get_db_repr(self, True)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
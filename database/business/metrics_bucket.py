@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import datetime
+from enum import Enum
+from typing import List
+
+import jsonpickle
+from bson import ObjectId
+
+from database import DocumentObject, metrics_collection
+from database.counter_aggregator import counter_aggregator
+
+
+class MetricsEntityType(Enum):
+    Business = "b"
+    Item = "i"
+
+
+class MetricsGranularity(Enum):
+    Hour = "hour"
+    Day = "day"
+
+
+class MetricsBucket(DocumentObject):
+    """
+    One hour of metrics of an item or a business, kept apart from the item and business documents so counting doesn't
+    rewrite them and ranges can be queried. Buckets are created by the first increment of their hour.
+    """
+    LONG_TO_SHORT = {
+        "_id": "_id",
+        "entity_type": "tp",
+        "entity_id": "eid",
+        "business_id": "bid",
+        "time": "h",
+        "views": "vws",
+        "orders": "ods",
+        "likes": "lks",
+    }
+
+    SHORT_TO_LONG = {value: key for key, value in LONG_TO_SHORT.items()}
+
+    COUNTERS = ("views", "orders", "likes")
+
+    def __init__(
+            self,
+            entity_type: MetricsEntityType,
+            entity_id: ObjectId,
+            business_id: ObjectId,
+            time: datetime.datetime,
+            views: int,
+            orders: int,
+            likes: int,
+            _id: str = None,
+    ):
+        self._id = _id
+        self.entity_type = entity_type
+        self.entity_id = entity_id
+        self.business_id = business_id
+        self.time = time
+        self.views = views
+        self.orders = orders
+        self.likes = likes
+
+    @staticmethod
+    def record(entity_type: MetricsEntityType, entity_id: ObjectId, business_id: ObjectId, field_name: str, amount: int = 1):
+        """
+        Adds amount to the counter of the current hour's bucket in the next counter flush.
+        """
+        hour = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+        counter_aggregator.increment(
+            metrics_collection,
+            f"{entity_id}:{int(hour.timestamp())}",
+            MetricsBucket.LONG_TO_SHORT[field_name],
+            amount,
+            on_insert={"tp": entity_type.value, "eid": entity_id, "bid": business_id, "h": hour}
+        )
+
+    @staticmethod
+    def get_business_series(
+            business_id: ObjectId,
+            start: datetime.datetime,
+            end: datetime.datetime,
+            granularity: MetricsGranularity = MetricsGranularity.Day
+    ) -> List[MetricsBucket]:
+        """
+        :return: the buckets of the business and its items in [start, end) merged to granularity, ordered by time
+        """
+        time_expression = "$h" if granularity == MetricsGranularity.Hour else {
+            "$dateFromParts": {"year": {"$year": "$h"}, "month": {"$month": "$h"}, "day": {"$dayOfMonth": "$h"}}
+        }
+
+        docs = metrics_collection.aggregate([
+            {"$match": {"bid": business_id, "h": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {"tp": "$tp", "eid": "$eid", "h": time_expression},
+                **{MetricsBucket.LONG_TO_SHORT[counter]: {"$sum": f"${MetricsBucket.LONG_TO_SHORT[counter]}"} for counter in MetricsBucket.COUNTERS}
+            }},
+            {"$sort": {"_id.h": 1}},
+        ])
+
+        return list(map(
+            lambda doc: MetricsBucket.document_repr_to_object({**doc, **doc["_id"], "bid": business_id, "_id": None}),
+            docs
+        ))
+
+    def __repr__(self):
+        return jsonpickle.encode(MetricsBucket.get_db_repr(self, True), unpicklable=False)
+
+    @staticmethod
+    def get_db_repr(bucket: MetricsBucket, get_long_names: bool = False):
+        res = {value: getattr(bucket, key) for key, value in MetricsBucket.LONG_TO_SHORT.items()}
+        res["tp"] = bucket.entity_type.value
+
+        if get_long_names:
+            res["eid"] = str(res["eid"])
+            res["bid"] = str(res["bid"])
+            res["h"] = res["h"].isoformat()
+            res = {bucket.lengthen_field_name(key): value for key, value in res.items()}
+
+        return res
+
+    @staticmethod
+    def document_repr_to_object(doc, **kwargs):
+        args = {key: doc.get(value, None) for key, value in MetricsBucket.LONG_TO_SHORT.items()}
+        args["entity_type"] = MetricsEntityType(args["entity_type"])
+        args["time"] = args["time"].replace(tzinfo=datetime.timezone.utc) if args["time"].tzinfo is None else args["time"]
+        for counter in MetricsBucket.COUNTERS:
+            args[counter] = args[counter] or 0
+
+        return MetricsBucket(**args)
+
+    def shorten_field_name(self, field_name):
+        return MetricsBucket.LONG_TO_SHORT.get(field_name, None)
+
+    def lengthen_field_name(self, field_name):
+        return MetricsBucket.SHORT_TO_LONG.get(field_name, None)
+
+    def __getstate__(self):
+        return MetricsBucket.get_db_repr(self, True)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+
+from bson import ObjectId
+
+from database import items_collection, businesses_collection
+
+
+class OwnerCache:
+    """
+    Business id of the documents of a collection keyed by document id, bounded by max_size with least recently used eviction.
+    Counters are recorded against a document's business through it instead of reading the document on every increment. Entries
+    are put by the document objects that load documents and read with a projection on a miss. A document's business never
+    changes, entries only leave by eviction or when the document is deleted.
+    """
+
+    def __init__(self, collection, owner_field: str, max_size: int):
+        self.collection = collection
+        self.owner_field = owner_field
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._owners: OrderedDict[ObjectId, ObjectId] = OrderedDict()
+
+    def get(self, _id: ObjectId) -> ObjectId | None:
+        """
+        :return: the business id of the document, None if the document doesn't exist
+        """
+        with self._lock:
+            owner = self._owners.get(_id)
+            if owner is not None:
+                self._owners.move_to_end(_id)
+                return owner
+
+        doc = self.collection.find_one({"_id": _id}, {self.owner_field: 1})
+        if doc is None or doc.get(self.owner_field) is None:
+            return None
+
+        self.put(_id, doc[self.owner_field])
+        return doc[self.owner_field]
+
+    def put(self, _id: ObjectId, owner: ObjectId):
+        if _id is None or owner is None or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._owners[_id] = owner
+            self._owners.move_to_end(_id)
+
+            while len(self._owners) > self.max_size:
+                self._owners.popitem(last=False)
+
+    def invalidate(self, _id: ObjectId):
+        with self._lock:
+            self._owners.pop(_id, None)
+
+
+item_owners = OwnerCache(items_collection, "bid", int(os.getenv("OWNER_CACHE_MAX_SIZE", 100000)))
+business_owners = OwnerCache(businesses_collection, "_id", int(os.getenv("OWNER_CACHE_MAX_SIZE", 100000)))
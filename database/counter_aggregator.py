@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class CounterAggregator:
+    """
+    Buffers counter increments per document and writes them with one bulk_write of $inc operations per collection, every
+    flush_interval seconds or once max_pending counters are buffered. Increments not flushed yet are lost if the process dies.
+    """
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._collections = {}
+        self._pending: dict[tuple, int] = {}
+        self._on_insert: dict[tuple, dict] = {}
+        self.flushes = 0
+        self.flushed_increments = 0
+        self.flush_errors = 0
+
+    def increment(self, collection, _id, field: str, amount: int = 1, on_insert: dict = None) -> int:
+        """
+        :param on_insert: fields of the document to create if it doesn't exist, the document must exist when None
+        :return: the document's increments of field that were not flushed yet, including this one
+        """
+        key = (collection.name, _id, field)
+        with self._lock:
+            self._collections[collection.name] = collection
+            pending = self._pending[key] = self._pending.get(key, 0) + amount
+            if on_insert is not None:
+                self._on_insert[(collection.name, _id)] = on_insert
+            should_flush = len(self._pending) >= self.max_pending
+
+        if should_flush:
+            self.flush()
+
+        return pending
+
+    def pending(self, collection, _id, field: str) -> int:
+        with self._lock:
+            return self._pending.get((collection.name, _id, field), 0)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                on_insert, self._on_insert = self._on_insert, {}
+
+            updates: dict[str, dict] = {}
+            for (collection_name, _id, field), amount in pending.items():
+                if amount != 0:
+                    updates.setdefault(collection_name, {}).setdefault(_id, {})[field] = amount
+
+            for collection_name, increments in updates.items():
+                operations = list(increments.items())
+                try:
+                    self._collections[collection_name].bulk_write(
+                        [CounterAggregator._update(_id, fields, on_insert.get((collection_name, _id))) for _id, fields in operations],
+                        ordered=False
+                    )
+                except BulkWriteError as e:
+                    # write errors are rejected documents, retrying them would fail again
+                    logger.warning(f"Dropped {len(e.details.get('writeErrors', []))} of {len(operations)} counters of {collection_name}: {e}")
+                    with self._lock:
+                        self.flush_errors += 1
+
+                    continue
+                except Exception as e:
+                    logger.warning(f"Failed flushing {len(increments)} counters of {collection_name}, retrying on next flush: {e}")
+                    self._restore(collection_name, increments, on_insert)
+                    continue
+
+                with self._lock:
+                    self.flushes += 1
+                    self.flushed_increments += sum(map(len, increments.values()))
+
+    @staticmethod
+    def _update(_id, fields: dict, on_insert: dict | None) -> UpdateOne:
+        if on_insert is None:
+            return UpdateOne({"_id": _id}, {"$inc": fields})
+
+        return UpdateOne({"_id": _id}, {"$inc": fields, "$setOnInsert": on_insert}, upsert=True)
+
+    def _restore(self, collection_name: str, increments: dict, on_insert: dict):
+        with self._lock:
+            self.flush_errors += 1
+            for _id, fields in increments.items():
+                for field, amount in fields.items():
+                    key = (collection_name, _id, field)
+                    self._pending[key] = self._pending.get(key, 0) + amount
+
+                if (collection_name, _id) in on_insert:
+                    self._on_insert.setdefault((collection_name, _id), on_insert[(collection_name, _id)])
+
+    def schedule(self):
+        """
+        Flushes every flush_interval seconds and on shutdown, called once on startup.
+        """
+        scheduler.every(self.flush_interval, self.flush, name="Counter flush")
+        scheduler.on_shutdown(self.flush)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "flushes": self.flushes,
+                "flushed_counters": self.flushed_increments,
+                "flush_errors": self.flush_errors,
+            }
+
+
+counter_aggregator = CounterAggregator(
+    flush_interval=float(os.getenv("COUNTER_FLUSH_SECONDS", 2)),
+    max_pending=int(os.getenv("COUNTER_MAX_PENDING", 10000)),
+)
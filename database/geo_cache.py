@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from scheduler import scheduler
+
+EARTH_RADIUS_METERS = 6378100  # the radius Mongo's spherical geo queries use
+# explore pages are ranked by spherical_distance alone, distances computed by NumPy or Mongo only preselect documents and can
+# be off by float error, preselection widens its bounds by this many meters so it never drops a document
+DISTANCE_ERROR_MARGIN = 1.0
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+RADIUS_BUCKETS = (2000, 5000, 10000, 20000, 50000, 100000)
+
+
+def spherical_distance(a: List[float], b: List[float]) -> float:
+    """
+    Great circle distance in meters between two points given as stored in "loc.coordinates". Coordinates are read the way Mongo
+    reads GeoJSON points, [longitude, latitude], so distances match the ones $geoNear computes for the same documents.
+    """
+    lng_a, lat_a, lng_b, lat_b = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat_b - lat_a) / 2) ** 2 + math.cos(lat_a) * math.cos(lat_b) * math.sin((lng_b - lng_a) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(h)))
+
+
+def geohash_bounds(point: List[float], precision: int) -> (str, tuple, tuple):
+    """
+    :return: the geohash of the cell containing point, and the cell's (longitude, latitude) ranges
+    """
+    lng_range, lat_range = [-180.0, 180.0], [-90.0, 90.0]
+    cell = []
+    bits, bit_count, even = 0, 0, True
+    while len(cell) < precision:
+        value_range, value = (lng_range, point[0]) if even else (lat_range, point[1])
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            cell.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(cell), tuple(lng_range), tuple(lat_range)
+
+
+class GeoCache:
+    """
+    Candidates of radius queries shared by every query centered in the same geohash cell with a radius in the same bucket.
+    An entry holds the _id and coordinates of every document within the bucket's radius of any point in the cell, so a query is
+    answered exactly by measuring distances from its own center. Entries are dropped after ttl seconds or when a document
+    within their reach is created, moved or deleted. Areas with more than max_results candidates are not cached.
+    """
+
+    def __init__(self, ttl: float, precision: int, max_entries: int, max_results: int):
+        self.ttl = ttl
+        self.precision = precision
+        self.max_entries = max_entries
+        self.max_results = max_results
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        # key -> [center, reach, loads in flight, generation], invalidations bump the generation of loads they fall within
+        self._loading: Dict[tuple, list] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def candidates(self, collection, point: List[float], max_distance: float, loader) -> List[tuple] | None:
+        """
+        :param loader: called with (center, radius, limit) on a miss, returns up to limit documents with their _id and loc
+        :return: (_id, coordinates) of every document that may be within max_distance of point, None if the query isn't cacheable
+        """
+        bucket = next((bucket for bucket in RADIUS_BUCKETS if bucket >= max_distance), None)
+        if not self.enabled or bucket is None:
+            return None
+
+        cell, lng_range, lat_range = geohash_bounds(point, self.precision)
+        key = (collection.name, cell, bucket)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+
+            self.misses += 1
+
+        center = [(lng_range[0] + lng_range[1]) / 2, (lat_range[0] + lat_range[1]) / 2]
+        reach = bucket + max(spherical_distance(center, [lng, lat]) for lng in lng_range for lat in lat_range)
+
+        with self._lock:
+            loading = self._loading.setdefault(key, [center, reach, 0, 0])
+            loading[2] += 1
+            generation = loading[3]
+
+        try:
+            docs = loader(center, reach, self.max_results + 1)
+        finally:
+            with self._lock:
+                loading[2] -= 1
+                if loading[2] == 0:
+                    del self._loading[key]
+
+        results = [(doc["_id"], doc["loc"]["coordinates"]) for doc in docs] if len(docs) <= self.max_results else None
+        with self._lock:
+            if loading[3] != generation:
+                # a document within reach changed during the load, the results may predate it so they are not cached
+                return results
+
+            self._entries[key] = (time.monotonic() + self.ttl, center, reach, results)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return results
+
+    def invalidate(self, collection, coordinates: List[float]):
+        """
+        Drops the entries of collection that a document at coordinates falls within, loads in flight for them are not cached.
+        """
+        with self._lock:
+            for key in [key for key, (_, center, reach, _) in self._entries.items()
+                        if key[0] == collection.name and spherical_distance(center, coordinates) <= reach]:
+                del self._entries[key]
+
+            for key, loading in self._loading.items():
+                if key[0] == collection.name and spherical_distance(loading[0], coordinates) <= loading[1]:
+                    loading[3] += 1
+
+    def clear(self, collection):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection.name]:
+                del self._entries[key]
+
+            for key, loading in self._loading.items():
+                if key[0] == collection.name:
+                    loading[3] += 1
+
+    def evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0] < now]:
+                del self._entries[key]
+
+    def schedule(self):
+        """
+        Evicts expired entries every ttl seconds while the cache is enabled, called once on startup.
+        """
+        if self.enabled:
+            scheduler.every(self.ttl, self.evict_expired, name="Geo cache eviction")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+geo_cache = GeoCache(
+    ttl=float(os.getenv("GEO_CACHE_TTL_SECONDS", 30)),
+    precision=int(os.getenv("GEO_CACHE_PRECISION", 6)),
+    max_entries=int(os.getenv("GEO_CACHE_MAX_ENTRIES", 5000)),
+    max_results=int(os.getenv("GEO_CACHE_MAX_RESULTS", 1000)),
+)
@@ -1,33 +1,173 @@
 from __future__ import annotations
 
+import io
+import logging
 import uuid
+from enum import Enum
+from typing import List
+
+from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+from PIL.Image import DecompressionBombError
 
 from database import s3Bucket
 
+logger = logging.getLogger(__name__)
+
+
+class InvalidImageError(ValueError):
+    def __init__(self, reason: str):
+        super().__init__(f"Image could not be decoded: {reason}")
+
+
+class ImageVariant(Enum):
+    """
+    Sized and recompressed copies of an uploaded image. The full variant is the original upload.
+    """
+    Thumbnail = "thumbnail"
+    Card = "card"
+    Full = "full"
+
 
 class Image:
+    VARIANT_MAX_SIZES = {
+        ImageVariant.Thumbnail: 200,
+        ImageVariant.Card: 720,
+    }
+
+    VARIANT_QUALITY = 80
+
     def __init__(self, image_id: str):
         self.image_id = image_id
 
     def __repr__(self):
         return self.image_id
 
-    def get_image(self) -> bytes:
-        return s3Bucket.get(self.image_id)
+    def get_image(self, variant: ImageVariant = None) -> bytes:
+        if variant is None or variant == ImageVariant.Full:
+            return s3Bucket.get(self.image_id)
+
+        try:
+            return s3Bucket.get(self.variant_id(variant))
+        except Exception:
+            return s3Bucket.get(self.image_id)
+
+    def variant_id(self, variant: ImageVariant = None) -> str | None:
+        return Image.build_variant_id(self.image_id, variant)
 
     def delete_image(self):
+        for variant in Image.VARIANT_MAX_SIZES:
+            try:
+                s3Bucket.delete(self.variant_id(variant))
+            except Exception as e:
+                logger.warning(f"Failed deleting {variant.value} variant of {self.image_id}: {e}")
+
         return s3Bucket.delete(self.image_id)
 
     @staticmethod
-    def upload(image: bytes, key=None, folder_name: str = "") -> Image:
+    def build_variant_id(image_id: str, variant: ImageVariant = None) -> str | None:
+        if image_id is None or variant is None or variant == ImageVariant.Full:
+            return image_id
+
+        return f"{image_id}_{variant.value}"
+
+    @staticmethod
+    def original_id(image_id: str) -> str:
+        """
+        Strips a variant suffix from an image id.
+        """
+        for variant in Image.VARIANT_MAX_SIZES:
+            suffix = f"_{variant.value}"
+            if image_id is not None and image_id.endswith(suffix):
+                return image_id[:-len(suffix)]
+
+        return image_id
+
+    @staticmethod
+    def parse_variant(variant) -> ImageVariant | None:
+        if variant is None:
+            return None
+
+        try:
+            return ImageVariant(str(variant).lower())
+        except ValueError:
+            return None
+
+    @staticmethod
+    def detect_content_type(image: bytes) -> str:
+        """
+        :return: the mime type of the image format, read from the image's leading bytes
+        """
+        if image is None:
+            return "application/octet-stream"
+
+        if image.startswith(b"\xff\xd8\xff"):
+            return "image/jpeg"
+        if image.startswith(b"\x89PNG\r\n\x1a\n"):
+            return "image/png"
+        if image.startswith((b"GIF87a", b"GIF89a")):
+            return "image/gif"
+        if image[:4] == b"RIFF" and image[8:12] == b"WEBP":
+            return "image/webp"
+
+        return "application/octet-stream"
+
+    @staticmethod
+    def render_variants(image: bytes) -> dict:
+        """
+        Renders every sized variant of an image as JPEG.
+        :return: map of variant to image bytes
+        :raises InvalidImageError: if the image could not be decoded or exceeds Pillow's decompression bomb limit
+        """
+        try:
+            with PILImage.open(io.BytesIO(image)) as original:
+                original = ImageOps.exif_transpose(original)
+                if original.mode not in ("RGB", "L"):
+                    original = original.convert("RGB")
+
+                variants = {}
+                for variant, max_size in Image.VARIANT_MAX_SIZES.items():
+                    resized = original.copy()
+                    resized.thumbnail((max_size, max_size))
+
+                    output = io.BytesIO()
+                    resized.save(output, "JPEG", quality=Image.VARIANT_QUALITY, optimize=True, progressive=True)
+                    variants[variant] = output.getvalue()
+
+                return variants
+        except (UnidentifiedImageError, DecompressionBombError, OSError, ValueError) as e:
+            raise InvalidImageError(str(e)) from e
+
+    @staticmethod
+    def upload(image: bytes, key=None, folder_name: str = "", generate_variants: bool = True) -> Image:
         if key is None:
             key = str(uuid.uuid4())
-        key = folder_name + key
-        res = s3Bucket.upload(image, key)
-        if res is not None:
-            raise RuntimeError("Failed to upload image.\n" + str(res))
 
-        return Image(key)
+        return Image._upload_all([(image, folder_name + key)], generate_variants)[0]
+
+    @staticmethod
+    def upload_many(*images: bytes, folder_name: str = "", generate_variants: bool = True) -> List[Image]:
+        """
+        Uploads images and their variants concurrently, if any upload fails none of the images are kept.
+        :raises InvalidImageError: if an image could not be decoded, before anything is uploaded
+        :raises S3UploadError: with the keys that failed to upload
+        """
+        return Image._upload_all([(image, folder_name + str(uuid.uuid4())) for image in images], generate_variants)
+
+    @staticmethod
+    def _upload_all(images: List[tuple], generate_variants: bool) -> List[Image]:
+        # variants are rendered on the shared executor, Pillow releases the GIL while decoding and resizing
+        renders = [s3Bucket.submit(Image.render_variants, image) for image, _ in images] if generate_variants else []
+
+        uploads = []
+        for i, (image, key) in enumerate(images):
+            uploads.append((image, key, Image.detect_content_type(image)))
+
+            if generate_variants:
+                for variant, data in renders[i].result().items():
+                    uploads.append((data, Image.build_variant_id(key, variant), "image/jpeg"))
+
+        s3Bucket.upload_all(*uploads)
+        return [Image(key) for _, key in images]
 
     def __getstate__(self):
         return self.image_id
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import datetime
+import logging
+import os
+from typing import List
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from database import Image, pending_uploads_collection
+from scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class PendingUploads:
+    """
+    Images uploaded ahead of the document that references them. Each upload is recorded with its uploader until a document
+    claims it, only the uploader can claim it and only once. Uploads still unclaimed ttl seconds after the upload are deleted
+    from S3 by delete_expired.
+    """
+
+    def __init__(self, collection, ttl: float, cleanup_interval: float):
+        self.collection = collection
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+
+    def add(self, image: Image, owner_id: ObjectId):
+        self.collection.insert_one({"_id": image.image_id, "uid": owner_id, "exp": self._expiration()})
+
+    def claim(self, owner_id: ObjectId, image_ids: List[str]) -> bool:
+        """
+        Removes the records of image_ids so the images are kept.
+        :return: False if any of the images is not a pending upload of owner_id, nothing is claimed then
+        """
+        claimed = []
+        for image_id in dict.fromkeys(image_ids):
+            # deleting the record is what claims it, the expiration job and other claims race on the same delete
+            if self.collection.find_one_and_delete({"_id": image_id, "uid": owner_id}) is None:
+                self.release(owner_id, claimed)
+                return False
+
+            claimed.append(image_id)
+
+        return True
+
+    def release(self, owner_id: ObjectId, image_ids: List[str]):
+        """
+        Returns claimed images to the pending uploads, when the document that claimed them was not saved.
+        """
+        for image_id in image_ids:
+            try:
+                self.collection.insert_one({"_id": image_id, "uid": owner_id, "exp": self._expiration()})
+            except DuplicateKeyError:
+                continue
+
+    def delete_expired(self) -> int:
+        deleted = 0
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for doc in self.collection.find({"exp": {"$lt": now}}, {"exp": 0}):
+            if self.collection.find_one_and_delete({"_id": doc["_id"], "exp": {"$lt": now}}) is None:
+                continue
+
+            try:
+                Image(doc["_id"]).delete_image()
+                deleted += 1
+            except Exception as e:
+                logger.warning(f"Failed deleting expired upload {doc['_id']}, retrying on next cleanup: {e}")
+                self.collection.insert_one({**doc, "exp": now})
+
+        return deleted
+
+    def schedule(self):
+        """
+        Deletes expired uploads every cleanup_interval seconds, called once on startup.
+        """
+        scheduler.every(self.cleanup_interval, self.delete_expired, name="Pending upload cleanup")
+
+    def _expiration(self) -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.ttl)
+
+
+pending_uploads = PendingUploads(
+    pending_uploads_collection,
+    ttl=float(os.getenv("PENDING_UPLOAD_TTL_SECONDS", 24 * 60 * 60)),
+    cleanup_interval=float(os.getenv("PENDING_UPLOAD_CLEANUP_SECONDS", 60 * 60)),
+)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import os
+import threading
+from typing import List
+
+from bson import ObjectId
+
+from database.geo_cache import DISTANCE_ERROR_MARGIN, EARTH_RADIUS_METERS, spherical_distance
+from scheduler import scheduler
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class SpatialIndex:
+    """
+    In memory index of the locations of one collection's documents answering radius queries ordered by distance.
+    Points are kept in NumPy arrays sorted by latitude, a query only measures the points inside its latitude band. The arrays
+    preselect the points in reach, those are ranked with spherical_distance like every other explore path.
+    Writes made through the document objects are applied incrementally as a small delta merged into the arrays once it grows,
+    the whole index is reloaded every refresh_interval seconds to pick up writes made by other processes. Writes made while a
+    load reads the collection are buffered and applied on top of the loaded points.
+    Until the first load finished the index is cold and queries return None so callers fall back to Mongo.
+    Coordinates are read the way Mongo reads GeoJSON points, [longitude, latitude].
+    """
+
+    def __init__(self, collection, refresh_interval: float, merge_size: int):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.merge_size = merge_size
+
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._loading = False
+
+        self._ids = None
+        self._lats = None
+        self._lngs = None
+        self._removed: set[bytes] = set()
+        self._added: dict[bytes, tuple] = {}
+        # updates made since the running load started reading, None while no load runs
+        self._pending: dict[bytes, tuple | None] | None = None
+
+    def __len__(self):
+        return (len(self._ids) if self._ids is not None else 0) + len(self._added)
+
+    def ensure_loading(self):
+        """
+        Starts loading the index on the scheduler's workers, then keeps it refreshed.
+        """
+        with self._load_lock:
+            if self._loaded or self._loading:
+                return
+
+            self._loading = True
+
+        scheduler.every(self.refresh_interval, self.load, name=f"{self.collection.name} spatial index", initial_delay=0)
+
+    def load(self):
+        with self._lock:
+            self._pending = {}
+
+        try:
+            docs = [(doc["_id"].binary, doc["loc"]["coordinates"])
+                    for doc in self.collection.find({"loc": {"$ne": None}}, {"loc": 1}) if doc.get("loc") is not None]
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            points = {_id: SpatialIndex._point(coordinates) for _id, coordinates in docs}
+            # the read may have missed any of these, the update is at least as recent as what it saw
+            for key, point in self._pending.items():
+                if point is None:
+                    points.pop(key, None)
+                else:
+                    points[key] = point
+
+            self._pending = None
+            self._build(points)
+            self._loaded = True
+
+        logger.debug(f"Loaded spatial index of {self.collection.name} with {len(docs)} points")
+
+    def update(self, _id: ObjectId, coordinates: List[float] | None):
+        """
+        Applies a created, moved (coordinates) or deleted (None) document.
+        """
+        key = _id.binary
+        with self._lock:
+            if self._pending is not None:
+                self._pending[key] = SpatialIndex._point(coordinates) if coordinates is not None else None
+
+            if not self._loaded:
+                return
+
+            self._removed.add(key)
+            self._added.pop(key, None)
+            if coordinates is not None:
+                self._added[key] = SpatialIndex._point(coordinates)
+
+            if len(self._added) + len(self._removed) >= self.merge_size:
+                self._merge()
+
+    def query(self, location: List[float], max_distance: float, cursor: tuple = None, limit: int = None) -> List[tuple] | None:
+        """
+        :param cursor: only documents ordered after this (distance, _id) are returned
+        :return: (distance, _id) of documents within max_distance of location closest first, None while the index is cold
+        """
+        if not self._loaded:
+            self.ensure_loading()
+            return None
+
+        lat, lng = location[1], location[0]
+        band = math.degrees((max_distance + DISTANCE_ERROR_MARGIN) / EARTH_RADIUS_METERS)
+        with self._lock:
+            start, end = np.searchsorted(self._lats, [lat - band, lat + band + 1e-12])
+            ids, lats, lngs = self._ids[start:end], self._lats[start:end], self._lngs[start:end]
+            if len(self._removed) > 0:
+                keep = ~np.isin(ids, np.array(list(self._removed), dtype="S12"))
+                ids, lats, lngs = ids[keep], lats[keep], lngs[keep]
+
+            if len(self._added) > 0:
+                added_ids, added_points = zip(*self._added.items())
+                added = np.array(added_points, dtype=np.float64)
+                ids = np.concatenate([ids, np.array(added_ids, dtype="S12")])
+                lats = np.concatenate([lats, added[:, 0]])
+                lngs = np.concatenate([lngs, added[:, 1]])
+
+        lat_radians, lats_radians = math.radians(lat), np.radians(lats)
+        h = (np.sin((lats_radians - lat_radians) / 2) ** 2
+             + math.cos(lat_radians) * np.cos(lats_radians) * np.sin((np.radians(lngs) - math.radians(lng)) / 2) ** 2)
+        approximate = 2 * EARTH_RADIUS_METERS * np.arcsin(np.minimum(1.0, np.sqrt(h)))
+
+        mask = approximate <= max_distance + DISTANCE_ERROR_MARGIN
+        if cursor is not None:
+            mask &= approximate >= cursor[0] - DISTANCE_ERROR_MARGIN
+
+        ranked = []
+        for raw_id, point_lat, point_lng in zip(ids[mask].tolist(), lats[mask].tolist(), lngs[mask].tolist()):
+            distance = spherical_distance(location, [point_lng, point_lat])
+            _id = ObjectId(SpatialIndex._key(raw_id))
+            if distance <= max_distance and (cursor is None or (distance, _id) > cursor):
+                ranked.append((distance, _id))
+
+        return heapq.nsmallest(limit, ranked) if limit is not None else sorted(ranked)
+
+    @staticmethod
+    def _point(coordinates: List[float]) -> tuple:
+        # kept as stored so ranking measures the same floats as the other explore paths
+        return coordinates[1], coordinates[0]
+
+    @staticmethod
+    def _key(raw: bytes) -> bytes:
+        # fixed width bytes arrays drop trailing null bytes, pad them back to a full ObjectId
+        return bytes(raw).ljust(12, b"\0")
+
+    def _merge(self):
+        points = {SpatialIndex._key(key): (lat, lng) for key, lat, lng in zip(self._ids.tolist(), self._lats.tolist(), self._lngs.tolist())}
+        for key in self._removed:
+            points.pop(key, None)
+
+        points.update(self._added)
+        self._build(points)
+
+    def _build(self, points: dict):
+        """
+        :param points: map of ObjectId bytes to (latitude, longitude) in degrees
+        """
+        ids = np.array(list(points.keys()), dtype="S12")
+        coordinates = np.array(list(points.values()), dtype=np.float64).reshape(-1, 2)
+
+        order = np.argsort(coordinates[:, 0], kind="stable")
+        self._ids = ids[order]
+        self._lats = coordinates[order, 0]
+        self._lngs = coordinates[order, 1]
+        self._removed = set()
+        self._added = {}
+
+
+class SpatialIndexes:
+    """
+    The spatial indexes of each geo queried collection, created on first use when SPATIAL_INDEX_ENABLED is set and NumPy is
+    installed.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SPATIAL_INDEX_ENABLED", "false").lower() in ("1", "true", "yes") and np is not None
+        self.refresh_interval = float(os.getenv("SPATIAL_INDEX_REFRESH_SECONDS", 60))
+        self.merge_size = int(os.getenv("SPATIAL_INDEX_MERGE_SIZE", 1024))
+
+        self._lock = threading.Lock()
+        self._indexes: dict[str, SpatialIndex] = {}
+
+    def get(self, collection) -> SpatialIndex | None:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            index = self._indexes.get(collection.name)
+            if index is None:
+                index = self._indexes[collection.name] = SpatialIndex(collection, self.refresh_interval, self.merge_size)
+
+            return index
+
+    def update(self, collection, _id: ObjectId, coordinates: List[float] | None):
+        with self._lock:
+            index = self._indexes.get(collection.name)
+
+        if index is not None:
+            index.update(_id, coordinates)
+
+
+spatial_indexes = SpatialIndexes()
@@ -3,12 +3,10 @@ from __future__ import annotations
 from typing import List, Dict
 
 from bson import ObjectId
-from pymongo import ReturnDocument
 
 import database.business.item.item as item_module
 import database.user.cart_item as cart_item_module
 import database.user.user as user_module
-from database import users_collection
 
 
 class Cart:
@@ -24,63 +22,69 @@ class Cart:
     def get_full_items(self):
         return item_module.Item.get_items(*list(map(lambda i: i.item_id, self.items)))
 
-    def replace_items(self, items: List[cart_item_module.CartItem]):
+    # every mutator takes return_result and fields, see User.update_user
+
+    def replace_items(self, items: List[cart_item_module.CartItem], return_result: bool = True, fields=None):
         db_items = list(map(lambda item: cart_item_module.CartItem.get_db_repr(item), items))
-        return user_module.User.document_repr_to_object(users_collection.find_one_and_update({"_id": self.user_id}, {
+        return user_module.User.update_user_object(self.user_id, {
             "$set": {self.db_prefix: db_items}
-        }, return_document=ReturnDocument.AFTER))
+        }, return_result, fields)
 
-    def remove(self, index):
-        users_collection.update_one({"_id": self.user_id}, {
-            "$set": {f"{self.db_prefix}.{index}": 1}
-        })
+    def remove(self, index, return_result: bool = True, fields=None):
+        user_module.User.update_user(self.user_id, {
+            "$unset": {f"{self.db_prefix}.{index}": 1}
+        }, return_result=False)
 
-        return user_module.User.document_repr_to_object(users_collection.find_one_and_update({"_id": self.user_id}, {
+        return user_module.User.update_user_object(self.user_id, {
             "$pull": {self.db_prefix: None}
-        }, return_document=ReturnDocument.AFTER))
+        }, return_result, fields)
 
-    def mass_remove(self, *index):
+    def mass_remove(self, *index, return_result: bool = True, fields=None):
         unsetDict = {f"{self.db_prefix}.{index}": 1 for index in index}
 
-        users_collection.update_one({"_id": self.user_id}, {
+        user_module.User.update_user(self.user_id, {
             "$unset": unsetDict
-        })
+        }, return_result=False)
 
-        return user_module.User.document_repr_to_object(users_collection.find_one_and_update({"_id": self.user_id}, {
+        return user_module.User.update_user_object(self.user_id, {
             "$pull": {self.db_prefix: None}
-        }, return_document=ReturnDocument.AFTER))
+        }, return_result, fields)
 
-    def add_item(self, cart_item: cart_item_module.CartItem):
-        return user_module.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+    def add_item(self, cart_item: cart_item_module.CartItem, return_result: bool = True, fields=None):
+        return user_module.User.update_user_object(
+            self.user_id,
             {"$addToSet": {self.db_prefix: cart_item_module.CartItem.get_db_repr(cart_item)}},
-            return_document=ReturnDocument.AFTER
-        ))
+            return_result,
+            fields
+        )
 
-    def add_items(self, *cart_item: cart_item_module.CartItem):
+    def add_items(self, *cart_item: cart_item_module.CartItem, return_result: bool = True, fields=None):
         items = list(map(lambda item: cart_item_module.CartItem.get_db_repr(item), cart_item))
 
-        return user_module.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+        return user_module.User.update_user_object(
+            self.user_id,
             {"$addToSet": {self.db_prefix: {"$each": items}}},
-            return_document=ReturnDocument.AFTER
-        ))
+            return_result,
+            fields
+        )
 
-    def update_quantity(self, index: int, quantity: int):
-        return user_module.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+    def update_quantity(self, index: int, quantity: int, return_result: bool = True, fields=None):
+        return user_module.User.update_user_object(
+            self.user_id,
             {"$set": {f"{self.db_prefix}.{index}.amt": quantity}},
-            return_document=ReturnDocument.AFTER
-        ))
+            return_result,
+            fields
+        )
 
-    def mass_update_quantity(self, quantities: Dict[int, int]):
+    def mass_update_quantity(self, quantities: Dict[int, int], return_result: bool = True, fields=None):
         setDict = {f"{self.db_prefix}.{index}.amt": quantity for index, quantity in quantities.items()}
 
-        return user_module.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+        return user_module.User.update_user_object(
+            self.user_id,
             {"$set": setDict},
-            return_document=ReturnDocument.AFTER
-        ))
+            return_result,
+            fields
+        )
 
     @staticmethod
     def document_repr_to_object(doc, **kwargs):
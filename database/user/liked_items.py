@@ -1,11 +1,12 @@
+from __future__ import annotations
+
 from typing import List
 
 import jsonpickle
 from bson import ObjectId
-from pymongo import ReturnDocument
 
 import database.user.user as user
-from database import users_collection, DocumentObject
+from database import DocumentObject
 
 
 class LikedItems(DocumentObject):
@@ -28,41 +29,37 @@ class LikedItems(DocumentObject):
     def document_repr_to_object(doc, **kwargs):
         return LikedItems(liked_items=doc, user_id=kwargs["_id"])
 
-    def add_liked_item(self, item_id: bytes) -> user.User:
-        res = user.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+    def add_liked_item(self, item_id: bytes, return_result: bool = True, fields=None) -> user.User | None:
+        return user.User.update_user_object(
+            self.user_id,
             {"$addToSet": {"lk": item_id}},
-            return_document=ReturnDocument.AFTER
-        ))
-
-        return res
+            return_result,
+            fields
+        )
 
-    def add_liked_items(self, *item_id: ObjectId) -> user.User:
-        res = user.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+    def add_liked_items(self, *item_id: ObjectId, return_result: bool = True, fields=None) -> user.User | None:
+        return user.User.update_user_object(
+            self.user_id,
             {"$addToSet": {"lk": {"$each": item_id}}},
-            return_document=ReturnDocument.AFTER
-        ))
-
-        return res
+            return_result,
+            fields
+        )
 
-    def remove_liked_item(self, item_id: ObjectId) -> user.User:
-        res = user.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+    def remove_liked_item(self, item_id: ObjectId, return_result: bool = True, fields=None) -> user.User | None:
+        return user.User.update_user_object(
+            self.user_id,
             {"$pull": {"lk": item_id}},
-            return_document=ReturnDocument.AFTER
-        ))
+            return_result,
+            fields
+        )
 
-        return res
-
-    def remove_liked_items(self, *item_id: ObjectId) -> user.User:
-        res = user.User.document_repr_to_object(users_collection.find_one_and_update(
-            {"_id": self.user_id},
+    def remove_liked_items(self, *item_id: ObjectId, return_result: bool = True, fields=None) -> user.User | None:
+        return user.User.update_user_object(
+            self.user_id,
             {"$pullAll": {"lk": item_id}},
-            return_document=ReturnDocument.AFTER
-        ))
-
-        return res
+            return_result,
+            fields
+        )
 
     def __repr__(self):
         return jsonpickle.encode(LikedItems.get_db_repr(self), unpicklable=False)
@@ -4,9 +4,9 @@ from typing import List
 
 import jsonpickle
 from bson import ObjectId
-from pymongo import ReturnDocument
 
-from database import orders_collection, users_collection
+import database.user.user as user_module
+from database import orders_collection
 from database.user.order import Order
 
 
@@ -18,20 +18,21 @@ class OrderHistory:
     def get_orders(self):
         return list(map(lambda doc: Order.document_repr_to_object(doc), orders_collection.find({"_id": {"$in": self.orders}})))
 
-    def add_order(self, order_id: ObjectId) -> OrderHistory:
-        return OrderHistory.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": self.user_id}, {"$addToSet": {"odh": order_id}}, return_document=ReturnDocument.AFTER
-            ),
-            _id=self.user_id
-        )
+    def add_order(self, order_id: ObjectId, return_result: bool = True) -> OrderHistory | None:
+        return self._update({"$addToSet": {"odh": order_id}}, return_result)
 
-    def remove_order(self, order_id: ObjectId) -> OrderHistory:
-        return OrderHistory.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": self.user_id}, {"$pull": {"odh": order_id}}, return_document=ReturnDocument.AFTER
-            )
-        )
+    def remove_order(self, order_id: ObjectId, return_result: bool = True) -> OrderHistory | None:
+        return self._update({"$pull": {"odh": order_id}}, return_result)
+
+    def _update(self, update: dict, return_result: bool) -> OrderHistory | None:
+        """
+        :return: the updated order history, read without the rest of the user document
+        """
+        doc = user_module.User.update_user(self.user_id, update, return_result, fields=("order_history",))
+        if doc is None:
+            return None
+
+        return OrderHistory.document_repr_to_object(doc.get("odh", None) or [], _id=self.user_id)
 
     def __repr__(self):
         return jsonpickle.encode(OrderHistory.get_db_repr(self, True), unpicklable=False)
@@ -0,0 +1,90 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent import futures
+
+import bcrypt_worker
+from singleton import Singleton
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusyError(RuntimeError):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hasher is saturated, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class PasswordHasher(metaclass=Singleton):
+    """
+    Runs bcrypt on a dedicated process pool so hashing does not hold server threads or the GIL.
+    The pool queue is bounded, when it is full work is rejected with PasswordHasherBusyError instead of queueing.
+    Workers are started by a forkserver, or spawned where it is unavailable, never forked from this multithreaded process:
+    a forked child can deadlock on a lock another thread held at fork time.
+    """
+
+    def __init__(self):
+        self.rounds = int(os.getenv("BCRYPT_ROUNDS", 13))
+        self.pool_size = int(os.getenv("PASSWORD_HASHER_POOL_SIZE", os.cpu_count() or 1))
+        self.queue_size = int(os.getenv("PASSWORD_HASHER_QUEUE_SIZE", self.pool_size * 4))
+        self.retry_after = int(os.getenv("PASSWORD_HASHER_RETRY_AFTER_SECONDS", 2))
+
+        self._slots = threading.BoundedSemaphore(self.pool_size + self.queue_size)
+        self._executor_lock = threading.Lock()
+        self._executor: futures.ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> futures.ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = futures.ProcessPoolExecutor(max_workers=self.pool_size, mp_context=PasswordHasher.worker_context())
+
+            return self._executor
+
+    @staticmethod
+    def worker_context():
+        if "forkserver" not in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("spawn")
+
+        context = multiprocessing.get_context("forkserver")
+        # the fork server imports bcrypt_worker once and forks workers from its single thread
+        context.set_forkserver_preload(["bcrypt_worker"])
+        return context
+
+    def hash(self, password: str) -> bytes:
+        return self._run(bcrypt_worker.hash_password, password.encode(), self.rounds)
+
+    def check(self, password: str, hashed_password: bytes) -> bool:
+        return self._run(bcrypt_worker.check_password, password.encode(), hashed_password)
+
+    def needs_rehash(self, hashed_password: bytes) -> bool:
+        """
+        :return: whether the hash was made with a cost other than BCRYPT_ROUNDS
+        """
+        try:
+            return int(hashed_password.split(b"$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusyError(self.retry_after)
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+password_hasher = PasswordHasher()
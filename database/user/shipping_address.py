@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import jsonpickle
 from bson import ObjectId
-from pymongo import ReturnDocument
 
 import database.user as user
 from database import DocumentObject, users_collection
@@ -60,11 +59,7 @@ class ShippingAddress(DocumentObject):
 
     def update_field(self, field_name, value) -> user.User:
         return user.User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": ObjectId(self.user_id)},
-                {"$set": {"sa." + str(self.address_id) + "." + field_name: value}},
-                return_document=ReturnDocument.AFTER
-            )
+            user.User.update_user(ObjectId(self.user_id), {"$set": {"sa." + str(self.address_id) + "." + field_name: value}})
         )
 
     def update_fields(self, **kwargs) -> user.User:
@@ -74,7 +69,7 @@ class ShippingAddress(DocumentObject):
         }
 
         return user.User.document_repr_to_object(
-            users_collection.find_one_and_update({"_id": ObjectId(self.user_id)}, {"$set": update_dict}, return_document=ReturnDocument.AFTER)
+            user.User.update_user(ObjectId(self.user_id), {"$set": update_dict})
         )
 
     def __repr__(self):
@@ -98,18 +93,14 @@ class ShippingAddress(DocumentObject):
     @staticmethod
     def add_address(self, address: ShippingAddress) -> user.User:
         return user.User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": self.user_id},
-                {"$push": {"sa": ShippingAddress.get_db_repr(address)}},
-                return_document=ReturnDocument.AFTER
-            )
+            user.User.update_user(self.user_id, {"$push": {"sa": ShippingAddress.get_db_repr(address)}})
         )
 
     @staticmethod
     def remove_address(self, address_index) -> user.User:
         users_collection.update_one({"_id": self.user_id}, {"$unset": {"sa." + str(address_index): 1}})
         return user.User.document_repr_to_object(
-            users_collection.find_one_and_update({"_id": self.user_id}, {"$pull": {"sa": None}}, return_document=ReturnDocument.AFTER)
+            user.User.update_user(self.user_id, {"$pull": {"sa": None}})
         )
 
     @staticmethod
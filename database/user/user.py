@@ -3,7 +3,6 @@ from __future__ import annotations
 import logging
 from typing import List
 
-import bcrypt
 import jsonpickle
 from bson import ObjectId
 from pymongo import ReturnDocument
@@ -18,11 +17,30 @@ import database.user.unit as units
 import database.user.user_options as user_options
 from body import TokenData
 from database import users_collection, DocumentObject, Image, access_token_blacklist
+from database.user.password_hasher import password_hasher
+from database.user.user_cache import user_cache
 from database.user_auth import UserAuth
 
 logger = logging.getLogger(__name__)
 
 
+class LazyField:
+    """
+    User attribute built from the raw user document on first access, after which the built value shadows the descriptor.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        value = instance.hydrate(self.name)
+        instance.__dict__[self.name] = value
+        return value
+
+
 class User(DocumentObject):
     LONG_TO_SHORT = {
         "_id": "_id",
@@ -41,6 +59,17 @@ class User(DocumentObject):
 
     SHORT_TO_LONG = {value: key for key, value in LONG_TO_SHORT.items()}
 
+    # placeholder for sub-objects which are built from the document on first access
+    LAZY = object()
+
+    LAZY_FIELDS = {"options", "shipping_addresses", "liked_items", "cart", "order_history"}
+
+    options = LazyField()
+    shipping_addresses = LazyField()
+    liked_items = LazyField()
+    cart = LazyField()
+    order_history = LazyField()
+
     def __init__(
             self,
             _id: ObjectId,
@@ -62,12 +91,20 @@ class User(DocumentObject):
         self.phone = phone
         self.profile_picture = profile_picture
         self.password = password
-        self.options = options
-        self.shipping_addresses = shipping_addresses
-        self.liked_items = liked_items
-        self.cart = cart
         self.is_system_admin = is_system_admin
-        self.order_history: order_history_module.OrderHistory = order_history
+        self._doc = None
+        self._projected = False
+
+        sub_objects = {
+            "options": options,
+            "shipping_addresses": shipping_addresses,
+            "liked_items": liked_items,
+            "cart": cart,
+            "order_history": order_history,
+        }
+        for name, value in sub_objects.items():
+            if value is not User.LAZY:
+                self.__dict__[name] = value
 
         self.updatable_fields = {"email", "phone", "password", "profile_picture"}
 
@@ -77,7 +114,9 @@ class User(DocumentObject):
             phone: str,
             unit: units.Unit,
             currency_type: str,
-    ) -> User:
+            return_result: bool = True,
+            fields=None,
+    ) -> User | None:
         set_dict = {}
         if email is not None:
             set_dict['ml'] = email
@@ -91,65 +130,76 @@ class User(DocumentObject):
         if currency_type is not None:
             set_dict['op.ct'] = currency_type
 
+        return User.update_user_object(self._id, {"$set": set_dict}, return_result, fields)
+
+    @staticmethod
+    def update_user(_id: ObjectId, update: dict, return_result: bool = True, fields=None, **kwargs) -> dict | None:
+        """
+        Applies an update to a user document, every user write goes through here to keep the user cache in sync.
+        :param return_result: False applies the update with update_one and returns None
+        :param fields: the sub-objects (see LAZY_FIELDS) to return, the others are left out of the returned document
+        :return: the updated document
+        """
+        if not return_result:
+            users_collection.update_one({"_id": _id}, update, **kwargs)
+            user_cache.invalidate(_id)
+            return None
+
+        projection = User.projection(fields)
+        doc = users_collection.find_one_and_update(
+            {"_id": _id}, update, projection=projection, return_document=ReturnDocument.AFTER, **kwargs
+        )
+        if doc is not None and projection is None:
+            user_cache.put(doc)
+        else:
+            user_cache.invalidate(_id)
+
+        return doc
+
+    @staticmethod
+    def update_user_object(_id: ObjectId, update: dict, return_result: bool = True, fields=None) -> User | None:
+        """
+        Like update_user, but builds the returned user. Sub-objects left out by fields are fetched on access.
+        """
         return User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": self._id}, {"$set": set_dict}, return_document=ReturnDocument.AFTER
-            )
+            User.update_user(_id, update, return_result, fields),
+            projected=fields is not None
         )
 
     def insert(self) -> ObjectId:
         return users_collection.insert_one(User.get_db_repr(self)).inserted_id
 
-    def add_address(self, address: shipping_address.ShippingAddress):
-        return User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$addToSet": {"sa": shipping_address.ShippingAddress.get_db_repr(address)}},
-                return_document=ReturnDocument.AFTER
-            )
+    def add_address(self, address: shipping_address.ShippingAddress, return_result: bool = True, fields=None):
+        return User.update_user_object(
+            self._id,
+            {"$addToSet": {"sa": shipping_address.ShippingAddress.get_db_repr(address)}},
+            return_result,
+            fields
         )
 
-    def remove_address(self, index: int):
-        users_collection.find_one_and_update(
-            {"_id": self._id},
-            {"$unset": {f"sa.{index}": 1}}
-        )
+    def remove_address(self, index: int, return_result: bool = True, fields=None):
+        User.update_user(self._id, {"$unset": {f"sa.{index}": 1}}, return_result=False)
 
-        return User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$pull": {f"sa": None}},
-                return_document=ReturnDocument.AFTER
-            )
-        )
+        return User.update_user_object(self._id, {"$pull": {f"sa": None}}, return_result, fields)
 
-    def update_profile_picture(self, image: Image):
-        return User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": self._id},
-                {"$set": {f"pfp": image.image_id if image is not None else None}},
-                return_document=ReturnDocument.AFTER
-            )
+    def update_profile_picture(self, image: Image, return_result: bool = True, fields=None):
+        return User.update_user_object(
+            self._id,
+            {"$set": {f"pfp": image.image_id if image is not None else None}},
+            return_result,
+            fields
         )
 
-    def update_password(self, non_hashed_password: str):
+    def update_password(self, non_hashed_password: str, return_result: bool = True, fields=None):
         hashed = User.hash_password(non_hashed_password)
 
-        return User.document_repr_to_object(
-            users_collection.find_one_and_update({"_id": self._id}, {
-                "$set": {"pw": hashed}
-            }, return_document=ReturnDocument.AFTER)
-        )
+        return User.update_user_object(self._id, {"$set": {"pw": hashed}}, return_result, fields)
 
     @staticmethod
     def promote_to_business_user(_id: ObjectId, business_id: ObjectId):
         import database.user.business_user as business_user
         return business_user.BusinessUser.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": _id},
-                {"$set": {"bid": business_id}},
-                return_document=ReturnDocument.AFTER
-            )
+            User.update_user(_id, {"$set": {"bid": business_id}})
         )
 
     @staticmethod
@@ -170,16 +220,67 @@ class User(DocumentObject):
             if raw_document else User.document_repr_to_object(users_collection.find_one({"ml": email}))
 
     @staticmethod
-    def get_by_id(_id: ObjectId, raw_document=True) -> User | dict | None:
-        document = users_collection.find_one({"_id": _id})
+    def get_by_id(_id: ObjectId, raw_document=True, use_cache=False, fields=None) -> User | dict | None:
+        """
+        :param use_cache: allow a snapshot up to USER_CACHE_TTL_SECONDS old instead of reading from the database
+        :param fields: the sub-objects (see LAZY_FIELDS) the caller needs, the others are left out of the query and fetched on access
+        """
+        document = user_cache.get(_id) if use_cache else None
+        if document is not None:
+            return document if raw_document else User.document_repr_to_object(document)
+
+        projection = User.projection(fields)
+        document = users_collection.find_one({"_id": _id}, projection)
+        if projection is None:
+            user_cache.put(document)
+
+        return document if raw_document else User.document_repr_to_object(document, projected=projection is not None)
+
+    @staticmethod
+    def projection(fields) -> dict | None:
+        if fields is None:
+            return None
 
-        return document if raw_document else User.document_repr_to_object(document)
+        excluded = {User.LONG_TO_SHORT[name]: 0 for name in User.LAZY_FIELDS if name not in fields}
+        return excluded if len(excluded) > 0 else None
+
+    def hydrate(self, name: str):
+        """
+        Builds a sub-object from the raw document, fetching its field first if the document was projected without it.
+        """
+        doc = self._doc if self._doc is not None else {}
+        field = User.LONG_TO_SHORT[name]
+        if self._projected and field not in doc:
+            fetched = users_collection.find_one({"_id": self._id}, {field: 1})
+            doc[field] = fetched.get(field, None) if fetched is not None else None
+
+        if name == "options":
+            return user_options.UserOptions.document_repr_to_object(doc["op"], _id=self._id) if doc.get("op", None) is not None else None
+        elif name == "shipping_addresses":
+            return list(map(
+                lambda t: shipping_address.ShippingAddress.document_repr_to_object(t[1], _id=self._id, address_index=t[0]),
+                enumerate(doc.get("sa", None) or [])
+            ))
+        elif name == "liked_items":
+            return liked_items_module.LikedItems.document_repr_to_object(doc["lk"], _id=self._id) if doc.get("lk", None) is not None else None
+        elif name == "cart":
+            return cart_module.Cart.document_repr_to_object(doc["crt"], _id=self._id) if doc.get("crt", None) is not None \
+                else cart_module.Cart(self._id, [])
+        elif name == "order_history":
+            return order_history_module.OrderHistory.document_repr_to_object(doc["odh"], _id=self._id) if doc.get("odh", None) is not None \
+                else order_history_module.OrderHistory(self._id, [])
+
+        raise AttributeError(name)
 
     def __repr__(self):
         return jsonpickle.encode(User.get_db_repr(self, True), unpicklable=False)
 
     @staticmethod
     def document_repr_to_object(doc, **kwargs) -> User | None:
+        """
+        Sub-objects are built from doc on first access, see LAZY_FIELDS.
+        :param projected: doc was fetched with User.projection, missing sub-object fields are fetched on access
+        """
         if doc is None:
             return None
 
@@ -189,29 +290,16 @@ class User(DocumentObject):
         args = {key: doc.get(value, None) for key, value in cls.LONG_TO_SHORT.items()}
 
         args["profile_picture"] = Image(doc.get("pfp", None))
-        args["options"] = user_options.UserOptions.document_repr_to_object(doc["op"], _id=doc["_id"]) if doc.get("op", None) is not None else None
-        args["shipping_addresses"] = list(
-            map(
-                lambda t: shipping_address.ShippingAddress.document_repr_to_object(t[1], _id=doc["_id"], address_index=t[0]),
-                enumerate(doc.get("sa", []))
-            )
-        )
-        args["liked_items"] = \
-            liked_items_module.LikedItems.document_repr_to_object(doc["lk"], _id=doc["_id"]) if doc.get("lk", None) is not None else None
-
-        args["cart"] = \
-            cart_module.Cart.document_repr_to_object(doc["crt"], _id=doc["_id"]) if doc.get("crt", None) is not None else cart_module.Cart(
-                args["_id"], [])
-
-        args["order_history"] \
-            = order_history_module.OrderHistory.document_repr_to_object(doc["odh"], _id=doc["_id"]) if doc.get("odh",
-                                                                                                               None) is not None else order_history_module.OrderHistory(
-            args["_id"], [])
+        for name in User.LAZY_FIELDS:
+            args[name] = User.LAZY
 
         if args.get("is_system_admin", None) is None:
             args["is_system_admin"] = False
 
-        return cls(**args)
+        user = cls(**args)
+        user._doc = doc
+        user._projected = kwargs.get("projected", False)
+        return user
 
     @staticmethod
     def get_db_repr(user: User, get_long_names: bool = False):
@@ -290,17 +378,22 @@ class User(DocumentObject):
     @staticmethod
     def delete_by_id(_id: ObjectId) -> DeleteResult:
         UserAuth.delete_by_id(_id)
+        user_cache.invalidate(_id)
         return users_collection.delete_one({"_id": _id})
 
     @staticmethod
     def hash_password(password: str) -> bytes:
-        salt = bcrypt.gensalt(13)
-        hashed = bcrypt.hashpw(password.encode(), salt)
-        return hashed
+        """
+        :raises PasswordHasherBusyError: when the password hasher is saturated
+        """
+        return password_hasher.hash(password)
 
     @staticmethod
     def compare_to_hash(password: str, hashed_password: bytes):
-        return bcrypt.checkpw(password.encode(), hashed_password)
+        """
+        :raises PasswordHasherBusyError: when the password hasher is saturated
+        """
+        return password_hasher.check(password, hashed_password)
 
     def compare_hash(self, password: str):
         return User.compare_to_hash(password, self.password)
@@ -0,0 +1,79 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+
+from scheduler import scheduler
+
+
+class UserCache:
+    """
+    Short lived snapshots of raw user documents keyed by user id, bounded by max_size with least recently used eviction.
+    Every write through the User document objects refreshes or invalidates the snapshot, the ttl bounds staleness from writes
+    made outside this process. Documents are copied in and out, the document objects built from them keep and mutate their lists.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._documents: OrderedDict[ObjectId, tuple] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, user_id: ObjectId):
+        with self._lock:
+            entry = self._documents.get(user_id)
+            if entry is None:
+                return None
+
+            expires_at, doc = entry
+            if expires_at < time.monotonic():
+                del self._documents[user_id]
+                return None
+
+            self._documents.move_to_end(user_id)
+
+        return copy.deepcopy(doc)
+
+    def put(self, doc: dict):
+        if doc is None or not self.enabled:
+            return
+
+        doc = copy.deepcopy(doc)
+        with self._lock:
+            self._documents.pop(doc["_id"], None)
+            self._documents[doc["_id"]] = (time.monotonic() + self.ttl, doc)
+
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+
+    def invalidate(self, user_id: ObjectId):
+        with self._lock:
+            self._documents.pop(user_id, None)
+
+    def evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [user_id for user_id, (expires_at, _) in self._documents.items() if expires_at < now]
+            for user_id in expired:
+                del self._documents[user_id]
+
+    def schedule(self):
+        """
+        Evicts expired snapshots while the cache is enabled, called once on startup.
+        """
+        if self.enabled:
+            scheduler.every(max(self.ttl, 1.0), self.evict_expired, name="User cache eviction")
+
+
+user_cache = UserCache(
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", 5)),
+    max_size=int(os.getenv("USER_CACHE_MAX_SIZE", 10000)),
+)
@@ -2,11 +2,10 @@ from __future__ import annotations
 
 import jsonpickle
 from bson import ObjectId
-from pymongo import ReturnDocument
 
 import database.user as user
 import database.user.unit as units
-from database import DocumentObject, users_collection
+from database import DocumentObject
 
 
 class UserOptions(DocumentObject):
@@ -40,9 +39,7 @@ class UserOptions(DocumentObject):
 
     def update_field(self, field_name, value) -> user.User:
         return user.User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": ObjectId(self.user_id)}, {"$set": {"op." + field_name: value}}, return_document=ReturnDocument.AFTER
-            )
+            user.User.update_user(ObjectId(self.user_id), {"$set": {"op." + field_name: value}})
         )
 
     def update_fields(
@@ -60,9 +57,7 @@ class UserOptions(DocumentObject):
             set_dict['ct'] = currency_type
 
         return user.User.document_repr_to_object(
-            users_collection.find_one_and_update(
-                {"_id": ObjectId(self.user_id)}, {"$set": set_dict}, return_document=ReturnDocument.AFTER
-            )
+            user.User.update_user(ObjectId(self.user_id), {"$set": set_dict})
         )
 
     def __repr__(self):
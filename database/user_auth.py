@@ -7,9 +7,10 @@ import time
 import pyotp
 from bson import ObjectId
 from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 import database.user.user as user_module
-from database import DocumentObject, user_auth_collection
+from database import DocumentObject, user_auth_collection, users_collection
 
 
 @dataclasses.dataclass
@@ -59,18 +60,10 @@ class UserAuth(DocumentObject):
         return False
 
     def was_otp_used(self, otp: str):
-        doc = user_auth_collection.find_one({"_id": self._id})
-        botp = doc.get("botp")
-        botp_t = doc.get("botp_t")
-        t_now = time.time()
+        botp = self.blocked_otp if self.blocked_otp is not None else ''
+        botp_t = self.blocked_otp_time.timestamp() if self.blocked_otp_time is not None else 0
 
-        if botp_t is None:
-            botp_t = 0
-
-        if botp is None:
-            botp = ''
-
-        return botp_t + 60 > t_now and botp == otp
+        return botp_t + 60 > time.time() and botp == otp
 
     def is_correct_otp(self, otp: str):
         if not self.has_2fa:
@@ -90,6 +83,58 @@ class UserAuth(DocumentObject):
             )
         )
 
+    @staticmethod
+    def get_login_state(email: str) -> (dict | None, UserAuth | None, int | None):
+        """
+        Reads a user document and its authentication state in a single aggregation.
+        :return: the user document, its authentication state and the stored attempt count (None when there is no state yet)
+        """
+        docs = list(users_collection.aggregate([
+            {"$match": {"ml": email}},
+            {"$limit": 1},
+            {"$lookup": {"from": user_auth_collection.name, "localField": "_id", "foreignField": "_id", "as": "auth"}},
+        ]))
+
+        if len(docs) == 0:
+            return None, None, None
+
+        user_doc = docs[0]
+        auth_docs = user_doc.pop("auth", [])
+        if len(auth_docs) == 0:
+            return user_doc, UserAuth(user_doc["_id"], 0, datetime.datetime.now(), None, None, None), None
+
+        return user_doc, UserAuth.document_repr_to_object(auth_docs[0]), auth_docs[0].get("atmps", None)
+
+    @staticmethod
+    def record_login(_id: ObjectId, stored_attempts: int | None, attempts: int, succeeded: bool):
+        """
+        Writes the outcome of a login evaluated against the state read by get_login_state in a single update.
+        A failed attempt sets the counter only if it still holds stored_attempts, when another login changed it in between
+        the failure is counted on top of that login's write instead.
+        :param attempts: the attempt count the login was evaluated with
+        """
+        now = time.time()
+        if succeeded:
+            user_auth_collection.update_one({"_id": _id}, UserAuth._upsert_update({"atmps": 0, "lat": int(now)}), upsert=True)
+            return
+
+        try:
+            user_auth_collection.update_one(
+                {"_id": _id, "atmps": stored_attempts},
+                UserAuth._upsert_update({"atmps": attempts + 1, "lat": now}),
+                upsert=True
+            )
+        except DuplicateKeyError:
+            user_auth_collection.update_one({"_id": _id}, {"$inc": {"atmps": 1}, "$set": {"lat": now}})
+
+    @staticmethod
+    def _upsert_update(set_fields: dict) -> dict:
+        default_fields = {"otp": None, "botp": None, "botp_t": None}
+        return {
+            "$set": set_fields,
+            "$setOnInsert": {key: value for key, value in default_fields.items() if key not in set_fields},
+        }
+
     @staticmethod
     def get_by_id(_id: ObjectId):
         return UserAuth.document_repr_to_object(
@@ -3,15 +3,18 @@ import logging
 import signal
 import sys
 
-from web_framework_v2 import JwtSecurity
-
-import api  # must import to register package and execute its code.
-from database import s3Bucket
+# the application is only imported by main(): password hasher workers import this module again on startup, and must not
+# connect to Mongo or start the scheduler and S3 threads
 
 logger = logging.getLogger(__name__)
 
 
 def main():
+    import api  # must import to register package and execute its code.
+    from database import ensure_indexes, schedule_maintenance
+
+    ensure_indexes()
+    schedule_maintenance()
     api.app.start()
     # cmd = input("Enter a command: ")
     # time.sleep(1)
@@ -45,16 +48,23 @@ def main():
 #         byebye(0, 0)
 
 
-@atexit.register
-def byebye(num, frame):
+def byebye(num=0, frame=None):
+    import api
+    from database import s3Bucket
+    from database.user.password_hasher import password_hasher
+    from scheduler import scheduler
+
     print(f"Shutting down - code {num}, frame: {frame}")
     api.app.shutdown()
+    scheduler.shutdown(wait=False)
+    s3Bucket.shutdown(wait=False)
+    password_hasher.shutdown()
 
-    exit()
     sys.exit(0)
 
 
 if __name__ == '__main__':
+    atexit.register(byebye)
     signal.signal(signal.SIGTERM, byebye)
     signal.signal(signal.SIGABRT, byebye)
     signal.signal(signal.SIGINT, byebye)
@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent import futures
+
+from singleton import Singleton
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTask:
+    def __init__(self, name: str, fn, interval: float, jitter: float):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Scheduler(metaclass=Singleton):
+    """
+    Runs periodic maintenance tasks on a small worker pool. A task is rescheduled only after its previous run finished, so
+    runs of one task never overlap. Intervals are jittered so tasks started together, or by several processes, spread out.
+    The dispatch thread starts with the first scheduled task and is a daemon, shutdown() stops it and runs the shutdown hooks.
+    """
+
+    def __init__(self):
+        self.worker_count = int(os.getenv("SCHEDULER_WORKERS", 4))
+
+        self._condition = threading.Condition()
+        self._queue: list[tuple[float, int, ScheduledTask]] = []
+        self._sequence = itertools.count()
+        self._shutdown_hooks = []
+        self._is_shutdown = False
+
+        self._executor: futures.ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+
+    def every(self, interval: float, fn, name: str = None, jitter: float = 0.1, initial_delay: float = None) -> ScheduledTask:
+        """
+        Calls fn every interval seconds until the returned task is cancelled or the scheduler shuts down.
+        :param jitter: fraction of the interval each delay is randomly moved by
+        :param initial_delay: delay of the first run, a jittered interval when None
+        """
+        task = ScheduledTask(name or getattr(fn, "__name__", "task"), fn, interval, jitter)
+        with self._condition:
+            if self._is_shutdown:
+                task.cancel()
+                return task
+
+            self._start()
+            self._push(task, initial_delay if initial_delay is not None else task.next_delay())
+
+        return task
+
+    def on_shutdown(self, fn):
+        """
+        Registers fn to be called once on shutdown, after periodic tasks stopped, e.g. to flush buffered data.
+        """
+        with self._condition:
+            self._shutdown_hooks.append(fn)
+
+        return fn
+
+    def shutdown(self, wait: bool = True):
+        with self._condition:
+            if self._is_shutdown:
+                return
+
+            self._is_shutdown = True
+            for _, _, task in self._queue:
+                task.cancel()
+
+            self._queue.clear()
+            self._condition.notify_all()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+        for hook in self._shutdown_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.warning(f"Shutdown hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+    def _start(self):
+        if self._thread is not None:
+            return
+
+        self._executor = futures.ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="scheduler")
+        self._thread = threading.Thread(name="Scheduler", target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def _push(self, task: ScheduledTask, delay: float):
+        heapq.heappush(self._queue, (time.monotonic() + max(0.0, delay), next(self._sequence), task))
+        self._condition.notify()
+
+    def _dispatch(self):
+        with self._condition:
+            while not self._is_shutdown:
+                if len(self._queue) == 0:
+                    self._condition.wait()
+                    continue
+
+                run_at, _, task = self._queue[0]
+                wait_time = run_at - time.monotonic()
+                if wait_time > 0:
+                    self._condition.wait(wait_time)
+                    continue
+
+                heapq.heappop(self._queue)
+                if task.cancelled:
+                    continue
+
+                try:
+                    self._executor.submit(self._run, task)
+                except RuntimeError:
+                    return
+
+    def _run(self, task: ScheduledTask):
+        try:
+            task.fn()
+        except Exception as e:
+            logger.warning(f"Scheduled task {task.name} failed: {e}")
+        finally:
+            with self._condition:
+                if not task.cancelled and not self._is_shutdown:
+                    self._push(task, task.next_delay())
+
+
+scheduler = Scheduler()
@@ -0,0 +1,52 @@
+"""
+Generates the sized variants of images uploaded before variants existed.
+
+Usage: python -m scripts.backfill_image_variants [folder ...]
+"""
+import logging
+import sys
+
+from database import Image, s3Bucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FOLDERS = ["items/", "reviews/", "profiles/"]
+
+
+def list_keys(prefix: str):
+    paginator = s3Bucket.client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=s3Bucket.bucket_name, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"]
+
+
+def backfill(prefix: str):
+    keys = set(list_keys(prefix))
+    created = 0
+
+    for key in keys:
+        if Image.original_id(key) != key:
+            continue
+
+        missing = [variant for variant in Image.VARIANT_MAX_SIZES if Image.build_variant_id(key, variant) not in keys]
+        if len(missing) == 0:
+            continue
+
+        try:
+            variants = Image.render_variants(s3Bucket.fetch(key))
+        except Exception as e:
+            logger.warning(f"Failed rendering variants of {key}: {e}")
+            continue
+
+        for variant in missing:
+            if variant in variants:
+                s3Bucket.upload(variants[variant], Image.build_variant_id(key, variant), content_type="image/jpeg")
+                created += 1
+
+    return created
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    for folder in (sys.argv[1:] or DEFAULT_FOLDERS):
+        logger.info(f"{folder}: created {backfill(folder)} variants")
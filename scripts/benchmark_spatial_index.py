@@ -0,0 +1,84 @@
+"""
+Compares explore radius queries answered by the in-process spatial index with the Mongo $geoNear path.
+Query centers are sampled from the collection's own documents. Requires NumPy.
+
+Usage: python -m scripts.benchmark_spatial_index [--collection items|businesses] [--queries N] [--radius METERS] [--limit N]
+"""
+import argparse
+import logging
+import random
+import statistics
+import time
+
+from database import items_collection, businesses_collection
+from database.spatial_index import SpatialIndex, np
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = {"items": items_collection, "businesses": businesses_collection}
+
+
+def mongo_query(collection, location, max_distance: float, limit: int):
+    return list(collection.aggregate([
+        {"$geoNear": {"near": {"type": "Point", "coordinates": location}, "distanceField": "dst", "maxDistance": max_distance,
+                      "spherical": True}},
+        {"$sort": {"dst": 1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 1, "dst": 1}},
+    ]))
+
+
+def timed(fn, centers) -> list:
+    durations = []
+    for center in centers:
+        start = time.perf_counter()
+        fn(center)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return durations
+
+
+def describe(name: str, durations: list):
+    durations = sorted(durations)
+    logger.info(f"{name}: mean {statistics.mean(durations):.3f}ms, p50 {durations[len(durations) // 2]:.3f}ms, "
+                f"p95 {durations[int(len(durations) * 0.95)]:.3f}ms, max {durations[-1]:.3f}ms")
+
+
+def benchmark(collection, queries: int, radius: float, limit: int):
+    index = SpatialIndex(collection, refresh_interval=0, merge_size=1024)
+
+    start = time.perf_counter()
+    index.load()
+    logger.info(f"Loaded {len(index)} points of {collection.name} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    points = [doc["loc"]["coordinates"] for doc in collection.aggregate([{"$match": {"loc": {"$ne": None}}}, {"$sample": {"size": queries}}])]
+    if len(points) == 0:
+        logger.info(f"{collection.name} has no located documents")
+        return
+
+    centers = [random.choice(points) for _ in range(queries)]
+    max_distance = radius + 1000
+
+    mismatches = 0
+    for center in centers[:min(len(centers), 50)]:
+        expected = [doc["_id"] for doc in mongo_query(collection, center, max_distance, limit)]
+        mismatches += expected != [_id for _, _id in index.query(center, max_distance, limit=limit)]
+
+    describe("mongo", timed(lambda center: mongo_query(collection, center, max_distance, limit), centers))
+    describe("spatial index", timed(lambda center: index.query(center, max_distance, limit=limit), centers))
+    logger.info(f"{mismatches} of {min(len(centers), 50)} checked pages differ from Mongo's ordering")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collection", choices=COLLECTIONS.keys(), default="items")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--radius", type=float, default=5000)
+    parser.add_argument("--limit", type=int, default=51)
+    args = parser.parse_args()
+
+    if np is None:
+        raise SystemExit("The spatial index requires NumPy")
+
+    benchmark(COLLECTIONS[args.collection], args.queries, args.radius, args.limit)
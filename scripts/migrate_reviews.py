@@ -0,0 +1,80 @@
+"""
+Moves the reviews embedded in item documents (rs) to the reviews collection and recomputes each item's rating from them.
+Safe to rerun, reviews already moved are matched by item and poster. Embedded reviews have no date, moved reviews are dated
+at the time of the migration and keep their embedded order. With --reconcile the rating of every item is recomputed afterwards.
+
+Usage: python -m scripts.migrate_reviews [--batch-size N] [--reconcile]
+"""
+import argparse
+import datetime
+import logging
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database import items_collection, reviews_collection, ensure_indexes
+from database.business.item.item_rating import ItemRating
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_item(item_id: ObjectId, embedded_reviews: list, date: datetime.datetime) -> int:
+    operations = [
+        UpdateOne(
+            {"iid": item_id, "pid": review["pid"]},
+            {"$setOnInsert": {**review, "_id": ObjectId(), "iid": item_id, "dt": date}},
+            upsert=True
+        )
+        for review in embedded_reviews if review.get("pid") is not None
+    ]
+    moved = reviews_collection.bulk_write(operations, ordered=True).upserted_count if len(operations) > 0 else 0
+
+    items_collection.update_one(
+        {"_id": item_id},
+        {"$set": {"rtg": ItemRating.get_db_repr(ItemRating.from_reviews(item_id)[item_id])}, "$unset": {"rs": ""}}
+    )
+
+    return moved
+
+
+def migrate(batch_size: int):
+    # the unique (item, poster) index makes reruns idempotent
+    ensure_indexes()
+    date = datetime.datetime.now(datetime.timezone.utc)
+
+    items = 0
+    moved = 0
+    for doc in items_collection.find({"rs": {"$exists": True}}, {"rs": 1}, batch_size=batch_size):
+        moved += migrate_item(doc["_id"], doc["rs"] or [], date)
+        items += 1
+
+    logger.info(f"Moved {moved} reviews of {items} items")
+
+
+def reconcile(batch_size: int):
+    """
+    Recomputes the rating of every item from its reviews, for totals that missed an $inc.
+    """
+    batch = []
+    items = 0
+    for doc in items_collection.find({}, {"_id": 1}, batch_size=batch_size):
+        batch.append(doc["_id"])
+        if len(batch) == batch_size:
+            ItemRating.reconcile(*batch)
+            items += len(batch)
+            batch = []
+
+    ItemRating.reconcile(*batch)
+    logger.info(f"Reconciled the ratings of {items + len(batch)} items")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--reconcile", action="store_true", help="recompute every item's rating from its reviews afterwards")
+    args = parser.parse_args()
+
+    migrate(args.batch_size)
+    if args.reconcile:
+        reconcile(args.batch_size)
@@ -15,4 +15,5 @@ class AuthenticationResult(Enum):
     WrongOTP = 10
     TooManyAttempts = 11
     OTPBlocked = 12
+    ServerBusy = 13
 
@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from web_framework_v2 import JwtSecurity
+
+from database import TokenBlacklist, access_token_blacklist
+
+
+class DecodedTokenCache:
+    """
+    Claims of recently verified access tokens keyed by the token's sha256 digest, so a token reused across requests is verified
+    once. Entries expire with the token's exp claim and are evicted when the token is blacklisted. Only valid tokens are cached.
+    Cached claims are shared and must not be mutated.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._claims: OrderedDict[bytes, tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, token: str) -> dict | None:
+        if self.max_size <= 0:
+            return JwtSecurity.decode_access_token(token)
+
+        digest = TokenBlacklist.digest(token)
+        with self._lock:
+            entry = self._claims.get(digest)
+            if entry is not None and entry[0] > time.time():
+                self._claims.move_to_end(digest)
+                self.hits += 1
+                return entry[1]
+
+            self._claims.pop(digest, None)
+            self.misses += 1
+
+        claims = JwtSecurity.decode_access_token(token)
+        if claims is not None and "exp" in claims:
+            with self._lock:
+                self._claims[digest] = (claims["exp"], claims)
+                while len(self._claims) > self.max_size:
+                    self._claims.popitem(last=False)
+
+        return claims
+
+    def evict(self, digest: bytes):
+        with self._lock:
+            self._claims.pop(digest, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._claims),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+decoded_token_cache = DecodedTokenCache(max_size=int(os.getenv("JWT_CACHE_MAX_SIZE", 50000)))
+access_token_blacklist.add_listener(decoded_token_cache.evict)
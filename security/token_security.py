@@ -5,9 +5,12 @@ import logging
 from bson import ObjectId
 from web_framework_v2 import JwtTokenFactory, JwtTokenAuth
 
+from body import TokenData, BusinessUserTokenData
 from database import User, BusinessUser, access_token_blacklist
+from database.user.password_hasher import PasswordHasherBusyError, password_hasher
 from database.user_auth import UserAuth
 from security import AuthenticationResult, EMAIL_REGEX, VALIDATOR
+from security.token_cache import decoded_token_cache
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -38,13 +41,16 @@ class RegistrationTokenFactory(JwtTokenFactory):
         elif User.exists_by_email(email):
             return False, AuthenticationResult.EmailExists, None
 
-        user = User.create_new_user(
-            email,
-            request_body["name"].strip(),
-            request_body["phone"].strip(),
-            password,
-            True
-        )
+        try:
+            user = User.create_new_user(
+                email,
+                request_body["name"].strip(),
+                request_body["phone"].strip(),
+                password,
+                True
+            )
+        except PasswordHasherBusyError:
+            return False, AuthenticationResult.ServerBusy, None
 
         UserAuth.create_from_id(user.id)
 
@@ -65,21 +71,21 @@ class LoginTokenFactory(JwtTokenFactory):
         email = request_body["email"].strip()
         password = request_body["password"]
 
-        user_doc: dict | None = User.get_by_email(email)
+        user_doc, user_auth, stored_attempts = UserAuth.get_login_state(email)
 
         if user_doc is None:
             return False, AuthenticationResult.EmailIncorrect, None
 
         _id = user_doc["_id"]
-        user_auth = UserAuth.get_by_id(_id)
-        if user_auth is None:
-            user_auth = UserAuth.create_from_id(_id)
-
         otp = request_body.get("otp", None)
         if user_auth.should_reset_attempts():
-            user_auth = user_auth.reset_attempts(_id)
+            user_auth.attempts = 0
+
+        try:
+            correct_password = User.compare_to_hash(password, user_doc["pw"])
+        except PasswordHasherBusyError:
+            return False, AuthenticationResult.ServerBusy, None
 
-        correct_password = User.compare_to_hash(password, user_doc["pw"])
         if otp is None and user_auth.has_2fa and correct_password:
             if not user_auth.validate_attempt_range():
                 return False, AuthenticationResult.TooManyAttempts, None
@@ -89,13 +95,13 @@ class LoginTokenFactory(JwtTokenFactory):
         if not user_auth.validate_attempt_range():
             return False, AuthenticationResult.TooManyAttempts, None
         elif not correct_password:
-            user_auth.register_failed_attempt(_id)
+            UserAuth.record_login(_id, stored_attempts, user_auth.attempts, False)
             return False, AuthenticationResult.PasswordIncorrect, None
         elif user_auth.was_otp_used(otp):
-            user_auth.register_failed_attempt(_id)
+            UserAuth.record_login(_id, stored_attempts, user_auth.attempts, False)
             return False, AuthenticationResult.OTPBlocked, None
         elif not user_auth.is_correct_otp(otp):
-            user_auth.register_failed_attempt(_id)
+            UserAuth.record_login(_id, stored_attempts, user_auth.attempts, False)
             return False, AuthenticationResult.WrongOTP, None
 
         user: User | BusinessUser
@@ -104,17 +110,47 @@ class LoginTokenFactory(JwtTokenFactory):
         else:
             user = User.document_repr_to_object(user_doc)
 
-        user_auth.register_successful_attempt(_id)
+        UserAuth.record_login(_id, stored_attempts, user_auth.attempts, True)
+
+        if password_hasher.needs_rehash(user_doc["pw"]):
+            try:
+                user.update_password(password, return_result=False)
+            except PasswordHasherBusyError:
+                logger.debug(f"Skipped rehashing password of {_id}, password hasher is busy")
+
         return True, AuthenticationResult.Success, user
 
 
 class BlacklistJwtTokenAuth(JwtTokenAuth):
     def __init__(self, on_fail=lambda request, response: None, check_blacklist: bool = False, raw_document=False, no_fail=False,
-                 fail_on_null_result=True):
+                 fail_on_null_result=True, token_only=False, fields=None):
+        """
+        :param token_only: pass the route the token's claims as TokenData instead of reading the user from the database
+        :param fields: user sub-objects the route uses (see User.LAZY_FIELDS), None reads the whole user
+        """
         super().__init__(on_fail, fail_on_null_result)
         self.check_blacklist = check_blacklist
         self.raw_document = raw_document
         self.no_fail = no_fail
+        self.token_only = token_only
+        self.fields = fields
+
+    def should_execute_endpoint(self, request, request_body):
+        decoded_token = BlacklistJwtTokenAuth.decode_request(request)
+        authentication_result, authentication_data = self.authenticate(request, request_body, decoded_token)
+
+        return authentication_result, self.decoded_token_transformer(request, request_body, decoded_token), authentication_data
+
+    @staticmethod
+    def decode_request(request):
+        """
+        Same as JwtSecurity.decode_request, but answers tokens verified by a previous request from decoded_token_cache.
+        """
+        authorization = request.headers.get("authorization", None)
+        if authorization is None or len(authorization) <= 8:
+            return None
+
+        return decoded_token_cache.decode(authorization[8:])
 
     def authenticate(self, request, request_body, token) -> (bool, object):
         if self.no_fail:
@@ -140,7 +176,19 @@ class BlacklistJwtTokenAuth(JwtTokenAuth):
         if decoded_token is None:
             return None
 
-        return User.get_by_id(ObjectId(decoded_token["id"]), self.raw_document)
+        if self.token_only:
+            return BlacklistJwtTokenAuth.token_data(decoded_token)
+
+        return User.get_by_id(ObjectId(decoded_token["id"]), self.raw_document, use_cache=True, fields=self.fields)
+
+    @staticmethod
+    def token_data(decoded_token: dict) -> TokenData | BusinessUserTokenData:
+        user_id = ObjectId(decoded_token["id"])
+        if decoded_token.get("business_id", None) is not None:
+            return BusinessUserTokenData(decoded_token.get("email"), decoded_token.get("name"), user_id, None,
+                                         ObjectId(decoded_token["business_id"]))
+
+        return TokenData(decoded_token.get("email"), decoded_token.get("name"), user_id)
 
 
 class BusinessJwtTokenAuth(BlacklistJwtTokenAuth):
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+
+def pytest_configure(config):
+    # api reads its JWT signing keys on import, tests without them configured sign with a throwaway pair
+    if os.getenv("JWT_ACCESS_PUBLIC_KEY") is not None:
+        return
+
+    try:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+    except ImportError:
+        return
+
+    for name in ("ACCESS", "REFRESH"):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        os.environ[f"JWT_{name}_PRIVATE_KEY"] = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        os.environ[f"JWT_{name}_PUBLIC_KEY"] = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def mongo():
+    """
+    An in memory Mongo database for code that reads and writes module level collections, patch them with its collections.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient(tz_aware=True)["vivity"]
+
+
+@pytest.fixture(scope="session")
+def s3_endpoint():
+    """
+    A moto server standing in for S3, the bucket reaches it through AWS_S3_ENDPOINT_URL like it would reach MinIO.
+    """
+    moto_server = pytest.importorskip("moto.server")
+
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def s3_bucket(s3_endpoint, monkeypatch):
+    from database.S3Bucket import S3Bucket
+
+    monkeypatch.setenv("AWS_S3_ENDPOINT_URL", s3_endpoint)
+    monkeypatch.setenv("AWS_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SECRET_KEY", "testing")
+    monkeypatch.setenv("AWS_BUCKET_NAME", f"test-{uuid.uuid4()}")
+    monkeypatch.setenv("S3_POOL_SIZE", "2")
+    monkeypatch.setenv("S3_POOL_QUEUE_SIZE", "2")
+    monkeypatch.delenv("S3_CACHE_DIR", raising=False)
+
+    # S3Bucket is a singleton, every test gets its own bucket and executor
+    bucket = type.__call__(S3Bucket)
+    bucket.client.create_bucket(Bucket=bucket.bucket_name, CreateBucketConfiguration={"LocationConstraint": "eu-central-1"})
+    yield bucket
+    bucket.shutdown()
+
+
+class InFlight:
+    """
+    Slows every S3 read down and records how many reads were in flight at once.
+    """
+
+    def __init__(self, get_object, seconds: float = 0.2):
+        self._get_object = get_object
+        self.seconds = seconds
+        self._lock = threading.Lock()
+        self.current = 0
+        self.max = 0
+
+    def __call__(self, **kwargs):
+        with self._lock:
+            self.current += 1
+            self.max = max(self.max, self.current)
+
+        try:
+            time.sleep(self.seconds)
+            return self._get_object(**kwargs)
+        finally:
+            with self._lock:
+                self.current -= 1
+
+
+@pytest.fixture
+def in_flight(s3_bucket, monkeypatch) -> InFlight:
+    in_flight = InFlight(s3_bucket.client.get_object)
+    monkeypatch.setattr(s3_bucket.client, "get_object", in_flight)
+    return in_flight
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from web_framework_v2 import HttpRequest, HttpResponse, HttpStatus, ContentType
+from web_framework_v2.http import HttpMethod
+
+from api import api_utils
+from api.api_utils import auth_fail, upload_too_large
+from security import AuthenticationResult
+
+
+def request(**headers) -> HttpRequest:
+    return HttpRequest(HttpMethod.POST, "/upload", "HTTP/1.1", headers, {}, b"")
+
+
+def response() -> HttpResponse:
+    return HttpResponse(ContentType.json, "HTTP/1.1", HttpStatus.OK, b"")
+
+
+@pytest.fixture(autouse=True)
+def max_upload_bytes(monkeypatch):
+    monkeypatch.setattr(api_utils.s3Bucket, "max_upload_bytes", 100)
+
+
+@pytest.mark.parametrize("headers, size", [({}, None), ({}, 100), ({"content-length": "100"}, 100), ({"content-length": "x"}, 50)])
+def test_upload_within_the_limit_passes(headers, size):
+    res = response()
+
+    assert not upload_too_large(request(**headers), res, size)
+    assert res.status is HttpStatus.OK
+
+
+@pytest.mark.parametrize("headers, size", [({"content-length": "101"}, None), ({}, 101), ({"content-length": "10"}, 101)])
+def test_declared_or_actual_size_over_the_limit_is_rejected(headers, size):
+    res = response()
+
+    assert upload_too_large(request(**headers), res, size)
+    assert res.status is HttpStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+def test_busy_password_hasher_fails_authentication_with_503(monkeypatch):
+    monkeypatch.setattr(api_utils.password_hasher, "retry_after", 3)
+    res = response()
+
+    body = json.loads(auth_fail(request(), res, AuthenticationResult.ServerBusy))
+
+    assert res.status is HttpStatus.SERVICE_UNAVAILABLE
+    assert body["retry_after"] == 3 and body["data"] == AuthenticationResult.ServerBusy.value
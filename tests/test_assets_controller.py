@@ -0,0 +1,85 @@
+import json
+
+import pytest
+from web_framework_v2 import ContentType, HttpRequest, HttpResponse, HttpStatus
+from web_framework_v2.http import HttpMethod
+
+from api.api_utils import IMAGE_HEADERS, content_etag
+from api.assets_controller import AssetsController, raw_image_error_handler
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+def request(**headers) -> HttpRequest:
+    return HttpRequest(HttpMethod.GET, "/image", "HTTP/1.1", headers, {}, b"")
+
+
+def response() -> HttpResponse:
+    return HttpResponse(IMAGE_HEADERS, "HTTP/1.1", HttpStatus.OK, b"")
+
+
+def sent_headers(res: HttpResponse) -> dict:
+    head = res.data().split(b"\r\n\r\n")[0].decode().split("\r\n")[1:]
+    return {name.lower(): value for name, value in (line.split(": ", 1) for line in head)}
+
+
+@pytest.fixture(autouse=True)
+def reset_headers():
+    yield
+    IMAGE_HEADERS.reset()
+
+
+def test_image_is_sent_with_its_etag_and_content_type():
+    res = response()
+
+    assert AssetsController.image_response(PNG, request(), res) == PNG
+    headers = sent_headers(res)
+    assert res.status is HttpStatus.OK
+    assert headers["etag"] == content_etag(PNG)
+    assert headers["content-type"] == "image/png"
+    assert "immutable" in headers["cache-control"]
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", 'W/{etag}', '"other", {etag}', "*"])
+def test_matching_if_none_match_is_not_modified(if_none_match):
+    res = response()
+
+    body = AssetsController.image_response(PNG, request(**{"if-none-match": if_none_match.format(etag=content_etag(PNG))}), res)
+
+    assert body == b""
+    assert res.status is HttpStatus.NOT_MODIFIED
+    assert sent_headers(res)["etag"] == content_etag(PNG)
+
+
+def test_other_etag_sends_the_image():
+    res = response()
+
+    assert AssetsController.image_response(PNG, request(**{"if-none-match": content_etag(b"other")}), res) == PNG
+    assert res.status is HttpStatus.OK
+
+
+def test_headers_apply_to_one_response_only():
+    AssetsController.image_response(PNG, request(), response())
+    response().data()
+
+    assert sent_headers(response()) == {"content-type": ContentType.json.value, "cache-control": "no-store", "content-length": "0"}
+
+
+def test_error_is_a_json_body_with_the_default_headers():
+    res = response()
+    AssetsController.image_response(PNG, request(), res)
+
+    body = raw_image_error_handler(Exception("Unable to access bucket"), "", request(), res, {})
+
+    assert res.status is HttpStatus.NOT_FOUND
+    assert json.loads(body)["error"] == "Image not found"
+    assert sent_headers(res)["content-type"] == ContentType.json.value
+
+
+def test_unexpected_error_is_an_internal_server_error():
+    res = response()
+
+    body = raw_image_error_handler(ValueError(), "", request(), res, {})
+
+    assert res.status is HttpStatus.INTERNAL_SERVER_ERROR
+    assert json.loads(body) == {"error": "Internal server error"}
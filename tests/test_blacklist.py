@@ -0,0 +1,103 @@
+import datetime
+import time
+
+import pytest
+
+from database.blacklist import TokenBlacklist
+
+
+@pytest.fixture
+def blacklist(mongo):
+    blacklist = TokenBlacklist(mongo.blacklist, 60, "test blacklist")
+    # loading also starts the change stream, the tests sync by hand instead
+    blacklist._loaded = True
+    return blacklist
+
+
+def revoke_elsewhere(blacklist, token: str, added: datetime.datetime = None, expires_in: float = 60):
+    """
+    Stores a revocation the way another process does, without this process knowing about it.
+    """
+    added = added if added is not None else datetime.datetime.now(datetime.timezone.utc)
+    blacklist.collection.insert_one({
+        "_id": TokenBlacklist.digest(token),
+        "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires_in),
+        "added": added,
+    })
+
+
+def test_first_sync_loads_every_live_token(blacklist):
+    revoke_elsewhere(blacklist, "live")
+    revoke_elsewhere(blacklist, "expired", expires_in=-1)
+    blacklist.sync()
+
+    assert blacklist.in_blacklist("live")
+    assert not blacklist.in_blacklist("expired")
+    assert not blacklist.in_blacklist("unknown")
+
+
+def test_later_syncs_only_read_recently_added_tokens(blacklist):
+    blacklist.sync()
+    long_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=10 * blacklist.SYNC_INTERVAL + 60)
+    revoke_elsewhere(blacklist, "recent")
+    revoke_elsewhere(blacklist, "old", added=long_ago)
+    blacklist.sync()
+
+    assert blacklist.in_blacklist("recent")
+    assert not blacklist.in_blacklist("old")
+
+
+def test_tokens_picked_up_by_later_syncs_record_their_propagation(blacklist):
+    revoke_elsewhere(blacklist, "first")
+    blacklist.sync()
+    assert blacklist.metrics.propagated == 0
+
+    revoke_elsewhere(blacklist, "second")
+    blacklist.sync()
+    blacklist.sync()
+    assert blacklist.metrics.propagated == 1
+
+
+def test_listeners_hear_of_each_token_once(blacklist):
+    heard = []
+    blacklist.add_listener(heard.append)
+
+    blacklist.add_to_blacklist("own")
+    revoke_elsewhere(blacklist, "other")
+    blacklist.sync()
+    blacklist.sync()
+
+    assert sorted(heard) == sorted([TokenBlacklist.digest("own"), TokenBlacklist.digest("other")])
+
+
+def test_add_to_blacklist_is_stored_and_known_at_once(blacklist):
+    blacklist.add_to_blacklist("own")
+
+    assert blacklist.in_blacklist("own")
+    assert blacklist.collection.count_documents({"_id": TokenBlacklist.digest("own")}) == 1
+
+
+def test_purge_drops_expired_tokens_and_rebuilds_the_filter(blacklist):
+    for i in range(3):
+        blacklist._add_local(TokenBlacklist.digest(f"expired {i}"), time.time() - 1)
+    blacklist._add_local(TokenBlacklist.digest("live"), time.time() + 60)
+    blacklist._purge_local()
+
+    assert list(blacklist._expirations) == [TokenBlacklist.digest("live")]
+    assert blacklist._bloom.count == 1
+    assert blacklist.in_blacklist("live")
+
+
+def test_legacy_document_is_migrated_to_one_document_per_token(blacklist):
+    now_ns = time.time_ns()
+    blacklist.collection.insert_one({"_id": 1, "blacklist": {
+        str(now_ns): "recent",
+        str(now_ns - 120 * 10 ** 9): "expired",
+    }})
+
+    blacklist._migrate_legacy_document()
+    blacklist.sync()
+
+    assert blacklist.collection.count_documents({"_id": 1}) == 0
+    assert blacklist.in_blacklist("recent")
+    assert not blacklist.in_blacklist("expired")
@@ -0,0 +1,29 @@
+import hashlib
+
+from database.bloom_filter import BloomFilter
+
+
+def key(i: int) -> bytes:
+    return hashlib.sha256(str(i).encode()).digest()
+
+
+def test_added_keys_are_always_found():
+    bloom = BloomFilter(1000)
+    for i in range(1000):
+        bloom.add(key(i))
+
+    assert all(key(i) in bloom for i in range(1000))
+    assert bloom.count == 1000
+
+
+def test_false_positive_rate_stays_near_the_error_rate_at_capacity():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(key(i))
+
+    false_positives = sum(key(i) in bloom for i in range(1000, 11000))
+    assert false_positives < 10000 * 0.01 * 2
+
+
+def test_empty_filter_contains_nothing():
+    assert key(0) not in BloomFilter(10)
@@ -0,0 +1,29 @@
+import base64
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from api import REVIEW_IMAGE_AWS_FOLDER
+from api.business.business_item_controller import decode_review_cursor, encode_review_cursor, review_image_folder
+
+
+def test_review_cursor_round_trips_millisecond_dates():
+    date, _id = datetime.datetime(2024, 5, 6, 7, 8, 9, 123000, tzinfo=datetime.timezone.utc), ObjectId()
+
+    assert decode_review_cursor(encode_review_cursor(date, _id)) == (date, _id)
+    assert decode_review_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", base64.urlsafe_b64encode(b'{"dt": 1}').decode(),
+                                    base64.urlsafe_b64encode(b'{"dt": "x", "id": "y"}').decode()])
+def test_malformed_review_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_review_cursor(cursor)
+
+
+def test_review_images_are_kept_per_user():
+    user_id = ObjectId()
+
+    assert review_image_folder(user_id) == f"{REVIEW_IMAGE_AWS_FOLDER}{user_id}/"
+    assert review_image_folder(user_id) != review_image_folder(ObjectId())
@@ -0,0 +1,100 @@
+from pymongo import UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from database.counter_aggregator import CounterAggregator
+
+
+class Collection:
+    def __init__(self, name: str = "items", fail_with: Exception = None):
+        self.name = name
+        self.fail_with = fail_with
+        self.writes = []
+
+    def bulk_write(self, operations, ordered=True):
+        if self.fail_with is not None:
+            raise self.fail_with
+
+        self.writes.append(list(operations))
+
+
+def test_increments_of_one_document_are_written_as_one_update():
+    aggregator, items = CounterAggregator(flush_interval=60, max_pending=100), Collection()
+
+    aggregator.increment(items, 1, "mtc.vws")
+    aggregator.increment(items, 1, "mtc.vws", 2)
+    assert aggregator.increment(items, 1, "mtc.lks") == 1
+    aggregator.increment(items, 2, "mtc.vws")
+    aggregator.flush()
+
+    assert items.writes == [[
+        UpdateOne({"_id": 1}, {"$inc": {"mtc.vws": 3, "mtc.lks": 1}}),
+        UpdateOne({"_id": 2}, {"$inc": {"mtc.vws": 1}}),
+    ]]
+    assert aggregator.pending(items, 1, "mtc.vws") == 0
+    assert aggregator.snapshot() == {"pending": 0, "flushes": 1, "flushed_counters": 3, "flush_errors": 0}
+
+
+def test_each_collection_is_written_with_its_own_bulk_write():
+    aggregator = CounterAggregator(flush_interval=60, max_pending=100)
+    items, businesses = Collection("items"), Collection("businesses")
+
+    aggregator.increment(items, 1, "mtc.vws")
+    aggregator.increment(businesses, 1, "mtc.vws")
+    aggregator.flush()
+
+    assert len(items.writes) == 1 and len(businesses.writes) == 1
+
+
+def test_on_insert_upserts_the_document():
+    aggregator, buckets = CounterAggregator(flush_interval=60, max_pending=100), Collection("metrics")
+
+    aggregator.increment(buckets, "bucket", "vws", on_insert={"bid": 1})
+    aggregator.flush()
+
+    assert buckets.writes == [[UpdateOne({"_id": "bucket"}, {"$inc": {"vws": 1}, "$setOnInsert": {"bid": 1}}, upsert=True)]]
+
+
+def test_increments_cancelling_out_are_not_written():
+    aggregator, items = CounterAggregator(flush_interval=60, max_pending=100), Collection()
+
+    aggregator.increment(items, 1, "mtc.lks")
+    aggregator.increment(items, 1, "mtc.lks", -1)
+    aggregator.flush()
+
+    assert items.writes == []
+
+
+def test_reaching_max_pending_flushes():
+    aggregator, items = CounterAggregator(flush_interval=60, max_pending=2), Collection()
+
+    aggregator.increment(items, 1, "mtc.vws")
+    assert items.writes == []
+
+    aggregator.increment(items, 2, "mtc.vws")
+    assert len(items.writes) == 1
+
+
+def test_failed_flush_keeps_the_increments_for_the_next_one():
+    aggregator, items = CounterAggregator(flush_interval=60, max_pending=100), Collection(fail_with=AutoReconnect("down"))
+
+    aggregator.increment(items, 1, "mtc.vws", 2, on_insert={"bid": 1})
+    aggregator.flush()
+    aggregator.increment(items, 1, "mtc.vws")
+
+    assert aggregator.pending(items, 1, "mtc.vws") == 3
+    items.fail_with = None
+    aggregator.flush()
+
+    assert items.writes == [[UpdateOne({"_id": 1}, {"$inc": {"mtc.vws": 3}, "$setOnInsert": {"bid": 1}}, upsert=True)]]
+    assert aggregator.snapshot()["flush_errors"] == 1
+
+
+def test_rejected_writes_are_dropped():
+    error = BulkWriteError({"writeErrors": [{"index": 0, "code": 14, "errmsg": "Cannot apply $inc to a non-numeric value"}]})
+    aggregator, items = CounterAggregator(flush_interval=60, max_pending=100), Collection(fail_with=error)
+
+    aggregator.increment(items, 1, "mtc.vws")
+    aggregator.flush()
+
+    assert aggregator.pending(items, 1, "mtc.vws") == 0
+    assert aggregator.snapshot()["flush_errors"] == 1
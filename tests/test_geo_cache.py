@@ -0,0 +1,173 @@
+import pytest
+
+from database import geo_cache as geo_cache_module
+from database.geo_cache import GeoCache, spherical_distance
+
+POINT = [34.78, 32.08]
+NEARBY = [34.781, 32.081]
+FAR = [35.5, 33.0]
+
+
+class Collection:
+    def __init__(self, name: str = "items"):
+        self.name = name
+
+
+def make_cache(**overrides) -> GeoCache:
+    return GeoCache(**{"ttl": 60, "precision": 6, "max_entries": 10, "max_results": 10, **overrides})
+
+
+def loader_of(*docs, on_load=None):
+    calls = []
+
+    def load(center, reach, limit):
+        calls.append((center, reach, limit))
+        if on_load is not None:
+            on_load()
+        return list(docs)
+
+    return load, calls
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(geo_cache_module, "time", clock)
+    return clock
+
+
+def test_spherical_distance_reads_longitude_first():
+    assert spherical_distance([0, 0], [1, 0]) == pytest.approx(111319.5, rel=1e-4)
+    assert spherical_distance([0, 60], [1, 60]) == pytest.approx(111319.5 / 2, rel=1e-3)
+
+
+def test_queries_in_the_same_cell_and_bucket_share_an_entry(clock):
+    cache, items = make_cache(), Collection()
+    load, calls = loader_of({"_id": 1, "loc": {"coordinates": NEARBY}})
+
+    assert cache.candidates(items, POINT, 1000, load) == [(1, NEARBY)]
+    assert cache.candidates(items, [POINT[0] + 1e-5, POINT[1]], 1500, load) == [(1, NEARBY)]
+    assert len(calls) == 1
+    assert cache.snapshot() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_entry_reaches_the_bucket_radius_from_anywhere_in_its_cell(clock):
+    cache, items = make_cache(), Collection()
+    load, calls = loader_of()
+
+    cache.candidates(items, POINT, 1000, load)
+    center, reach, limit = calls[0]
+
+    assert reach > 2000
+    assert spherical_distance(center, POINT) <= reach - 2000
+    assert limit == cache.max_results + 1
+
+
+def test_entry_expires_after_ttl(clock):
+    cache, items = make_cache(ttl=30), Collection()
+    load, calls = loader_of()
+
+    cache.candidates(items, POINT, 1000, load)
+    clock.advance(29)
+    cache.candidates(items, POINT, 1000, load)
+    clock.advance(2)
+    cache.candidates(items, POINT, 1000, load)
+
+    assert len(calls) == 2
+
+
+def test_evict_expired_drops_only_expired_entries(clock):
+    cache, items = make_cache(ttl=30), Collection()
+    load, _ = loader_of()
+
+    cache.candidates(items, POINT, 1000, load)
+    clock.advance(20)
+    cache.candidates(items, FAR, 1000, load)
+    clock.advance(20)
+    cache.evict_expired()
+
+    assert cache.snapshot()["entries"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache, items = make_cache(max_entries=2), Collection()
+    load, calls = loader_of()
+
+    cache.candidates(items, POINT, 1000, load)
+    cache.candidates(items, FAR, 1000, load)
+    cache.candidates(items, POINT, 1000, load)
+    cache.candidates(items, [0.0, 0.0], 1000, load)
+    cache.candidates(items, POINT, 1000, load)
+    cache.candidates(items, FAR, 1000, load)
+
+    assert len(calls) == 4
+
+
+def test_invalidate_drops_only_entries_within_reach(clock):
+    cache, items = make_cache(), Collection()
+    load, calls = loader_of()
+
+    cache.candidates(items, POINT, 1000, load)
+    cache.candidates(items, FAR, 1000, load)
+    cache.invalidate(items, NEARBY)
+    cache.candidates(items, POINT, 1000, load)
+    cache.candidates(items, FAR, 1000, load)
+
+    assert len(calls) == 3
+
+
+def test_crowded_areas_are_not_served_from_the_cache(clock):
+    cache, items = make_cache(max_results=1), Collection()
+    load, calls = loader_of({"_id": 1, "loc": {"coordinates": NEARBY}}, {"_id": 2, "loc": {"coordinates": NEARBY}})
+
+    assert cache.candidates(items, POINT, 1000, load) is None
+    assert cache.candidates(items, POINT, 1000, load) is None
+    assert len(calls) == 1
+
+
+def test_radius_beyond_the_largest_bucket_is_not_cached(clock):
+    cache, items = make_cache(), Collection()
+    load, calls = loader_of()
+
+    assert cache.candidates(items, POINT, 200000, load) is None
+    assert calls == []
+
+
+def test_invalidation_during_a_load_is_not_lost():
+    cache, items = make_cache(), Collection()
+    load, calls = loader_of({"_id": 1, "loc": {"coordinates": POINT}}, on_load=lambda: cache.invalidate(items, NEARBY))
+
+    assert cache.candidates(items, POINT, 1000, load) == [(1, POINT)]
+    assert cache.candidates(items, POINT, 1000, load) == [(1, POINT)]
+    assert len(calls) == 2
+
+
+def test_clear_during_a_load_is_not_lost():
+    cache, items = make_cache(), Collection()
+    load, calls = loader_of(on_load=lambda: cache.clear(items))
+
+    cache.candidates(items, POINT, 1000, load)
+    cache.candidates(items, POINT, 1000, load)
+    assert len(calls) == 2
+
+
+def test_invalidation_of_another_collection_during_a_load_keeps_the_result():
+    cache, items = make_cache(), Collection()
+    load, calls = loader_of(on_load=lambda: cache.invalidate(Collection("businesses"), NEARBY))
+
+    cache.candidates(items, POINT, 1000, load)
+    cache.candidates(items, POINT, 1000, load)
+    assert len(calls) == 1
+
+
+def test_failed_load_leaves_no_load_in_flight():
+    cache, items = make_cache(), Collection()
+
+    def fail(center, reach, limit):
+        raise RuntimeError("unavailable")
+
+    try:
+        cache.candidates(items, POINT, 1000, fail)
+    except RuntimeError:
+        pass
+
+    assert cache._loading == {}
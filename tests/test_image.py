@@ -0,0 +1,88 @@
+import io
+import threading
+
+import pytest
+from PIL import Image as PILImage
+
+from database import image as image_module
+from database.image import Image, ImageVariant, InvalidImageError
+
+
+def encoded(size: tuple, mode: str = "RGB", image_format: str = "PNG") -> bytes:
+    output = io.BytesIO()
+    PILImage.new(mode, size, "red" if mode != "RGBA" else (255, 0, 0, 128)).save(output, image_format)
+    return output.getvalue()
+
+
+def decoded(data: bytes) -> PILImage.Image:
+    return PILImage.open(io.BytesIO(data))
+
+
+@pytest.fixture
+def bucket(s3_bucket, monkeypatch):
+    monkeypatch.setattr(image_module, "s3Bucket", s3_bucket)
+    return s3_bucket
+
+
+def test_variants_fit_their_max_size_as_jpeg():
+    variants = Image.render_variants(encoded((1600, 800)))
+
+    assert set(variants) == {ImageVariant.Thumbnail, ImageVariant.Card}
+    assert decoded(variants[ImageVariant.Thumbnail]).size == (200, 100)
+    assert decoded(variants[ImageVariant.Card]).size == (720, 360)
+    assert all(decoded(data).format == "JPEG" for data in variants.values())
+
+
+def test_small_images_are_not_upscaled():
+    variants = Image.render_variants(encoded((150, 300)))
+
+    assert decoded(variants[ImageVariant.Thumbnail]).size == (100, 200)
+    assert decoded(variants[ImageVariant.Card]).size == (150, 300)
+
+
+def test_transparent_images_render_as_rgb():
+    variants = Image.render_variants(encoded((300, 300), "RGBA"))
+
+    assert decoded(variants[ImageVariant.Card]).mode == "RGB"
+
+
+def test_undecodable_image_is_invalid():
+    with pytest.raises(InvalidImageError):
+        Image.render_variants(b"not an image" * 20)
+
+
+def test_decompression_bomb_is_invalid(monkeypatch):
+    monkeypatch.setattr(PILImage, "MAX_IMAGE_PIXELS", 1000)
+
+    with pytest.raises(InvalidImageError):
+        Image.render_variants(encoded((100, 100)))
+
+
+def test_upload_stores_the_original_and_its_variants(bucket):
+    data = encoded((1000, 1000))
+
+    image = Image.upload(data, key="key", folder_name="items/")
+
+    assert bucket.fetch("items/key") == data
+    assert decoded(bucket.fetch("items/key_thumbnail")).size == (200, 200)
+    assert image.get_image(ImageVariant.Card) == bucket.fetch("items/key_card")
+
+
+def test_variants_are_rendered_on_the_executor(bucket, monkeypatch):
+    render, threads = Image.render_variants, []
+
+    def record_thread(image):
+        threads.append(threading.current_thread())
+        return render(image)
+
+    monkeypatch.setattr(Image, "render_variants", staticmethod(record_thread))
+    Image.upload_many(encoded((300, 300)), encoded((300, 300)))
+
+    assert len(threads) == 2 and threading.current_thread() not in threads
+
+
+def test_invalid_image_uploads_nothing(bucket):
+    with pytest.raises(InvalidImageError):
+        Image.upload_many(encoded((300, 300)), b"not an image" * 20, folder_name="items/")
+
+    assert bucket.client.list_objects_v2(Bucket=bucket.bucket_name).get("KeyCount", 0) == 0
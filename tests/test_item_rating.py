@@ -0,0 +1,95 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+from database.business.item import item as item_module, item_rating, review as review_module
+from database.business.item.item import Item
+from database.business.item.item_rating import ItemRating
+from database.business.item.review import Review
+
+
+@pytest.fixture
+def item(mongo, monkeypatch):
+    for module in (item_module, item_rating):
+        monkeypatch.setattr(module, "items_collection", mongo.items)
+    for module in (review_module, item_rating):
+        monkeypatch.setattr(module, "reviews_collection", mongo.reviews)
+    mongo.reviews.create_index([("iid", 1), ("pid", 1)], unique=True)
+
+    item_id = ObjectId()
+    mongo.items.insert_one({"_id": item_id, "rtg": ItemRating.get_db_repr(ItemRating.empty())})
+    item = Item.__new__(Item)
+    item._id = item_id
+    return item
+
+
+def review(rating: float, poster_id: ObjectId = None) -> Review:
+    return Review(poster_id if poster_id is not None else ObjectId(), None, "poster", rating, "", [])
+
+
+def stored_rating(item: Item) -> ItemRating:
+    return ItemRating.document_repr_to_object(item_module.items_collection.find_one({"_id": item._id})["rtg"])
+
+
+@pytest.mark.parametrize("rating, star", [(0.2, "1"), (1.5, "2"), (2.5, "2"), (3.49, "3"), (4.5, "4"), (5, "5"), (7, "5")])
+def test_star_rounds_half_to_even_within_the_histogram(rating, star):
+    assert ItemRating.star(rating) == star
+
+
+def test_inc_update_adds_and_removes_a_rating():
+    assert ItemRating.inc_update(3.5) == {"rtg.c": 1, "rtg.s": 3.5, "rtg.hst.4": 1}
+    assert ItemRating.inc_update(3.5, -1) == {"rtg.c": -1, "rtg.s": -3.5, "rtg.hst.4": -1}
+
+
+def test_average_of_no_reviews_is_zero():
+    assert ItemRating.empty().average == 0
+    assert ItemRating(4, 14, {}).average == 3.5
+
+
+def test_missing_stars_read_as_zero():
+    rating = ItemRating.document_repr_to_object({"c": 1, "s": 5, "hst": {"5": 1}})
+
+    assert rating.histogram == {"1": 0, "2": 0, "3": 0, "4": 0, "5": 1}
+
+
+def test_removing_a_review_subtracts_its_rating(item):
+    poster_id = ObjectId()
+    item.add_review(review(4))
+    item.add_review(review(2, poster_id))
+
+    assert item.remove_review(poster_id).rating == 2
+    assert item.remove_review(poster_id) is None
+
+    rating = stored_rating(item)
+    assert (rating.count, rating.total, rating.histogram["2"], rating.histogram["4"]) == (1, 4, 0, 1)
+
+
+def test_second_review_of_a_poster_is_not_counted(item):
+    poster_id = ObjectId()
+
+    assert item.add_review(review(4, poster_id)) is not None
+    assert item.add_review(review(1, poster_id)) is None
+    assert stored_rating(item).count == 1
+
+
+def test_running_totals_match_the_recomputed_rating(item):
+    for rating in (5, 3.5, 3.5, 1):
+        item.add_review(review(rating))
+
+    assert ItemRating.get_db_repr(stored_rating(item)) == ItemRating.get_db_repr(ItemRating.from_reviews(item._id)[item._id])
+
+
+def test_failed_increment_recomputes_the_rating(item, monkeypatch):
+    item.add_review(review(5))
+    update_one = item_module.items_collection.update_one
+
+    def fail_increments(query, update, *args, **kwargs):
+        if "$inc" in update:
+            raise AutoReconnect("down")
+        return update_one(query, update, *args, **kwargs)
+
+    monkeypatch.setattr(item_module.items_collection, "update_one", fail_increments)
+    item.add_review(review(2))
+
+    rating = stored_rating(item)
+    assert (rating.count, rating.total) == (2, 7)
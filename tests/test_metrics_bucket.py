@@ -0,0 +1,135 @@
+import datetime
+import types
+
+import pytest
+from bson import ObjectId
+
+from api.business.business_metrics_controller import dashboard_series
+from database.business import metrics_bucket as metrics_bucket_module
+from database.business.metrics_bucket import MetricsBucket, MetricsEntityType, MetricsGranularity
+from database.counter_aggregator import CounterAggregator
+
+UTC = datetime.timezone.utc
+START = datetime.datetime(2024, 5, 6, 22, 0, tzinfo=UTC)
+
+
+class Now:
+    """
+    Stands in for the datetime module of metrics_bucket, record reads the current hour from it.
+    """
+
+    def __init__(self, now: datetime.datetime):
+        self.timezone = datetime.timezone
+        self.datetime = types.SimpleNamespace(now=lambda tz=None: self.now)
+        self.now = now
+
+
+@pytest.fixture
+def now(monkeypatch) -> Now:
+    now = Now(START)
+    monkeypatch.setattr(metrics_bucket_module, "datetime", now)
+    return now
+
+
+@pytest.fixture
+def aggregator(mongo, monkeypatch) -> CounterAggregator:
+    aggregator = CounterAggregator(flush_interval=60, max_pending=1000)
+    monkeypatch.setattr(metrics_bucket_module, "counter_aggregator", aggregator)
+    monkeypatch.setattr(metrics_bucket_module, "metrics_collection", mongo.metrics)
+    return aggregator
+
+
+def bucket(entity_type: MetricsEntityType, entity_id: ObjectId, time: datetime.datetime, views=0, orders=0, likes=0):
+    return MetricsBucket(entity_type, entity_id, ObjectId(), time, views, orders, likes)
+
+
+def test_record_creates_the_bucket_of_the_current_hour(mongo, aggregator, now):
+    business_id, item_id = ObjectId(), ObjectId()
+    now.now = START.replace(minute=42, second=7)
+
+    MetricsBucket.record(MetricsEntityType.Item, item_id, business_id, "views")
+    MetricsBucket.record(MetricsEntityType.Item, item_id, business_id, "orders", 3)
+    aggregator.flush()
+
+    assert mongo.metrics.find_one() == {
+        "_id": f"{item_id}:{int(START.timestamp())}", "tp": "i", "eid": item_id, "bid": business_id, "h": START, "vws": 1, "ods": 3,
+    }
+
+
+def test_record_rolls_over_to_a_new_bucket_every_hour(mongo, aggregator, now):
+    business_id = ObjectId()
+
+    MetricsBucket.record(MetricsEntityType.Business, business_id, business_id, "views")
+    now.now = START.replace(minute=59, second=59)
+    MetricsBucket.record(MetricsEntityType.Business, business_id, business_id, "views")
+    now.now = START + datetime.timedelta(hours=1)
+    MetricsBucket.record(MetricsEntityType.Business, business_id, business_id, "views")
+    aggregator.flush()
+
+    assert [(doc["h"], doc["vws"]) for doc in mongo.metrics.find().sort("h")] == [
+        (START, 2), (START + datetime.timedelta(hours=1), 1)
+    ]
+
+
+@pytest.fixture
+def recorded(aggregator, now) -> tuple[ObjectId, ObjectId]:
+    """
+    Views of a business and an item over three hours, the last of them on the next day.
+    """
+    business_id, item_id = ObjectId(), ObjectId()
+    for hour, views in ((0, 2), (1, 1), (2, 4)):
+        now.now = START + datetime.timedelta(hours=hour)
+        MetricsBucket.record(MetricsEntityType.Business, business_id, business_id, "views", views)
+        MetricsBucket.record(MetricsEntityType.Item, item_id, business_id, "views", views)
+        MetricsBucket.record(MetricsEntityType.Item, item_id, business_id, "likes")
+
+    # another business's views are left out of the series
+    MetricsBucket.record(MetricsEntityType.Business, ObjectId(), ObjectId(), "views")
+    aggregator.flush()
+    return business_id, item_id
+
+
+def test_hourly_series_keeps_every_bucket_in_range(recorded):
+    business_id, item_id = recorded
+
+    series = MetricsBucket.get_business_series(
+        business_id, START, START + datetime.timedelta(hours=2), MetricsGranularity.Hour
+    )
+
+    assert [(bucket.entity_type, bucket.time, bucket.views, bucket.likes) for bucket in series if bucket.entity_id == item_id] == [
+        (MetricsEntityType.Item, START, 2, 1), (MetricsEntityType.Item, START + datetime.timedelta(hours=1), 1, 1)
+    ]
+    assert all(bucket.business_id == business_id for bucket in series)
+
+
+def test_daily_series_sums_the_hours_of_each_day(recorded):
+    business_id, item_id = recorded
+
+    series = MetricsBucket.get_business_series(business_id, START - datetime.timedelta(days=1), START + datetime.timedelta(days=1))
+
+    next_day = START.replace(hour=0) + datetime.timedelta(days=1)
+    assert sorted((bucket.entity_type.value, bucket.time, bucket.views, bucket.likes) for bucket in series) == [
+        ("b", START.replace(hour=0), 3, 0), ("b", next_day, 4, 0), ("i", START.replace(hour=0), 3, 2), ("i", next_day, 4, 1),
+    ]
+    assert [bucket.time for bucket in series] == sorted(bucket.time for bucket in series)
+
+
+def test_dashboard_splits_business_and_item_points():
+    business_id, first_item, second_item = ObjectId(), ObjectId(), ObjectId()
+    later = START + datetime.timedelta(hours=1)
+
+    business_series, item_series = dashboard_series([
+        bucket(MetricsEntityType.Business, business_id, START, views=5),
+        bucket(MetricsEntityType.Item, first_item, START, views=2, orders=1, likes=3),
+        bucket(MetricsEntityType.Item, second_item, START, views=1),
+        bucket(MetricsEntityType.Item, first_item, later, views=4),
+    ])
+
+    assert business_series == [{"time": START.isoformat(), "views": 5}]
+    assert item_series == {
+        str(first_item): [
+            {"time": START.isoformat(), "views": 2, "orders": 1, "likes": 3},
+            {"time": later.isoformat(), "views": 4, "orders": 0, "likes": 0},
+        ],
+        str(second_item): [{"time": START.isoformat(), "views": 1, "orders": 0, "likes": 0}],
+    }
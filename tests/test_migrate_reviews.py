@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from database.business.item import item_rating
+from scripts import migrate_reviews
+
+DATE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def collections(mongo, monkeypatch):
+    monkeypatch.setattr(migrate_reviews, "items_collection", mongo.items)
+    monkeypatch.setattr(migrate_reviews, "reviews_collection", mongo.reviews)
+    monkeypatch.setattr(item_rating, "items_collection", mongo.items)
+    monkeypatch.setattr(item_rating, "reviews_collection", mongo.reviews)
+    monkeypatch.setattr(migrate_reviews, "ensure_indexes", lambda: mongo.reviews.create_index([("iid", 1), ("pid", 1)], unique=True))
+    return mongo.items, mongo.reviews
+
+
+def embedded(rating: float, pid: ObjectId = None) -> dict:
+    return {"pid": pid if pid is not None else ObjectId(), "nme": "poster", "rtn": rating, "txt": "", "imgs": []}
+
+
+def test_embedded_reviews_move_to_the_reviews_collection(collections):
+    items, reviews = collections
+    item_id = ObjectId()
+    items.insert_one({"_id": item_id, "rs": [embedded(4), embedded(2.5), {"nme": "no poster", "rtn": 5}]})
+
+    assert migrate_reviews.migrate_item(item_id, items.find_one({"_id": item_id})["rs"], DATE) == 2
+
+    moved = list(reviews.find({"iid": item_id}))
+    assert len(moved) == 2
+    assert all(review["dt"] == DATE and review["_id"] is not None for review in moved)
+
+    item = items.find_one({"_id": item_id})
+    assert "rs" not in item
+    assert item["rtg"] == {"c": 2, "s": 6.5, "hst": {"1": 0, "2": 1, "3": 0, "4": 1, "5": 0}}
+
+
+def test_rerunning_keeps_one_review_per_poster(collections):
+    items, reviews = collections
+    item_id, poster_id = ObjectId(), ObjectId()
+    reviews.insert_one({**embedded(5, poster_id), "_id": ObjectId(), "iid": item_id, "dt": DATE})
+    items.insert_one({"_id": item_id, "rs": [embedded(1, poster_id), embedded(3)]})
+
+    migrate_reviews.migrate(batch_size=10)
+    migrate_reviews.migrate(batch_size=10)
+
+    assert reviews.count_documents({"iid": item_id}) == 2
+    assert reviews.find_one({"iid": item_id, "pid": poster_id})["rtn"] == 5
+    assert items.find_one({"_id": item_id})["rtg"]["c"] == 2
+
+
+def test_items_without_embedded_reviews_are_left_alone(collections):
+    items, _ = collections
+    item_id = ObjectId()
+    items.insert_one({"_id": item_id, "rtg": {"c": 1, "s": 4, "hst": {"4": 1}}})
+
+    migrate_reviews.migrate(batch_size=10)
+
+    assert items.find_one({"_id": item_id})["rtg"] == {"c": 1, "s": 4, "hst": {"4": 1}}
+
+
+def test_reconcile_recomputes_drifted_ratings(collections):
+    items, reviews = collections
+    reviewed, unreviewed = ObjectId(), ObjectId()
+    items.insert_many([{"_id": reviewed, "rtg": {"c": 5, "s": 1, "hst": {}}}, {"_id": unreviewed, "rtg": {"c": 1, "s": 3, "hst": {}}}])
+    reviews.insert_many([{**embedded(rating), "_id": ObjectId(), "iid": reviewed, "dt": DATE} for rating in (4, 4, 1.5)])
+
+    migrate_reviews.reconcile(batch_size=1)
+    migrate_reviews.reconcile(batch_size=1)
+
+    assert items.find_one({"_id": reviewed})["rtg"] == {"c": 3, "s": 9.5, "hst": {"1": 0, "2": 1, "3": 0, "4": 2, "5": 0}}
+    assert items.find_one({"_id": unreviewed})["rtg"] == {"c": 0, "s": 0, "hst": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}}
@@ -0,0 +1,79 @@
+import pytest
+from bson import ObjectId
+
+from database.business.item.item_metrics import ItemMetrics
+from database.business.item.item_summary import ItemSummary
+from database.business.owner_cache import OwnerCache
+from database.counter_aggregator import counter_aggregator
+
+
+class Collection:
+    def __init__(self, *docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.reads = 0
+
+    def find_one(self, query, projection):
+        self.reads += 1
+        doc = self.docs.get(query["_id"])
+        return {key: doc[key] for key in ("_id", *projection) if key in doc} if doc is not None else None
+
+
+@pytest.fixture
+def item_owners(monkeypatch):
+    owners = OwnerCache(Collection(), "bid", 2)
+    monkeypatch.setattr("database.business.owner_cache.item_owners", owners)
+    return owners
+
+
+def test_miss_reads_the_owner_once():
+    item_id, business_id = ObjectId(), ObjectId()
+    owners = OwnerCache(Collection({"_id": item_id, "bid": business_id}), "bid", 10)
+
+    assert owners.get(item_id) == business_id
+    assert owners.get(item_id) == business_id
+    assert owners.collection.reads == 1
+
+
+def test_missing_documents_are_not_cached():
+    owners = OwnerCache(Collection(), "bid", 10)
+    _id = ObjectId()
+
+    assert owners.get(_id) is None
+    assert owners.get(_id) is None
+    assert owners.collection.reads == 2
+
+
+def test_least_recently_used_owner_is_evicted():
+    owners = OwnerCache(Collection(), "bid", 2)
+    first, second, third = ObjectId(), ObjectId(), ObjectId()
+
+    owners.put(first, 1)
+    owners.put(second, 2)
+    owners.get(first)
+    owners.put(third, 3)
+
+    assert owners.get(second) is None
+    assert owners.get(first) == 1 and owners.get(third) == 3
+
+
+def test_loaded_summaries_fill_the_cache(item_owners):
+    item_id, business_id = ObjectId(), ObjectId()
+
+    ItemSummary.document_repr_to_object({"_id": item_id, "bid": business_id, "loc": {"type": "Point", "coordinates": [34.78, 32.08]}})
+
+    assert item_owners.get(item_id) == business_id
+    assert item_owners.collection.reads == 0
+
+
+def test_record_counts_a_cached_item_without_reading(item_owners, monkeypatch):
+    increments = []
+    monkeypatch.setattr(counter_aggregator, "increment", lambda *args, **kwargs: increments.append(args[1:4]) or 1)
+    item_id, business_id = ObjectId(), ObjectId()
+    item_owners.put(item_id, business_id)
+
+    assert ItemMetrics.record(item_id, "views")
+    assert not ItemMetrics.record(ObjectId(), "views")
+
+    assert (item_id, "mtc.vws", 1) in increments
+    assert len(increments) == 2  # the item and its hourly bucket
+    assert item_owners.collection.reads == 1
@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent import futures
+
+import pytest
+
+from database.user.password_hasher import PasswordHasher, PasswordHasherBusyError
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    monkeypatch.setenv("BCRYPT_ROUNDS", "4")
+    monkeypatch.setenv("PASSWORD_HASHER_POOL_SIZE", "1")
+    monkeypatch.setenv("PASSWORD_HASHER_QUEUE_SIZE", "1")
+    monkeypatch.setenv("PASSWORD_HASHER_RETRY_AFTER_SECONDS", "3")
+
+    # PasswordHasher is a singleton, every test gets its own pool
+    hasher = type.__call__(PasswordHasher)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_round_trips_on_the_worker_processes(hasher):
+    hashed = hasher.hash("password")
+
+    assert hasher.check("password", hashed)
+    assert not hasher.check("wrong", hashed)
+    assert not hasher.needs_rehash(hashed)
+
+
+@pytest.mark.parametrize("hashed, needs_rehash", [
+    (b"$2b$04$" + b"a" * 53, False),
+    (b"$2b$12$" + b"a" * 53, True),
+    (b"not a hash", True),
+])
+def test_needs_rehash_compares_the_cost(hasher, hashed, needs_rehash):
+    assert hasher.needs_rehash(hashed) is needs_rehash
+
+
+def test_work_beyond_the_pool_and_queue_is_rejected(hasher):
+    # threads stand in for the worker processes so the test controls when work finishes
+    hasher._executor = futures.ThreadPoolExecutor(max_workers=hasher.pool_size)
+    release = threading.Event()
+    running = [threading.Thread(target=hasher._run, args=(release.wait,)) for _ in range(hasher.pool_size + hasher.queue_size)]
+    for thread in running:
+        thread.start()
+
+    deadline = time.monotonic() + 5
+    while hasher._slots._value > 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    try:
+        with pytest.raises(PasswordHasherBusyError) as e:
+            hasher._run(lambda: None)
+        assert e.value.retry_after == 3
+    finally:
+        release.set()
+        for thread in running:
+            thread.join()
+
+    assert hasher._run(lambda: "done") == "done"
@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from database.business.item import review as review_module
+from database.business.item.review import Review
+
+
+@pytest.fixture
+def reviews(mongo, monkeypatch):
+    monkeypatch.setattr(review_module, "reviews_collection", mongo.reviews)
+    return mongo.reviews
+
+
+def add_review(reviews, item_id: ObjectId, date: datetime.datetime) -> ObjectId:
+    _id = ObjectId()
+    reviews.insert_one({"_id": _id, "iid": item_id, "pid": ObjectId(), "nme": "poster", "rtn": 4, "txt": "", "imgs": [], "dt": date})
+    return _id
+
+
+def all_pages(item_id: ObjectId, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        page, cursor = Review.get_item_reviews(item_id, limit, cursor)
+        pages.append([review._id for review in page])
+        if cursor is None:
+            return pages
+
+
+def test_reviews_page_newest_first_with_ties_broken_by_id(reviews):
+    item_id = ObjectId()
+    base = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    dates = [base, base + datetime.timedelta(minutes=1), base + datetime.timedelta(minutes=1), base + datetime.timedelta(minutes=2), base]
+    ids = [add_review(reviews, item_id, date) for date in dates]
+    add_review(reviews, ObjectId(), base)
+
+    expected = [_id for _, _id in sorted(zip(dates, ids), reverse=True)]
+    pages = all_pages(item_id, limit=2)
+
+    assert [_id for page in pages for _id in page] == expected
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_exactly_full_last_page_has_no_cursor(reviews):
+    item_id = ObjectId()
+    for minute in range(2):
+        add_review(reviews, item_id, datetime.datetime(2024, 1, 1, 0, minute, tzinfo=datetime.timezone.utc))
+
+    page, cursor = Review.get_item_reviews(item_id, 2)
+    assert len(page) == 2 and cursor is None
+
+
+def test_review_dates_are_read_as_utc(reviews):
+    item_id = ObjectId()
+    add_review(reviews, item_id, datetime.datetime(2024, 1, 1))
+
+    page, _ = Review.get_item_reviews(item_id, 1)
+    assert page[0].date.utcoffset() == datetime.timedelta(0)
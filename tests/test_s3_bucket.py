@@ -0,0 +1,125 @@
+import io
+import time
+
+import pytest
+
+from database.S3Bucket import LimitedReader, S3UploadError, UploadTooLargeError
+
+DATA = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def upload_uncached(bucket, *keys: str):
+    for key in keys:
+        bucket.upload(DATA, key)
+        bucket.cache.invalidate(key)
+
+
+def test_upload_then_fetch_round_trips_through_the_endpoint(s3_bucket):
+    upload_uncached(s3_bucket, "round-trip")
+
+    assert s3_bucket.fetch("round-trip") == DATA
+    assert s3_bucket.metrics.fetches == 1
+
+
+def test_fetch_is_served_from_the_cache_after_the_first_read(s3_bucket):
+    s3_bucket.upload(DATA, "cached")
+
+    assert s3_bucket.fetch("cached") == DATA
+    assert s3_bucket.metrics.cache_hits == 1
+    assert s3_bucket.metrics.fetches == 0
+
+
+def test_fetch_all_returns_failures_per_key(s3_bucket):
+    s3_bucket.upload(DATA, "present")
+
+    results = dict(s3_bucket.fetch_all("present", "missing"))
+
+    assert results["present"] == DATA
+    assert isinstance(results["missing"], Exception)
+
+
+def test_fetch_all_keeps_one_fetch_per_worker_in_flight(s3_bucket, in_flight):
+    keys = [f"key-{i}" for i in range(4)]
+    upload_uncached(s3_bucket, *keys)
+
+    started = time.perf_counter()
+    results = dict(s3_bucket.fetch_all(*keys))
+    elapsed = time.perf_counter() - started
+
+    assert results == dict.fromkeys(keys, DATA)
+    assert in_flight.max == s3_bucket.pool_size
+    assert elapsed < len(keys) * in_flight.seconds
+    assert s3_bucket._executor_slots._value == s3_bucket.pool_size + s3_bucket.pool_queue_size
+
+
+@pytest.mark.parametrize("body", [io.BytesIO(DATA), [DATA[:10], b"", DATA[10:40], DATA[40:]]])
+def test_limited_reader_reads_files_and_chunks(body):
+    reader = LimitedReader(body, len(DATA))
+
+    assert reader.read(5) + reader.read(50) + reader.read() == DATA
+    assert reader.read_bytes == len(DATA)
+
+
+@pytest.mark.parametrize("body", [io.BytesIO(DATA), [DATA[:10], DATA[10:]]])
+def test_limited_reader_raises_once_past_its_limit(body):
+    reader = LimitedReader(body, 20)
+    reader.read(20)
+
+    with pytest.raises(UploadTooLargeError):
+        reader.read(1)
+
+
+def test_oversized_stream_is_not_uploaded(s3_bucket):
+    with pytest.raises(UploadTooLargeError):
+        s3_bucket.upload_stream(iter([DATA] * 4), "oversized", max_size=len(DATA) * 2)
+
+    with pytest.raises(Exception):
+        s3_bucket.client.head_object(Bucket=s3_bucket.bucket_name, Key="oversized")
+
+
+def stored(bucket, key: str) -> bool:
+    try:
+        bucket.client.head_object(Bucket=bucket.bucket_name, Key=key)
+        return True
+    except Exception:
+        return False
+
+
+def test_upload_all_returns_the_keys_in_order(s3_bucket):
+    assert s3_bucket.upload_all((DATA, "first"), (DATA, "second", "image/jpeg")) == ["first", "second"]
+    assert stored(s3_bucket, "first") and stored(s3_bucket, "second")
+
+
+def test_failed_upload_rolls_back_the_others(s3_bucket, monkeypatch):
+    upload = s3_bucket.upload
+
+    def fail_second(data, key, *args):
+        if key == "second":
+            raise ConnectionError("reset")
+        return upload(data, key, *args)
+
+    monkeypatch.setattr(s3_bucket, "upload", fail_second)
+
+    with pytest.raises(S3UploadError) as e:
+        s3_bucket.upload_all((DATA, "first"), (DATA, "second"))
+
+    assert e.value.failed_keys == ["second"]
+    assert not stored(s3_bucket, "first")
+
+
+def test_failed_submit_rolls_back_the_submitted_uploads(s3_bucket, monkeypatch):
+    submit, submitted = s3_bucket.submit, []
+
+    def reject_second(fn, *args):
+        if len(submitted) == 1:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        submitted.append(args[1])
+        return submit(fn, *args)
+
+    monkeypatch.setattr(s3_bucket, "submit", reject_second)
+
+    with pytest.raises(RuntimeError):
+        s3_bucket.upload_all((DATA, "first"), (DATA, "second"))
+
+    assert submitted == ["first"]
+    assert not stored(s3_bucket, "first")
@@ -0,0 +1,83 @@
+import os
+
+from database.S3Bucket import S3Cache
+
+
+def test_memory_tier_evicts_the_least_recently_used_bytes():
+    cache = S3Cache(memory_max_bytes=32)
+    for i in range(8):
+        cache.put(f"k{i}", b"data")
+
+    assert cache.get("k0") == b"data"
+    cache.put("k8", b"data")
+
+    assert cache.get("k1") is None
+    assert cache.get("k0") == b"data"
+    assert cache._memory_bytes == 32
+
+
+def test_memory_tier_skips_objects_over_an_eighth_of_its_size():
+    cache = S3Cache(memory_max_bytes=32)
+    cache.put("large", b"x" * 5)
+
+    assert cache.get("large") is None
+
+
+def test_rewriting_a_key_replaces_its_bytes():
+    cache = S3Cache(memory_max_bytes=32)
+    cache.put("key", b"abcd")
+    cache.put("key", b"ab")
+
+    assert cache.get("key") == b"ab"
+    assert cache._memory_bytes == 2
+
+
+def test_disk_tier_serves_what_memory_does_not_hold(tmp_path):
+    cache = S3Cache(memory_max_bytes=8, disk_directory=str(tmp_path), disk_max_bytes=10)
+    cache.put("a", b"aaaa")
+
+    assert cache.get("a") == b"aaaa"
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_disk_tier_evicts_the_least_recently_used_files(tmp_path):
+    cache = S3Cache(memory_max_bytes=8, disk_directory=str(tmp_path), disk_max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_disk_tier_is_reloaded_and_drops_partial_writes(tmp_path):
+    S3Cache(memory_max_bytes=8, disk_directory=str(tmp_path), disk_max_bytes=10).put("a", b"aaaa")
+    (tmp_path / "partial.123.tmp").write_bytes(b"x")
+
+    cache = S3Cache(memory_max_bytes=8, disk_directory=str(tmp_path), disk_max_bytes=10)
+
+    assert cache.get("a") == b"aaaa"
+    assert not (tmp_path / "partial.123.tmp").exists()
+
+
+def test_disk_tier_is_trimmed_to_its_size_on_reload(tmp_path):
+    S3Cache(memory_max_bytes=8, disk_directory=str(tmp_path), disk_max_bytes=10).put("a", b"aaaa")
+    S3Cache(memory_max_bytes=8, disk_directory=str(tmp_path), disk_max_bytes=10).put("b", b"bbbb")
+
+    cache = S3Cache(memory_max_bytes=8, disk_directory=str(tmp_path), disk_max_bytes=4)
+
+    assert cache._disk_bytes == 4
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_invalidate_removes_both_tiers(tmp_path):
+    cache = S3Cache(memory_max_bytes=64, disk_directory=str(tmp_path), disk_max_bytes=64)
+    cache.put("a", b"aaaa")
+    cache.invalidate("a")
+
+    assert cache.get("a") is None
+    assert os.listdir(tmp_path) == []
+    assert cache._memory_bytes == 0 and cache._disk_bytes == 0
@@ -0,0 +1,112 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from scheduler import Scheduler
+
+
+@pytest.fixture
+def scheduler():
+    # Scheduler is a singleton, every test gets its own dispatch thread and workers
+    scheduler = type.__call__(Scheduler)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return condition()
+
+
+def test_dispatch_thread_starts_with_the_first_task(scheduler):
+    assert scheduler._thread is None
+
+    scheduler.every(60, lambda: None)
+
+    assert scheduler._thread.is_alive() and scheduler._thread.daemon
+
+
+def test_task_runs_every_interval_until_cancelled(scheduler):
+    runs = []
+    task = scheduler.every(0.01, lambda: runs.append(1), jitter=0)
+
+    assert wait_until(lambda: len(runs) >= 3)
+    task.cancel()
+    time.sleep(0.05)
+    count = len(runs)
+    time.sleep(0.05)
+
+    assert len(runs) == count
+
+
+def test_runs_of_a_task_never_overlap(scheduler):
+    lock, overlaps, runs = threading.Lock(), [], []
+
+    def run():
+        if not lock.acquire(blocking=False):
+            overlaps.append(1)
+            return
+
+        time.sleep(0.03)
+        runs.append(1)
+        lock.release()
+
+    scheduler.every(0.001, run, jitter=0, initial_delay=0)
+
+    assert wait_until(lambda: len(runs) >= 3)
+    assert overlaps == []
+
+
+def test_failing_task_is_rescheduled(scheduler):
+    runs = []
+
+    def fail():
+        runs.append(1)
+        raise RuntimeError("failed")
+
+    scheduler.every(0.01, fail, jitter=0)
+
+    assert wait_until(lambda: len(runs) >= 2)
+
+
+def test_shutdown_cancels_tasks_and_runs_hooks_once(scheduler):
+    hooks = []
+    task = scheduler.every(60, lambda: None)
+    scheduler.on_shutdown(lambda: hooks.append(1))
+
+    scheduler.shutdown()
+    scheduler.shutdown()
+
+    assert task.cancelled and hooks == [1]
+    assert scheduler.every(60, lambda: None).cancelled
+
+
+def test_maintenance_is_scheduled_on_startup(scheduler, monkeypatch):
+    import database
+    from database import counter_aggregator, geo_cache, pending_upload
+    from database.user import user_cache
+
+    for module in (counter_aggregator, geo_cache, pending_upload, user_cache):
+        monkeypatch.setattr(module, "scheduler", scheduler)
+
+    database.schedule_maintenance()
+
+    assert {task.name for _, _, task in scheduler._queue} == {
+        "Counter flush", "Geo cache eviction", "User cache eviction", "Pending upload cleanup"
+    }
+    assert scheduler._shutdown_hooks == [counter_aggregator.counter_aggregator.flush]
+
+
+def test_importing_the_application_does_not_start_the_scheduler():
+    code = "import threading, api, database; print(any(t.name == 'Scheduler' for t in threading.enumerate()))"
+
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,96 @@
+import base64
+import json
+
+import pytest
+from bson import ObjectId
+
+from api.search_controller import decode_cursor, encode_cursor, page_from_candidates
+from database.geo_cache import spherical_distance
+
+CENTER = [34.78, 32.08]
+
+
+class Collection:
+    def __init__(self, *docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    def aggregate(self, pipeline):
+        ids = pipeline[0]["$match"]["_id"]["$in"]
+        return [dict(self.docs[_id]) for _id in ids if _id in self.docs]
+
+
+def located(*coordinates) -> list:
+    return [(ObjectId(), point) for point in coordinates]
+
+
+def collection_of(candidates) -> Collection:
+    return Collection(*({"_id": _id, "loc": {"type": "Point", "coordinates": point}} for _id, point in candidates))
+
+
+def all_pages(candidates, limit: int) -> list:
+    collection = collection_of(candidates)
+    pages, cursor = [], None
+    while True:
+        docs, next_cursor = page_from_candidates(CENTER, 5000, candidates, collection, limit, decode_cursor(cursor))
+        pages.append([doc["_id"] for doc in docs])
+        if next_cursor is None:
+            return pages
+
+        cursor = next_cursor
+
+
+def test_cursor_round_trips():
+    _id = ObjectId()
+
+    assert decode_cursor(encode_cursor(1234.5, _id)) == (1234.5, _id)
+    assert decode_cursor(None) is None
+
+
+def test_cursor_with_a_source_decodes():
+    _id = ObjectId()
+    cursor = base64.urlsafe_b64encode(json.dumps({"d": 10.0, "id": str(_id), "s": "db"}).encode()).decode()
+
+    assert decode_cursor(cursor) == (10.0, _id)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", base64.urlsafe_b64encode(b'{"d": 1}').decode(),
+                                    base64.urlsafe_b64encode(b'{"d": "x", "id": "y"}').decode()])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_candidate_once_closest_first():
+    candidates = located(*([[34.781, 32.081]] * 3), [34.79, 32.09], [34.785, 32.085], *([[34.7805, 32.0805]] * 2), [35.5, 33.0])
+    expected = [_id for _, _id in sorted(
+        (spherical_distance(CENTER, point), _id) for _id, point in candidates if spherical_distance(CENTER, point) <= 5000
+    )]
+
+    pages = all_pages(candidates, limit=2)
+
+    assert [_id for page in pages for _id in page] == expected
+    assert all(len(page) == 2 for page in pages[:-1])
+
+
+def test_last_page_has_no_cursor():
+    candidates = located([34.781, 32.081], [34.782, 32.082])
+
+    assert all_pages(candidates, limit=2) == [[_id for _id, _ in candidates]]
+
+
+def test_without_limit_or_cursor_every_candidate_is_returned():
+    candidates = located(*([[34.781, 32.081]] * 60), [35.5, 33.0])
+
+    docs, cursor = page_from_candidates(CENTER, 5000, candidates, collection_of(candidates))
+
+    assert len(docs) == 60
+    assert cursor is None
+
+
+def test_cursor_breaks_distance_ties_by_id():
+    candidates = sorted(located(*([[34.781, 32.081]] * 3)), key=lambda candidate: candidate[0])
+    cursor = (spherical_distance(CENTER, candidates[0][1]), candidates[0][0])
+
+    docs, _ = page_from_candidates(CENTER, 5000, candidates, collection_of(candidates), 10, cursor)
+
+    assert [doc["_id"] for doc in docs] == [_id for _id, _ in candidates[1:]]
@@ -0,0 +1,118 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bson import ObjectId
+
+from database.geo_cache import spherical_distance
+from database.spatial_index import SpatialIndex
+
+CENTER = [34.78, 32.08]
+
+
+class Collection:
+    name = "items"
+
+    def __init__(self, *docs, during_find=None):
+        self.docs = list(docs)
+        self.during_find = during_find
+
+    def find(self, query, projection):
+        for i, doc in enumerate(self.docs):
+            if i == 0 and self.during_find is not None:
+                self.during_find()
+            yield doc
+
+
+def doc(_id: ObjectId, lng: float, lat: float) -> dict:
+    return {"_id": _id, "loc": {"type": "Point", "coordinates": [lng, lat]}}
+
+
+def ids_in_radius(index: SpatialIndex, max_distance: float = 5000, **kwargs) -> list:
+    return [_id for _, _id in index.query(CENTER, max_distance, **kwargs)]
+
+
+def test_query_returns_documents_closest_first():
+    near, far, outside = ObjectId(), ObjectId(), ObjectId()
+    index = SpatialIndex(Collection(doc(far, 34.79, 32.09), doc(outside, 35.5, 33.0), doc(near, 34.781, 32.081)), 60, 100)
+    index.load()
+
+    assert ids_in_radius(index) == [near, far]
+
+
+def test_key_pads_ids_ending_in_null_bytes():
+    _id = ObjectId(b"\x01" * 10 + b"\0\0")
+    index = SpatialIndex(Collection(doc(_id, 34.781, 32.081)), 60, 100)
+    index.load()
+
+    assert SpatialIndex._key(index._ids[0]) == _id.binary
+    assert ids_in_radius(index) == [_id]
+
+
+def test_updates_apply_as_a_delta_until_merge_size():
+    kept, moved, deleted, created = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    index = SpatialIndex(Collection(doc(kept, 34.781, 32.081), doc(moved, 34.782, 32.082), doc(deleted, 34.783, 32.083)), 60, 100)
+    index.load()
+
+    index.update(moved, [35.5, 33.0])
+    index.update(deleted, None)
+    index.update(created, [34.7805, 32.0805])
+
+    assert len(index._added) == 2 and len(index._removed) == 3
+    assert ids_in_radius(index) == [created, kept]
+
+
+def test_delta_is_merged_into_the_arrays_once_it_reaches_merge_size():
+    kept, created = ObjectId(), ObjectId()
+    index = SpatialIndex(Collection(doc(kept, 34.781, 32.081)), 60, 3)
+    index.load()
+
+    index.update(created, [34.7805, 32.0805])
+    index.update(kept, None)
+
+    assert index._added == {} and index._removed == set()
+    assert list(map(SpatialIndex._key, index._ids)) == [created.binary]
+    assert ids_in_radius(index) == [created]
+
+
+def test_writes_during_a_load_are_applied_after_it():
+    loaded, created, deleted = ObjectId(), ObjectId(), ObjectId()
+    index = SpatialIndex(Collection(doc(loaded, 34.781, 32.081), doc(deleted, 34.782, 32.082)), 60, 100)
+
+    def write():
+        index.update(created, [34.7805, 32.0805])
+        index.update(deleted, None)
+
+    index.collection.during_find = write
+    index.load()
+
+    assert ids_in_radius(index) == [created, loaded]
+    assert index._pending is None
+
+
+def test_cursor_skips_documents_up_to_it():
+    first, second, third = sorted([ObjectId(), ObjectId(), ObjectId()])
+    index = SpatialIndex(Collection(doc(third, 34.781, 32.081), doc(first, 34.781, 32.081), doc(second, 34.79, 32.09)), 60, 100)
+    index.load()
+    ranked = index.query(CENTER, 5000)
+
+    assert [_id for _, _id in ranked] == [first, third, second]
+    assert ids_in_radius(index, cursor=ranked[0]) == [third, second]
+
+
+def test_distances_match_the_geo_cache_exactly():
+    points = [[34.781, 32.081], [34.79, 32.09], [34.7805, 32.0805]]
+    index = SpatialIndex(Collection(*(doc(ObjectId(), *point) for point in points)), 60, 100)
+    index.load()
+
+    assert sorted(distance for distance, _ in index.query(CENTER, 5000)) == sorted(
+        spherical_distance(CENTER, point) for point in points
+    )
+
+
+def test_limit_keeps_the_closest():
+    first, second = ObjectId(), ObjectId()
+    index = SpatialIndex(Collection(doc(second, 34.79, 32.09), doc(first, 34.781, 32.081), doc(ObjectId(), 34.8, 32.1)), 60, 100)
+    index.load()
+
+    assert ids_in_radius(index, limit=2) == [first, second]
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from database import TokenBlacklist
+from security import token_cache
+from security.token_cache import DecodedTokenCache
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    """
+    Claims of the tokens the fake verifier accepts, the verifier records each token it was asked to verify.
+    """
+    claims = {}
+    verified = []
+
+    def decode_access_token(token):
+        verified.append(token)
+        return claims.get(token)
+
+    monkeypatch.setattr(token_cache.JwtSecurity, "decode_access_token", staticmethod(decode_access_token))
+    return claims, verified
+
+
+def test_token_is_verified_once_while_valid(tokens):
+    claims, verified = tokens
+    claims["a"] = {"id": "user", "exp": time.time() + 60}
+    cache = DecodedTokenCache(max_size=10)
+
+    assert cache.decode("a") is claims["a"]
+    assert cache.decode("a") is claims["a"]
+    assert verified == ["a"]
+    assert cache.snapshot() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_expired_token_is_verified_again(tokens):
+    claims, verified = tokens
+    claims["a"] = {"id": "user", "exp": time.time() - 1}
+    cache = DecodedTokenCache(max_size=10)
+
+    cache.decode("a")
+    cache.decode("a")
+    assert verified == ["a", "a"]
+
+
+def test_invalid_tokens_and_tokens_without_exp_are_not_cached(tokens):
+    claims, verified = tokens
+    claims["no-exp"] = {"id": "user"}
+    cache = DecodedTokenCache(max_size=10)
+
+    for token in ("invalid", "invalid", "no-exp", "no-exp"):
+        cache.decode(token)
+
+    assert verified == ["invalid", "invalid", "no-exp", "no-exp"]
+    assert cache.snapshot()["size"] == 0
+
+
+def test_least_recently_used_token_is_evicted(tokens):
+    claims, verified = tokens
+    for token in ("a", "b", "c"):
+        claims[token] = {"exp": time.time() + 60}
+    cache = DecodedTokenCache(max_size=2)
+
+    cache.decode("a")
+    cache.decode("b")
+    cache.decode("a")
+    cache.decode("c")
+    verified.clear()
+    cache.decode("a")
+    cache.decode("b")
+
+    assert verified == ["b"]
+
+
+def test_blacklisting_a_token_evicts_its_claims(tokens):
+    claims, verified = tokens
+    claims["a"] = {"exp": time.time() + 60}
+    cache = DecodedTokenCache(max_size=10)
+    blacklist = TokenBlacklist(None, 60, "test blacklist")
+    blacklist.add_listener(cache.evict)
+
+    cache.decode("a")
+    blacklist._add_local(TokenBlacklist.digest("a"), time.time() + 60)
+    cache.decode("a")
+
+    assert verified == ["a", "a"]
+
+
+def test_disabled_cache_verifies_every_time(tokens):
+    claims, verified = tokens
+    claims["a"] = {"exp": time.time() + 60}
+    cache = DecodedTokenCache(max_size=0)
+
+    cache.decode("a")
+    cache.decode("a")
+    assert verified == ["a", "a"]
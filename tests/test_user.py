@@ -0,0 +1,87 @@
+import pytest
+from bson import ObjectId
+
+from database.user import user as user_module
+from database.user.user import User
+from database.user.user_cache import UserCache
+
+
+@pytest.fixture
+def users(mongo, monkeypatch):
+    monkeypatch.setattr(user_module, "users_collection", mongo.users)
+    monkeypatch.setattr(user_module, "user_cache", UserCache(ttl=60, max_size=10))
+    return mongo.users
+
+
+@pytest.fixture
+def reads(users, monkeypatch):
+    """
+    Projections of the find_one calls made on the users collection.
+    """
+    projections, find_one = [], users.find_one
+
+    def record(query, projection=None, *args, **kwargs):
+        projections.append(dict(projection) if projection is not None else None)
+        return find_one(query, projection, *args, **kwargs)
+
+    monkeypatch.setattr(users, "find_one", record)
+    return projections
+
+
+def insert_user(users) -> ObjectId:
+    liked = ObjectId()
+    return users.insert_one({
+        "ml": "user@example.com", "nm": "user", "ph": "", "pw": b"hash", "pfp": None, "isa": False,
+        "op": None, "sa": [], "lk": [liked], "crt": [], "odh": [],
+    }).inserted_id
+
+
+def test_unprojected_field_is_fetched_once_on_access(users, reads):
+    _id = insert_user(users)
+
+    user = User.get_by_id(_id, raw_document=False, fields=("cart",))
+    assert reads == [User.projection(("cart",))]
+
+    liked_items = user.liked_items
+    assert user.liked_items is liked_items
+    assert reads[1:] == [{"lk": 1}]
+    assert list(liked_items._liked_items) == users.find_one({"_id": _id})["lk"]
+
+
+def test_projected_fields_are_built_without_a_read(users, reads):
+    _id = insert_user(users)
+
+    user = User.get_by_id(_id, raw_document=False, fields=("cart",))
+    user.cart
+
+    assert len(reads) == 1
+
+
+def test_full_documents_never_fetch_fields(users, reads):
+    _id = insert_user(users)
+
+    user = User.get_by_id(_id, raw_document=False)
+    user.liked_items, user.cart, user.order_history
+
+    assert reads == [None]
+
+
+def test_projected_documents_never_enter_the_cache(users):
+    _id = insert_user(users)
+
+    User.get_by_id(_id, fields=("cart",))
+    assert user_module.user_cache.get(_id) is None
+
+    User.get_by_id(_id)
+    assert user_module.user_cache.get(_id) is not None
+
+    User.update_user(_id, {"$set": {"nm": "renamed"}}, fields=("cart",))
+    assert user_module.user_cache.get(_id) is None
+
+
+def test_full_update_refreshes_the_cache(users):
+    _id = insert_user(users)
+
+    User.update_user(_id, {"$set": {"nm": "renamed"}})
+
+    assert user_module.user_cache.get(_id)["nm"] == "renamed"
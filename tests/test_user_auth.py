@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from bson import ObjectId
+
+import database.user_auth as user_auth_module
+from database.user_auth import UserAuth
+
+
+@pytest.fixture
+def collections(mongo, monkeypatch):
+    monkeypatch.setattr(user_auth_module, "users_collection", mongo.users)
+    monkeypatch.setattr(user_auth_module, "user_auth_collection", mongo.user_auth)
+    return mongo.users, mongo.user_auth
+
+
+def auth_doc(_id: ObjectId, attempts: int, **fields) -> dict:
+    return {"_id": _id, "atmps": attempts, "lat": int(time.time()), "otp": None, "botp": None, "botp_t": None, **fields}
+
+
+def test_unknown_email_has_no_login_state(collections):
+    assert UserAuth.get_login_state("nobody@example.com") == (None, None, None)
+
+
+def test_user_without_auth_state_starts_at_zero_attempts(collections):
+    users, _ = collections
+    user_id = users.insert_one({"ml": "user@example.com", "pw": "hash"}).inserted_id
+
+    user_doc, user_auth, stored_attempts = UserAuth.get_login_state("user@example.com")
+
+    assert user_doc == {"_id": user_id, "ml": "user@example.com", "pw": "hash"}
+    assert (user_auth._id, user_auth.attempts, stored_attempts) == (user_id, 0, None)
+
+
+def test_login_state_joins_the_auth_state(collections):
+    users, user_auth = collections
+    user_id = users.insert_one({"ml": "user@example.com"}).inserted_id
+    user_auth.insert_one(auth_doc(user_id, 3))
+
+    user_doc, state, stored_attempts = UserAuth.get_login_state("user@example.com")
+
+    assert "auth" not in user_doc
+    assert (state.attempts, stored_attempts) == (3, 3)
+
+
+def test_first_failed_login_creates_the_auth_state(collections):
+    _, user_auth = collections
+    user_id = ObjectId()
+
+    UserAuth.record_login(user_id, None, 0, False)
+
+    assert user_auth.find_one({"_id": user_id}) | {"lat": None} == auth_doc(user_id, 1) | {"lat": None}
+
+
+def test_successful_login_resets_attempts_and_leaves_otp_state(collections):
+    _, user_auth = collections
+    user_id = ObjectId()
+    user_auth.insert_one(auth_doc(user_id, 4, botp="123456", botp_t=1))
+
+    UserAuth.record_login(user_id, 4, 4, True)
+
+    doc = user_auth.find_one({"_id": user_id})
+    assert doc["atmps"] == 0
+    assert (doc["botp"], doc["botp_t"]) == ("123456", 1)
+
+
+def test_failed_login_overwrites_the_attempts_it_read(collections):
+    _, user_auth = collections
+    user_id = ObjectId()
+    user_auth.insert_one(auth_doc(user_id, 7))
+
+    # evaluated after the cooldown reset the attempts in memory
+    UserAuth.record_login(user_id, 7, 0, False)
+
+    assert user_auth.find_one({"_id": user_id})["atmps"] == 1
+
+
+def test_failed_login_after_a_concurrent_write_is_counted_on_top(collections):
+    _, user_auth = collections
+    user_id = ObjectId()
+    user_auth.insert_one(auth_doc(user_id, 2))
+
+    # another login moved the counter from the stored 1 to 2, the conditional upsert hits the duplicate _id
+    UserAuth.record_login(user_id, 1, 1, False)
+
+    assert user_auth.find_one({"_id": user_id})["atmps"] == 3
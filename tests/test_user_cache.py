@@ -0,0 +1,102 @@
+import pytest
+from bson import ObjectId
+
+from database.user import user_cache as user_cache_module
+from database.user.liked_items import LikedItems
+from database.user.user_cache import UserCache
+
+
+@pytest.fixture
+def cache(clock, monkeypatch):
+    monkeypatch.setattr(user_cache_module, "time", clock)
+    return UserCache(ttl=5, max_size=2)
+
+
+def user(**fields) -> dict:
+    return {"_id": ObjectId(), **fields}
+
+
+def test_snapshot_is_served_until_it_expires(cache, clock):
+    doc = user(nme="a")
+    cache.put(doc)
+
+    clock.advance(5)
+    assert cache.get(doc["_id"]) == doc
+
+    clock.advance(0.1)
+    assert cache.get(doc["_id"]) is None
+    assert doc["_id"] not in cache._documents
+
+
+def test_put_refreshes_the_snapshot_and_its_expiration(cache, clock):
+    doc = user(nme="a")
+    cache.put(doc)
+    clock.advance(4)
+    updated = {**doc, "nme": "b"}
+    cache.put(updated)
+    clock.advance(4)
+
+    assert cache.get(doc["_id"]) == updated
+
+
+def test_least_recently_used_snapshot_is_evicted(cache):
+    first, second, third = user(), user(), user()
+    cache.put(first)
+    cache.put(second)
+    cache.get(first["_id"])
+    cache.put(third)
+
+    assert cache.get(second["_id"]) is None
+    assert cache.get(first["_id"]) == first
+    assert cache.get(third["_id"]) == third
+
+
+def test_invalidate_drops_the_snapshot(cache):
+    doc = user()
+    cache.put(doc)
+    cache.invalidate(doc["_id"])
+
+    assert cache.get(doc["_id"]) is None
+
+
+def test_evict_expired_keeps_live_snapshots(cache, clock):
+    expired = user()
+    cache.put(expired)
+    clock.advance(3)
+    live = user()
+    cache.put(live)
+    clock.advance(3)
+    cache.evict_expired()
+
+    assert list(cache._documents) == [live["_id"]]
+
+
+def test_disabled_cache_stores_nothing(clock, monkeypatch):
+    monkeypatch.setattr(user_cache_module, "time", clock)
+    cache = UserCache(ttl=0, max_size=2)
+    doc = user()
+    cache.put(doc)
+
+    assert cache.get(doc["_id"]) is None
+
+
+def test_mutating_a_document_leaves_the_snapshot_intact(cache):
+    liked = ObjectId()
+    doc = user(lk=[liked])
+    cache.put(doc)
+    doc["lk"].append(ObjectId())
+
+    served = cache.get(doc["_id"])
+    served["lk"].clear()
+
+    assert cache.get(doc["_id"])["lk"] == [liked]
+
+
+def test_liked_items_do_not_share_the_cached_list(cache):
+    liked = ObjectId()
+    doc = user(lk=[liked])
+    cache.put(doc)
+    liked_items = LikedItems.document_repr_to_object(cache.get(doc["_id"])["lk"], _id=doc["_id"])
+    liked_items._liked_items.append(ObjectId())
+
+    assert cache.get(doc["_id"])["lk"] == [liked]
@@ -0,0 +1,48 @@
+import base64
+
+import pytest
+
+from api import utils
+from database import ImageVariant
+
+
+DATA = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def upload_uncached(bucket, *keys: str):
+    for key in keys:
+        bucket.upload(DATA, key)
+        bucket.cache.invalidate(key)
+
+
+@pytest.fixture
+def bucket(s3_bucket, monkeypatch):
+    monkeypatch.setattr(utils, "s3Bucket", s3_bucket)
+    return s3_bucket
+
+
+def test_resolve_images_fetches_a_batch_concurrently(bucket, in_flight):
+    keys = [f"items/{i}" for i in range(4)]
+    upload_uncached(bucket, *keys)
+
+    images = utils.resolve_images(*keys, *keys)
+
+    assert images == dict.fromkeys(keys, base64.b64encode(DATA).decode())
+    assert in_flight.max == bucket.pool_size
+
+
+def test_missing_variants_fall_back_to_the_original(bucket):
+    upload_uncached(bucket, "items/old", "items/new", f"items/new_{ImageVariant.Thumbnail.value}")
+    bucket.upload(b"thumbnail", f"items/new_{ImageVariant.Thumbnail.value}")
+
+    images = utils.fetch_images("items/old", "items/new", "items/missing", variant=ImageVariant.Thumbnail)
+
+    assert images == {"items/old": DATA, "items/new": b"thumbnail", "items/missing": None}
+
+
+def test_images_past_the_byte_budget_are_not_returned(bucket):
+    upload_uncached(bucket, "items/a", "items/b")
+
+    images = utils.resolve_images("items/a", "items/b", byte_budget=len(DATA))
+
+    assert images == {"items/a": base64.b64encode(DATA).decode(), "items/b": None}